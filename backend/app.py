@@ -1,18 +1,30 @@
 # backend/app.py
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, stream_with_context
 from flask_cors import CORS
 import sqlite3
 import os
 from dotenv import load_dotenv
 from functools import wraps
-import re
 from datetime import datetime
 import random # Import random for generating mock data
 import json # Required for parsing JSON from environment variable (though now we prefer file path)
+import base64
+import threading
 
-# Import Firebase Admin SDK modules
-import firebase_admin
-from firebase_admin import credentials, auth
+from search_index import ProductSearchIndex, tokenize
+from fuzzy_index import FuzzyTermIndex, CORRECTION_WEIGHT
+from index_sync import ProductIndexSync
+from token_cache import TokenVerificationCache
+from db import ThreadLocalConnections
+from chat_logger import ChatHistoryWriter
+from intent_router import IntentRouter, extract_search_terms, SEARCH_INTENT
+from catalog_cache import CatalogPayloadCache
+from orders import place_order, ProductNotFoundError
+from query_cache import SearchResultCache
+from schema import create_schema, schema_is_current
+from metrics import RequestMetrics
+from rate_limit import TokenBucketLimiter, retry_after_header
+from singleflight import SingleFlight
 
 # Load environment variables from .env file (for local development)
 load_dotenv()
@@ -25,35 +37,53 @@ CORS(app, resources={r"/api/*": {"origins": ["http://localhost:3000", "https://e
 
 
 # --- Firebase Admin SDK Configuration ---
-try:
-    if not firebase_admin._apps: # Check if app is already initialized
-        # Try to load credentials from a file path specified by GOOGLE_APPLICATION_CREDENTIALS env var
-        # This is the recommended method for production deployments.
-        service_account_path = os.getenv('GOOGLE_APPLICATION_CREDENTIALS')
-
-        if service_account_path and os.path.exists(service_account_path):
-            cred = credentials.Certificate(service_account_path)
-            print(f"Firebase credentials loaded from GOOGLE_APPLICATION_CREDENTIALS path: {service_account_path}")
-        else:
-            # Fallback for local development if GOOGLE_APPLICATION_CREDENTIALS env var is not set
-            # or the path it points to does not exist.
-            # REMINDER: Ensure serviceAccountKey.json is in your .gitignore for local dev!
-            SERVICE_ACCOUNT_KEY_PATH = os.path.join(os.path.dirname(__file__), 'serviceAccountKey.json')
-            if os.path.exists(SERVICE_ACCOUNT_KEY_PATH):
-                cred = credentials.Certificate(SERVICE_ACCOUNT_KEY_PATH)
-                print(f"Firebase credentials loaded from local file: {SERVICE_ACCOUNT_KEY_PATH}")
+# Initialised on the first token that isn't in the token cache rather than at import, so
+# worker boots (and CLI commands like init-db) don't import and set up the Google client
+# stack, and the gRPC/HTTP clients are created after gunicorn forks, never in the master.
+firebase_init_lock = threading.Lock()
+
+class FirebaseUnavailableError(RuntimeError):
+    pass
+
+def init_firebase():
+    """Initialise the Firebase Admin SDK once per process; returns the firebase_admin.auth module."""
+    import firebase_admin
+    from firebase_admin import credentials, auth
+
+    if firebase_admin._apps: # Check if app is already initialized
+        return auth
+    with firebase_init_lock:
+        if firebase_admin._apps:
+            return auth
+        try:
+            # Try to load credentials from a file path specified by GOOGLE_APPLICATION_CREDENTIALS env var
+            # This is the recommended method for production deployments.
+            service_account_path = os.getenv('GOOGLE_APPLICATION_CREDENTIALS')
+
+            if service_account_path and os.path.exists(service_account_path):
+                cred = credentials.Certificate(service_account_path)
+                print(f"Firebase credentials loaded from GOOGLE_APPLICATION_CREDENTIALS path: {service_account_path}")
             else:
-                # If neither a valid env var path nor a local file is found, raise an error
-                raise Exception("Firebase service account credentials not found. Please ensure GOOGLE_APPLICATION_CREDENTIALS env var is set correctly for deployment, or serviceAccountKey.json exists for local development.")
+                # Fallback for local development if GOOGLE_APPLICATION_CREDENTIALS env var is not set
+                # or the path it points to does not exist.
+                # REMINDER: Ensure serviceAccountKey.json is in your .gitignore for local dev!
+                SERVICE_ACCOUNT_KEY_PATH = os.path.join(os.path.dirname(__file__), 'serviceAccountKey.json')
+                if os.path.exists(SERVICE_ACCOUNT_KEY_PATH):
+                    cred = credentials.Certificate(SERVICE_ACCOUNT_KEY_PATH)
+                    print(f"Firebase credentials loaded from local file: {SERVICE_ACCOUNT_KEY_PATH}")
+                else:
+                    # If neither a valid env var path nor a local file is found, raise an error
+                    raise Exception("Firebase service account credentials not found. Please ensure GOOGLE_APPLICATION_CREDENTIALS env var is set correctly for deployment, or serviceAccountKey.json exists for local development.")
 
-        firebase_admin.initialize_app(cred)
-        print("Firebase Admin SDK initialized successfully.")
-    else:
-        print("Firebase Admin SDK already initialized.")
-except Exception as e:
-    print(f"Error initializing Firebase Admin SDK: {e}")
-    # It's better to exit if Firebase initialization fails in a production environment
-    exit(1)
+            firebase_admin.initialize_app(cred)
+            print("Firebase Admin SDK initialized successfully.")
+        except Exception as e:
+            print(f"Error initializing Firebase Admin SDK: {e}")
+            raise FirebaseUnavailableError(str(e)) from e
+    return auth
+
+def verify_id_token(id_token):
+    return init_firebase().verify_id_token(id_token)
 
 
 # --- SQLite Database Setup ---
@@ -61,66 +91,94 @@ except Exception as e:
 # but can be adapted for PythonAnywhere by ensuring DATABASE path is writable)
 DATABASE = 'ecommerce.db'
 
+# Search backend for chatbot product queries:
+#   'index' - in-process BM25 inverted index (default)
+#   'fts5'  - SQLite FTS5 virtual table kept in sync with products by triggers
+SEARCH_BACKEND = os.getenv('SEARCH_BACKEND', 'index').lower()
+FTS5_ENABLED = False # Set by init_db() once the FTS5 table and triggers exist
+
+# Typo-tolerant search: query terms the catalog doesn't use are expanded with known terms whose
+# trigram similarity (0-1) is at least FUZZY_SIMILARITY. FUZZY_SEARCH=0 turns it off.
+FUZZY_SEARCH_ENABLED = os.getenv('FUZZY_SEARCH', '1') == '1'
+FUZZY_SIMILARITY = float(os.getenv('FUZZY_SIMILARITY', '0.4'))
+
+# Vector retrieval over hashed n-gram embeddings (see vector_index.py; needs numpy):
+#   off      - keyword search only (default)
+#   fallback - vector matches when keyword search finds nothing
+#   hybrid   - keyword matches re-ranked with the vector ranking (reciprocal rank fusion);
+#              vector matches alone when keyword search finds nothing
+# The index is never built by the app: build it offline with `python vector_index.py`
+# (again after bulk imports). Without the prebuilt files vector search stays off.
+VECTOR_SEARCH = os.getenv('VECTOR_SEARCH', 'off').lower()
+if VECTOR_SEARCH not in ('off', 'fallback', 'hybrid'):
+    print(f"Unknown VECTOR_SEARCH mode '{VECTOR_SEARCH}'. Vector search is disabled.")
+    VECTOR_SEARCH = 'off'
+elif VECTOR_SEARCH != 'off':
+    # Imported only when enabled: numpy alone is a large share of a worker's import time
+    from vector_index import ProductVectorIndex, VECTOR_AVAILABLE, DEFAULT_DIM as VECTOR_DEFAULT_DIM, saved_last_seq
+    if not VECTOR_AVAILABLE:
+        print(f"VECTOR_SEARCH={VECTOR_SEARCH} needs numpy, which is not installed. Vector search is disabled.")
+        VECTOR_SEARCH = 'off'
+VECTOR_INDEX_PATH = os.getenv('VECTOR_INDEX_PATH', 'vector_index')
+VECTOR_MIN_SCORE = float(os.getenv('VECTOR_MIN_SCORE', '0.2')) # Cosine-like, 0-1
+VECTOR_TOP_K = 20 # Vector matches per query; past the first few they are rarely relevant
+
+# Chatbot search results are paginated so broad queries don't return hundreds of rows at once
+DEFAULT_SEARCH_LIMIT = 50
+MAX_SEARCH_LIMIT = 200
+
+# Products per NDJSON line on /api/chatbot/stream
+STREAM_BATCH_SIZE = 20
+
+MAX_CHAT_HISTORY_LIMIT = 500
+
+# Page sizes for the paginated product catalog (/api/products with query params, 'all products' intent)
+DEFAULT_CATALOG_LIMIT = 50
+MAX_CATALOG_LIMIT = 500
+
+
+# Connections are reused per thread and opened in WAL mode (see db.py);
+# routes must not close them, the app-context teardown resets them instead.
+db_connections = ThreadLocalConnections(DATABASE)
+db_connections.init_app(app)
+
+# Per-stage request timings, exposed on /metrics and in each response's Server-Timing header.
+# PROFILE_REQUESTS=header|all turns on cProfile for requests (see metrics.py).
+metrics = RequestMetrics(
+    profile_mode=os.getenv('PROFILE_REQUESTS', 'off').lower(),
+    profile_dir=os.getenv('PROFILE_DIR', 'profiles')
+)
+metrics.init_app(app)
 
 def get_db_connection():
     try:
-        conn = sqlite3.connect(DATABASE)
-        conn.row_factory = sqlite3.Row # This makes rows behave like dictionaries
-        return conn
+        with metrics.stage('db_connect'):
+            return db_connections.get()
     except sqlite3.Error as e:
         print(f"Database connection error: {e}")
         return None
 
+# Chat history is written behind the response in batches (see chat_logger.py).
+# Set CHAT_HISTORY_SYNC=1 to write each entry before responding, e.g. in tests.
+chat_history_writer = ChatHistoryWriter(
+    db_connections.get,
+    synchronous=os.getenv('CHAT_HISTORY_SYNC', '0') == '1'
+)
+
 def init_db():
+    global FTS5_ENABLED
     conn = get_db_connection()
     if conn:
-        cursor = conn.cursor()
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS products (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                category TEXT NOT NULL,
-                price REAL NOT NULL,
-                description TEXT
-            )
-        ''')
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS chat_history (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id TEXT,
-                timestamp TEXT NOT NULL,
-                query TEXT NOT NULL,
-                response TEXT NOT NULL
-            )
-        ''')
-        # --- NEW TABLES FOR CHECKOUT ---
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS orders (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id TEXT NOT NULL,
-                order_date TEXT NOT NULL,
-                total_amount REAL NOT NULL,
-                status TEXT NOT NULL DEFAULT 'pending' -- e.g., pending, completed, cancelled
-            )
-        ''')
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS order_items (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                order_id INTEGER NOT NULL,
-                product_id INTEGER NOT NULL,
-                quantity INTEGER NOT NULL,
-                price_at_purchase REAL NOT NULL, -- Price at the time of purchase
-                FOREIGN KEY (order_id) REFERENCES orders(id),
-                FOREIGN KEY (product_id) REFERENCES products(id)
-            )
-        ''')
-        # --- END NEW TABLES ---
-        conn.commit()
-        conn.close()
+        # Tables, indexes and triggers live in schema.py so bulk_import.py can rebuild them too
+        FTS5_ENABLED = create_schema(conn, fts5=SEARCH_BACKEND == 'fts5')
         print("Database schema initialized.")
     else:
         print("Could not connect to database for schema initialization.")
 
+def get_catalog_version(conn):
+    """Current catalog version; changes whenever any row in products is inserted, updated or deleted."""
+    return conn.execute("SELECT version FROM catalog_version WHERE id = 1").fetchone()[0]
+
 def add_sample_products():
     conn = get_db_connection()
     if conn:
@@ -163,17 +221,361 @@ def add_sample_products():
             print(f"Added {len(products_to_add)} sample products to meet the requirement of at least 100 products.")
         else:
             print(f"Products table already contains {count} items. Skipping sample data insertion. To repopulate, delete 'ecommerce.db' and restart the app.")
-        conn.close()
     else:
         print("Could not connect to database to add sample products.")
 
-# IMPORTANT: Ensure database and sample products are set up when the app starts
-# This block runs when Gunicorn loads your app, ensuring the DB is ready.
-with app.app_context():
+# --- Product Search Index ---
+# Built once at startup and kept current from the product_changes log (see index_sync.py),
+# so chatbot searches only touch the posting lists of the query terms instead of
+# LIKE-scanning the whole table.
+search_index = ProductSearchIndex()
+# Vocabulary of product name/category terms used to correct typos in queries
+term_index = FuzzyTermIndex(threshold=FUZZY_SIMILARITY)
+# Rebuilds after a bulk import run on a background thread with its own connection
+product_indexes = ProductIndexSync(get_connection=db_connections.get)
+
+def build_search_index():
+    if not FTS5_ENABLED:
+        product_indexes.register(search_index)
+    if FUZZY_SEARCH_ENABLED:
+        product_indexes.register(term_index)
+    if not product_indexes.indexes:
+        return
+    conn = get_db_connection()
+    if conn:
+        indexed = product_indexes.rebuild(conn)
+        print(f"Search index built with {indexed} products.")
+    else:
+        print("Could not connect to database to build the search index.")
+
+def reload_vector_index(conn, marker_seq):
+    """
+    vector_sync's reset hook for bulk imports and pruned changelog entries: pick up rebuilt files if
+    there are any, otherwise keep serving the vectors we have (products written since still arrive
+    through the changelog).
+    """
+    saved_seq = saved_last_seq(VECTOR_INDEX_PATH)
+    # Check before loading: load() replaces the in-memory vectors, delta included
+    if saved_seq is not None and saved_seq >= marker_seq and vector_index.load(VECTOR_INDEX_PATH):
+        print(f"Vector index reloaded from {VECTOR_INDEX_PATH} with {len(vector_index)} products.")
+        return vector_index.last_seq
+    print(f"The catalog was bulk-loaded, or changed more than the changelog keeps, after {VECTOR_INDEX_PATH} "
+          "was built; vector matches will miss those products until 'python vector_index.py' is run and "
+          "the app restarted.")
+    return None
+
+# Memory-mapped embedding matrix shared by the workers; kept current by its own changelog
+# position because the saved files may be older than this process's other indexes.
+vector_index = None
+if VECTOR_SEARCH != 'off':
+    vector_index = ProductVectorIndex(dim=int(os.getenv('VECTOR_DIM', str(VECTOR_DEFAULT_DIM))))
+vector_sync = ProductIndexSync(reset=reload_vector_index)
+
+def build_vector_index():
+    """Load the prebuilt vector index; vector search is switched off if there is none."""
+    global VECTOR_SEARCH
+    if vector_index is None:
+        return
+    conn = get_db_connection()
+    if not conn:
+        print("Could not connect to database to load the vector index.")
+        return
+    if not vector_index.load(VECTOR_INDEX_PATH):
+        print(f"No usable vector index at {VECTOR_INDEX_PATH}; build it with 'python vector_index.py'. "
+              "Vector search is disabled.")
+        VECTOR_SEARCH = 'off'
+        return
+    vector_sync.register(vector_index)
+    vector_sync.last_seq = vector_index.last_seq
+    vector_sync.refresh(conn)
+    print(f"Vector index loaded from {VECTOR_INDEX_PATH} with {len(vector_index)} products.")
+
+def vector_ranked_ids(conn, search_terms):
+    """Product ids most similar to the query terms, best first (at most VECTOR_TOP_K)."""
+    # Only applies logged writes to the in-memory delta; the files are rebuilt offline, never here
+    vector_sync.refresh(conn)
+    return [product_id for product_id, _score in vector_index.search(search_terms, VECTOR_TOP_K, VECTOR_MIN_SCORE)]
+
+def reciprocal_rank_fusion(*rankings, k=60):
+    """Merge ranked id lists; an id ranked high by either list ends up near the top."""
+    scores = {}
+    for ranking in rankings:
+        for rank, product_id in enumerate(ranking):
+            scores[product_id] = scores.get(product_id, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(scores, key=lambda product_id: (-scores[product_id], product_id))
+
+def expand_search_terms(conn, search_terms):
+    """
+    Stem the query words and add typo corrections drawn from the product catalog.
+    Returns (terms, corrections); corrections is the set of added terms, which rank below typed ones.
+    """
+    if not FUZZY_SEARCH_ENABLED or not search_terms:
+        return search_terms, set()
+    product_indexes.refresh(conn)
+    return term_index.expand(search_terms)
+
+def search_product_batches(conn, search_terms, limit, offset=0, batch_size=STREAM_BATCH_SIZE, corrections=()):
+    """
+    Run a ranked product search with the configured backend, reading rows lazily.
+    Returns (total_matches, batches) where batches yields lists of up to batch_size product dicts,
+    best match first, covering at most `limit` results (None for all) starting at `offset`.
+    Terms in `corrections` (typo corrections added by expand_search_terms) count for less than the others.
+    """
+    if VECTOR_SEARCH == 'hybrid':
+        ranked_ids = keyword_ranked_ids(conn, search_terms, corrections)
+        vector_ids = vector_ranked_ids(conn, search_terms)
+        if ranked_ids:
+            # Vector similarity only re-orders the keyword matches, so the total (and the "I found N
+            # products" reply) counts products that actually contain a query term
+            keyword_ids = set(ranked_ids)
+            ranked_ids = reciprocal_rank_fusion(ranked_ids, [i for i in vector_ids if i in keyword_ids])
+        else:
+            ranked_ids = vector_ids
+        return ranked_id_batches(conn, ranked_ids, limit, offset, batch_size)
+
+    if FTS5_ENABLED:
+        total = conn.execute(
+            "SELECT COUNT(*) FROM products_fts WHERE products_fts MATCH ?", (fts5_match_query(search_terms),)
+        ).fetchone()[0]
+        if not total and VECTOR_SEARCH == 'fallback':
+            return ranked_id_batches(conn, vector_ranked_ids(conn, search_terms), limit, offset, batch_size)
+        order_by, order_params = fts5_rank_order(search_terms, corrections, 'products.id')
+        rows = conn.execute(
+            f'''
+            SELECT products.* FROM products_fts
+            JOIN products ON products.id = products_fts.rowid
+            WHERE products_fts MATCH ?
+            ORDER BY {order_by}
+            LIMIT ? OFFSET ?
+            ''',
+            # LIMIT -1 means no limit in SQLite
+            (fts5_match_query(search_terms), *order_params, -1 if limit is None else limit, offset)
+        )
+        return total, iter_row_batches(rows, batch_size)
+
+    ranked_ids = keyword_ranked_ids(conn, search_terms, corrections)
+    if not ranked_ids and VECTOR_SEARCH == 'fallback':
+        ranked_ids = vector_ranked_ids(conn, search_terms)
+    return ranked_id_batches(conn, ranked_ids, limit, offset, batch_size)
+
+def fts5_match_query(search_terms):
+    # Terms come from \w+ tokens, so quoting them is enough to keep FTS5 query syntax out
+    return ' OR '.join(f'"{term}"' for term in search_terms)
+
+def fts5_rank_order(search_terms, corrections, id_column):
+    """
+    ORDER BY clause and its parameters for FTS5 matches. FTS5 can't weight individual query terms,
+    so products matching a typed term are ranked above those matching only typo corrections.
+    """
+    order_by = f"bm25(products_fts, 3.0, 2.0, 1.0), {id_column}"
+    typed_terms = [term for term in search_terms if term not in corrections]
+    if not corrections or not typed_terms:
+        return order_by, ()
+    return (
+        f"products_fts.rowid IN (SELECT rowid FROM products_fts WHERE products_fts MATCH ?) DESC, {order_by}",
+        (fts5_match_query(typed_terms),)
+    )
+
+def keyword_ranked_ids(conn, search_terms, corrections=()):
+    """All product ids matching any search term, best BM25 score first."""
+    if FTS5_ENABLED:
+        order_by, order_params = fts5_rank_order(search_terms, corrections, 'rowid')
+        rows = conn.execute(
+            f"SELECT rowid FROM products_fts WHERE products_fts MATCH ? ORDER BY {order_by}",
+            (fts5_match_query(search_terms), *order_params)
+        )
+        return [row[0] for row in rows]
+    # Stemming and BM25 ranking happen inside the search index
+    product_indexes.refresh(conn)
+    term_weights = {term: CORRECTION_WEIGHT for term in corrections}
+    return [product_id for product_id, _score in search_index.search(search_terms, term_weights=term_weights)]
+
+def ranked_id_batches(conn, ranked_ids, limit, offset, batch_size):
+    """(total, batches) for an already-ranked id list, fetching only the requested slice."""
+    selected_ids = ranked_ids[offset:] if limit is None else ranked_ids[offset:offset + limit]
+    batches = (
+        fetch_products_by_ids(conn, selected_ids[start:start + batch_size])
+        for start in range(0, len(selected_ids), batch_size)
+    )
+    return len(ranked_ids), batches
+
+def search_products(conn, search_terms, limit, offset, corrections=()):
+    """
+    Run a ranked product search with the configured backend.
+    Returns (products_page, total_matches) where products_page holds at most `limit` rows starting at `offset`.
+    """
+    total, batches = search_product_batches(conn, search_terms, limit, offset, batch_size=limit, corrections=corrections)
+    return [product for batch in batches for product in batch], total
+
+def iter_row_batches(cursor, batch_size):
+    """Yield product dicts from an executed cursor in lists of batch_size, without fetchall()."""
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            return
+        yield [dict(row) for row in rows]
+
+def parse_pagination(params, default_limit, max_limit):
+    """Read 'limit' and the opaque 'cursor' from request params. Raises ValueError on bad input."""
+    limit = params.get('limit')
+    if limit is None or limit == '':
+        limit = default_limit
+    elif isinstance(limit, str):
+        # Query strings carry text; int() rejects "2.5" and "abc" alike
+        try:
+            limit = int(limit)
+        except ValueError:
+            raise ValueError("'limit' must be a positive integer.")
+    # JSON bodies can carry floats and booleans, which int() would quietly truncate or accept
+    if not isinstance(limit, int) or isinstance(limit, bool) or limit <= 0:
+        raise ValueError("'limit' must be a positive integer.")
+    return min(limit, max_limit), params.get('cursor') or None
+
+def parse_offset_cursor(cursor):
+    """Search results are ranked, so their cursor is simply the offset of the next page."""
+    if cursor is not None and (not isinstance(cursor, (str, int)) or isinstance(cursor, bool)):
+        raise ValueError("'cursor' must be a string.")
+    offset = int(cursor or 0)
+    if offset < 0:
+        raise ValueError("'cursor' must not be negative.")
+    return offset
+
+# Catalog sort orders: sort key -> (ORDER BY clause, keyset column, keyset comparison).
+# Every order ends with id so keyset pagination has a unique tie-breaker.
+CATALOG_SORTS = {
+    'id': ("id ASC", None, '>'),
+    'price_asc': ("price ASC, id ASC", 'price', '>'),
+    'price_desc': ("price DESC, id DESC", 'price', '<'),
+    'name': ("name ASC, id ASC", 'name', '>'),
+}
+
+def encode_catalog_cursor(sort, product):
+    column = CATALOG_SORTS[sort][1]
+    position = [sort, product[column] if column else None, product['id']]
+    return base64.urlsafe_b64encode(json.dumps(position).encode('utf-8')).decode('ascii')
+
+def decode_catalog_cursor(sort, cursor):
+    """(keyset value, last id) from a cursor made by encode_catalog_cursor. Raises ValueError on anything else."""
+    if not isinstance(cursor, str):
+        raise ValueError("'cursor' must be a string.")
+    try:
+        cursor_sort, value, last_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    except (ValueError, TypeError):
+        raise ValueError("'cursor' is not a valid catalog cursor.")
+    # Client-supplied, so check the shapes before they reach SQL parameter binding
+    if (not isinstance(value, (str, int, float, type(None))) or isinstance(value, bool)
+            or not isinstance(last_id, int) or isinstance(last_id, bool)):
+        raise ValueError("'cursor' is not a valid catalog cursor.")
+    if cursor_sort != sort:
+        raise ValueError("'cursor' was issued for a different sort order.")
+    return value, last_id
+
+def fetch_catalog_page(conn, category=None, min_price=None, max_price=None, sort='id',
+                       limit=DEFAULT_CATALOG_LIMIT, cursor=None):
+    """
+    One page of the product catalog using keyset pagination, so deep pages cost the same as the first.
+    Returns (products, next_cursor); next_cursor is None on the last page. Raises ValueError on bad input.
+    """
+    if sort not in CATALOG_SORTS:
+        raise ValueError(f"'sort' must be one of: {', '.join(CATALOG_SORTS)}.")
+    order_by, keyset_column, comparison = CATALOG_SORTS[sort]
+
+    conditions = []
+    params = []
+    if category:
+        conditions.append("category = ?")
+        params.append(category)
+    if min_price is not None:
+        conditions.append("price >= ?")
+        params.append(min_price)
+    if max_price is not None:
+        conditions.append("price <= ?")
+        params.append(max_price)
+    if cursor:
+        value, last_id = decode_catalog_cursor(sort, cursor)
+        if keyset_column:
+            conditions.append(f"({keyset_column}, id) {comparison} (?, ?)")
+            params.extend([value, last_id])
+        else:
+            conditions.append(f"id {comparison} ?")
+            params.append(last_id)
+
+    where_clause = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    # Fetch one extra row to learn whether another page exists
+    rows = conn.execute(
+        f"SELECT * FROM products {where_clause} ORDER BY {order_by} LIMIT ?",
+        params + [limit + 1]
+    ).fetchall()
+    products = [dict(row) for row in rows[:limit]]
+    next_cursor = encode_catalog_cursor(sort, products[-1]) if len(rows) > limit else None
+    return products, next_cursor
+
+def fetch_products_by_ids(conn, product_ids, chunk_size=500):
+    """Fetch full product rows for the given ids, preserving the order of product_ids."""
+    products_by_id = {}
+    for start in range(0, len(product_ids), chunk_size):
+        chunk = product_ids[start:start + chunk_size]
+        placeholders = ','.join('?' * len(chunk))
+        for row in conn.execute(f"SELECT * FROM products WHERE id IN ({placeholders})", chunk):
+            products_by_id[row['id']] = dict(row)
+    return [products_by_id[product_id] for product_id in product_ids if product_id in products_by_id]
+
+# --- Startup ---
+# Nothing touches the database at import. create_app() checks the schema (one PRAGMA when it
+# is current; run `flask --app app init-db` to migrate and seed ahead of time) and warms the
+# in-memory search indexes. gunicorn with preload_app calls it once in the master via wsgi.py,
+# so workers fork with warm indexes; otherwise the first request in each process calls it.
+app_ready = False
+app_ready_lock = threading.Lock()
+
+def ensure_schema():
+    """Migrate and seed only if the database is behind; returns True if it had to."""
+    global FTS5_ENABLED
+    conn = get_db_connection()
+    if conn and schema_is_current(conn, fts5=SEARCH_BACKEND == 'fts5'):
+        FTS5_ENABLED = SEARCH_BACKEND == 'fts5'
+        return False
+    print("Database schema is missing or outdated; migrating now (run 'flask --app app init-db' to do this before starting).")
+    init_db()
+    add_sample_products()
+    return True
+
+def create_app():
+    """Make the app ready to serve: schema in place and search indexes built. Safe to call repeatedly."""
+    global app_ready
+    if app_ready:
+        return app
+    with app_ready_lock:
+        if not app_ready:
+            with app.app_context():
+                ensure_schema()
+                build_search_index()
+                build_vector_index()
+            # Under preload_app this runs in the gunicorn master; SQLite connections must not be
+            # carried across fork(), so leave none open for the workers to inherit
+            db_connections.close()
+            search_cache.close()
+            if chatbot_limiter:
+                chatbot_limiter.close()
+            app_ready = True
+    return app
+
+@app.before_request
+def ensure_app_ready():
+    if not app_ready:
+        create_app()
+
+@app.cli.command('init-db')
+def init_db_command():
+    """Create or migrate the database schema and add the sample products if the catalog is empty."""
     init_db()
     add_sample_products()
 
 # --- Authentication Decorator ---
+# Decoded tokens are cached until their 'exp', so repeated requests with the same
+# token skip the JWT parse and signature check.
+token_cache = TokenVerificationCache(maxsize=int(os.getenv('TOKEN_CACHE_SIZE', '10000')))
+
 def verify_token(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
@@ -185,8 +587,11 @@ def verify_token(f):
             id_token = id_token.split("Bearer ")[1]
 
         try:
-            decoded_token = auth.verify_id_token(id_token)
+            with metrics.stage('token_verify'):
+                decoded_token = token_cache.verify(id_token, verify_id_token)
             request.user = decoded_token # Attach decoded user info to the request
+        except FirebaseUnavailableError as e:
+            return jsonify({"message": "Authentication service unavailable.", "error": str(e)}), 503
         except Exception as e:
             print(f"Firebase Admin SDK Token verification failed: {e}")
             return jsonify({"message": "Invalid or expired token.", "error": str(e)}), 403
@@ -199,158 +604,478 @@ def verify_token(f):
 def home():
     return "Flask Backend is running!"
 
+def collect_stats():
+    # Cache counters for monitoring; contains no user data
+    return {
+        "token_cache": token_cache.stats(),
+        "db": {"connections_opened": db_connections.opened},
+        "chat_history_writer": chat_history_writer.stats(),
+        "intent_router": intent_router.stats(),
+        "catalog_cache": {"builds": catalog_cache.builds},
+        "search_cache": search_cache.stats(),
+        "search_flights": search_flights.stats(),
+        "chatbot_rate_limit": chatbot_limiter.stats() if chatbot_limiter else {"enabled": 0},
+        "product_indexes": {**product_indexes.stats(), "fuzzy_terms": len(term_index)},
+        "vector_index": {"mode": VECTOR_SEARCH, **(vector_index.stats() if vector_index else {})}
+    }
+
+@app.route('/api/stats', methods=['GET'])
+def get_stats():
+    return jsonify(collect_stats())
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    # Prometheus scrape endpoint: request/stage latency histograms plus the /api/stats counters
+    return Response(metrics.render(collect_stats()), mimetype='text/plain; version=0.0.4')
+
+# Any of these switches /api/products from the cached full catalog to a filtered, paginated page
+CATALOG_QUERY_PARAMS = ('category', 'min_price', 'max_price', 'sort', 'limit', 'cursor')
+
+# Full catalog JSON (plain and gzipped), rebuilt only when the catalog version changes
+catalog_cache = CatalogPayloadCache(app.json.dumps)
+
 @app.route('/api/products', methods=['GET'])
 @verify_token
 def get_all_products():
+    """
+    Without query parameters: the full catalog, served from the versioned cache with ETag support.
+    With any of category, min_price, max_price, sort, limit or cursor: one page of matching products
+    as {"products": [...], "next_cursor": ...}; pass next_cursor back as 'cursor' for the next page.
+    """
+    if any(param in request.args for param in CATALOG_QUERY_PARAMS):
+        return get_catalog_page()
+
     conn = get_db_connection()
     if conn:
-        products_from_db = conn.execute('SELECT * FROM products').fetchall()
-        conn.close()
-        return jsonify([dict(row) for row in products_from_db])
+        with metrics.stage('catalog_payload'): # Query + serialization, only when the catalog changed
+            payload = catalog_cache.get(
+                get_catalog_version(conn),
+                lambda: [dict(row) for row in conn.execute('SELECT * FROM products').fetchall()]
+            )
+        use_gzip = request.accept_encodings['gzip'] > 0
+        etag = payload.gzip_etag if use_gzip else payload.etag
+
+        if request.if_none_match.contains(payload.etag) or request.if_none_match.contains(payload.gzip_etag):
+            response = Response(status=304)
+        else:
+            response = Response(payload.gzip_body if use_gzip else payload.body, mimetype='application/json')
+            if use_gzip:
+                response.headers['Content-Encoding'] = 'gzip'
+        response.set_etag(etag)
+        # Browsers keep the copy but revalidate it (If-None-Match) on every dashboard load
+        response.headers['Cache-Control'] = 'private, no-cache'
+        response.vary.add('Accept-Encoding')
+        return response
     return jsonify({"message": "Database connection error"}), 500
 
+# --- Chatbot Intents ---
+# Compiled once at import; intents registered earlier take priority when several phrases match.
+# Queries that match no intent fall through to product search.
+intent_router = IntentRouter()
+intent_router.register('all_products', ["all products", "show all", "view all"])
+intent_router.register('categories', ["categories", "product types"])
+intent_router.register('greeting', ["hello", "hi", "hey", "greetings"])
+intent_router.register('thanks', ["thank you", "thanks", "cheers", "appreciate it", "goodbye", "bye"])
+
+def get_catalog_page():
+    try:
+        limit, cursor = parse_pagination(request.args, DEFAULT_CATALOG_LIMIT, MAX_CATALOG_LIMIT)
+        min_price = request.args.get('min_price', type=float)
+        max_price = request.args.get('max_price', type=float)
+        if ('min_price' in request.args and min_price is None) or ('max_price' in request.args and max_price is None):
+            raise ValueError("'min_price' and 'max_price' must be numbers.")
+        conn = get_db_connection()
+        if not conn:
+            return jsonify({"message": "Database connection error"}), 500
+        with metrics.stage('catalog_query'):
+            products, next_cursor = fetch_catalog_page(
+                conn,
+                category=request.args.get('category'),
+                min_price=min_price,
+                max_price=max_price,
+                sort=request.args.get('sort', 'id'),
+                limit=limit,
+                cursor=cursor
+            )
+    except ValueError as e:
+        return jsonify({"message": f"Invalid catalog query: {e}"}), 400
+    with metrics.stage('serialize'):
+        return jsonify({"products": products, "next_cursor": next_cursor})
+
+# --- Chatbot Product Answers ---
+# Shared by every worker on the host; entries die with the catalog version they were computed for.
+search_cache = SearchResultCache(
+    os.getenv('SEARCH_CACHE_PATH', 'query_cache.db'),
+    ttl=int(os.getenv('SEARCH_CACHE_TTL', '300'))
+)
+# Concurrent cache misses for the same query within a worker wait for one search instead of each running it
+search_flights = SingleFlight()
+
+# --- Chatbot Rate Limiting ---
+# Token bucket per Firebase uid, shared by every worker on the host through a SQLite file.
+# CHATBOT_RATE_LIMIT is the sustained rate in requests per minute (0 turns limiting off);
+# CHATBOT_RATE_BURST is how many requests a user can send back to back.
+CHATBOT_RATE_LIMIT = float(os.getenv('CHATBOT_RATE_LIMIT', '60'))
+chatbot_limiter = TokenBucketLimiter(
+    os.getenv('RATE_LIMIT_PATH', 'rate_limit.db'),
+    rate=CHATBOT_RATE_LIMIT / 60,
+    burst=int(os.getenv('CHATBOT_RATE_BURST', '20'))
+) if CHATBOT_RATE_LIMIT > 0 else None
+
+def rate_limited(f):
+    """Rejects requests with 429 once the user's bucket is empty. Goes below @verify_token, which sets request.user."""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if chatbot_limiter:
+            with metrics.stage('rate_limit'):
+                allowed, retry_after = chatbot_limiter.acquire(request.user['uid'])
+            if not allowed:
+                response = jsonify({
+                    "message": "Too many requests. Please wait a moment before asking again.",
+                    "retry_after": round(retry_after, 1)
+                })
+                response.status_code = 429
+                response.headers['Retry-After'] = retry_after_header(retry_after)
+                return response
+        return f(*args, **kwargs)
+    return decorated_function
+
+def product_answer_message(intent, top_products, total_matches):
+    """Text reply for a product listing, given its first few products and the total number of matches."""
+    if intent == 'all_products':
+        if top_products:
+            return f"Here are all {total_matches} products we have:"
+        return "I couldn't find any products in the database."
+
+    if not top_products:
+        return "I'm sorry, I couldn't find any products matching your specific query. Please try different keywords or ask for 'all products' to see everything."
+    response_message = f"I found {total_matches} product(s) matching your search. "
+    # Add a brief text summary of a few top products
+    for product in top_products[:3]:
+        response_message += (
+            f"\n- {product['name']} ({product['category']}): ${product['price']:.2f}"
+        )
+    if total_matches > 3:
+        response_message += f"\n...and {total_matches - 3} more. Please see the dashboard for full details."
+    response_message += "\nIs there anything else I can help you find?"
+    return response_message
+
+def simple_intent_reply(conn, intent):
+    """Text reply for intents that don't list products."""
+    if intent == 'categories':
+        unique_categories_db = conn.execute("SELECT DISTINCT category FROM products").fetchall()
+        unique_categories = sorted([row['category'] for row in unique_categories_db])
+        if unique_categories:
+            return f"Our available product categories are: {', '.join(unique_categories)}."
+        return "I don't have any categories to display right now."
+    if intent == 'greeting':
+        return "Hello! How can I assist you today? You can ask me to search for products (e.g., 'search for laptop'), view categories, or ask for 'all products'."
+    if intent == 'thanks':
+        return "You're welcome! Is there anything else I can help you with? Or, goodbye!"
+    # If no meaningful search terms are extracted
+    return "I didn't quite understand your request. Can you please be more specific about the product you're looking for, or try keywords like 'laptop', 'book', 'electronics', or 'show all products'?"
+
+def answer_product_query(conn, intent, search_terms, limit, page_cursor, corrections=()):
+    """Products and summary text for the 'all_products' intent or a keyword search. Raises ValueError on a bad cursor."""
+    next_cursor = None
+    if intent == 'all_products':
+        # Same keyset paging as /api/products, so this never dumps the whole table in one response
+        products, next_cursor = fetch_catalog_page(conn, limit=limit, cursor=page_cursor)
+        total_matches = conn.execute("SELECT COUNT(*) FROM products").fetchone()[0]
+    else:
+        # --- Dynamic Product Search Logic for general queries ---
+        offset = parse_offset_cursor(page_cursor)
+        products, total_matches = search_products(conn, search_terms, limit, offset, corrections)
+        if offset + len(products) < total_matches:
+            next_cursor = str(offset + len(products))
+
+    return {
+        "response": product_answer_message(intent, products, total_matches),
+        "products": products,
+        "total": total_matches,
+        "next_cursor": next_cursor
+    }
+
+def product_answer_cache_key(intent, search_terms, limit, page_cursor, corrections=()):
+    # Key on the normalised (stemmed, de-duplicated, sorted) term set so "laptops" and "laptop" share an entry;
+    # corrections are marked with '~' because they are weighted differently from the same word typed in
+    terms_key = '*' if intent == 'all_products' else ' '.join(sorted({
+        f"{term}~" if term in corrections else term for word in search_terms for term in tokenize(word)
+    }))
+    return f"{SEARCH_BACKEND}|{VECTOR_SEARCH}|{intent}|{terms_key}|{limit}|{page_cursor or ''}"
+
+def cache_product_answer(cache_key, catalog_version, index_generation, answer):
+    # While a background rebuild runs the in-memory indexes lag the catalog version; caching
+    # that answer would keep serving it from every worker after the rebuild lands
+    if index_generation is not None and product_indexes.generation() == index_generation:
+        search_cache.set(cache_key, catalog_version, answer)
+
+def cached_product_answer(conn, intent, search_terms, limit, page_cursor, corrections=()):
+    cache_key = product_answer_cache_key(intent, search_terms, limit, page_cursor, corrections)
+    catalog_version = get_catalog_version(conn)
+
+    with metrics.stage('search_cache'):
+        answer = search_cache.get(cache_key, catalog_version)
+    if answer is None:
+        def search_and_cache():
+            index_generation = product_indexes.generation()
+            answer = answer_product_query(conn, intent, search_terms, limit, page_cursor, corrections)
+            cache_product_answer(cache_key, catalog_version, index_generation, answer)
+            return answer
+        with metrics.stage('search'):
+            answer, _shared = search_flights.do((cache_key, catalog_version), search_and_cache)
+    return answer
+
+def product_answer_events(conn, intent, search_terms, limit, page_cursor, corrections=()):
+    """
+    NDJSON events for a product listing: the message, products in batches of STREAM_BATCH_SIZE, then done.
+    Cached pages (and 'all_products' pages, a single keyset query) are replayed from the search cache.
+    On a miss a keyword search reads its rows lazily: the message goes out once the first batch is
+    fetched and the page is cached after its last batch. Raises ValueError on a bad cursor before
+    yielding the message.
+    """
+    if intent == 'all_products':
+        answer = cached_product_answer(conn, intent, search_terms, limit, page_cursor, corrections)
+    else:
+        cache_key = product_answer_cache_key(intent, search_terms, limit, page_cursor, corrections)
+        catalog_version = get_catalog_version(conn)
+        with metrics.stage('search_cache'):
+            answer = search_cache.get(cache_key, catalog_version)
+
+    if answer is not None:
+        yield {"type": "message", "response": answer['response'], "intent": intent, "total": answer['total']}
+        products = answer['products']
+        for start in range(0, len(products), STREAM_BATCH_SIZE):
+            yield {"type": "products", "products": products[start:start + STREAM_BATCH_SIZE]}
+        yield {"type": "done", "next_cursor": answer['next_cursor']}
+        return
+
+    # Misses skip search_flights: waiters would only get the page once it had been read in full
+    offset = parse_offset_cursor(page_cursor)
+    index_generation = product_indexes.generation()
+    with metrics.stage('search'):
+        total_matches, batches = search_product_batches(conn, search_terms, limit, offset, corrections=corrections)
+        batch = next(batches, None)
+    response_message = product_answer_message(intent, batch or [], total_matches)
+    yield {"type": "message", "response": response_message, "intent": intent, "total": total_matches}
+
+    products = []
+    while batch is not None:
+        products.extend(batch)
+        yield {"type": "products", "products": batch}
+        with metrics.stage('search'):
+            batch = next(batches, None)
+    next_cursor = str(offset + len(products)) if offset + len(products) < total_matches else None
+    # Only reached once every batch was sent; a client that disconnects early leaves nothing half-cached
+    cache_product_answer(cache_key, catalog_version, index_generation, {
+        "response": response_message,
+        "products": products,
+        "total": total_matches,
+        "next_cursor": next_cursor
+    })
+    yield {"type": "done", "next_cursor": next_cursor}
+
 @app.route('/api/chatbot', methods=['POST'])
 @verify_token
+@rate_limited
 def chatbot_query():
     user_id = request.user['uid']
     user_query = request.json.get('query', '').lower().strip()
 
+    try:
+        limit, page_cursor = parse_pagination(request.json, DEFAULT_SEARCH_LIMIT, MAX_SEARCH_LIMIT)
+    except (TypeError, ValueError) as e:
+        return jsonify({"message": f"Invalid pagination parameters: {e}"}), 400
+
     response_message = "I'm sorry, I couldn't find any products matching your query. Please try searching for something else or ask for 'all products'."
     products_for_response = [] # Initialize as empty, will be populated if products are found
+    total_matches = 0 # Total number of products matching a search, across all pages
+    next_cursor = None # Cursor for the next page of results, if any
 
     conn = get_db_connection()
     if not conn:
         return jsonify({"response": "Database connection error. Please try again later.", "products": []}), 500
 
-    cursor = conn.cursor()
-
-    # Define a set of common stop words to filter out (can be expanded)
-    stop_words = set([
-        "a", "an", "the", "and", "or", "but", "is", "are", "was", "were", "be", "been", "being",
-        "have", "has", "had", "do", "does", "did", "of", "at", "by", "for", "with", "from", "on",
-        "in", "to", "up", "out", "down", "off", "over", "under", "again", "further", "then", "once",
-        "here", "there", "when", "where", "why", "how", "all", "any", "both", "each", "few", "more",
-        "most", "other", "some", "such", "no", "nor", "not", "only", "own", "same", "so", "than",
-        "too", "very", "s", "t", "can", "will", "just", "don", "should", "now", "what", "which",
-        "who", "whom", "this", "that", "these", "those", "am", "i", "me", "my", "myself", "we",
-        "our", "ours", "ourselves", "you", "your", "yours", "yourself", "yourselves", "he", "him",
-        "his", "himself", "she", "her", "hers", "herself", "it", "its", "itself", "they", "them",
-        "their", "theirs", "themselves", "please", "can you", "i'm looking for", "i want", "do you have", "show me", "find me"
-    ])
+    with metrics.stage('intent_routing'):
+        route = intent_router.route(user_query)
+    # Remove stop words and tokenize the query
+    search_terms = extract_search_terms(user_query) if route.intent == SEARCH_INTENT else []
+    with metrics.stage('fuzzy_expand'):
+        search_terms, corrections = expand_search_terms(conn, search_terms)
 
     # --- Handle Specific Commands / Intents ---
-    if "all products" in user_query or "show all" in user_query or "view all" in user_query:
-        found_products_db = cursor.execute("SELECT * FROM products").fetchall()
-        products_for_response = [dict(row) for row in found_products_db] # Convert to dict list
-        if products_for_response:
-            response_message = f"Here are all {len(products_for_response)} products we have:"
-        else:
-            response_message = "I couldn't find any products in the database."
-    elif "categories" in user_query or "product types" in user_query:
-        unique_categories_db = cursor.execute("SELECT DISTINCT category FROM products").fetchall()
-        unique_categories = sorted([row['category'] for row in unique_categories_db])
-        if unique_categories:
-            response_message = f"Our available product categories are: {', '.join(unique_categories)}."
-        else:
-            response_message = "I don't have any categories to display right now."
-        products_for_response = [] # No products needed for a category list
-    elif any(phrase in user_query for phrase in ["hello", "hi", "hey", "greetings"]):
-        response_message = "Hello! How can I assist you today? You can ask me to search for products (e.g., 'search for laptop'), view categories, or ask for 'all products'."
-        products_for_response = [] # No products needed for a greeting
-    elif any(phrase in user_query for phrase in ["thank you", "thanks", "cheers", "appreciate it", "goodbye", "bye"]):
-        response_message = "You're welcome! Is there anything else I can help you with? Or, goodbye!"
-        products_for_response = [] # No products needed for a thank you/goodbye
+    if route.intent == 'all_products' or search_terms:
+        # Product listings (catalog pages and keyword searches) are cached per catalog version
+        try:
+            answer = cached_product_answer(conn, route.intent, search_terms, limit, page_cursor, corrections)
+        except ValueError as e:
+            return jsonify({"message": f"Invalid pagination parameters: {e}"}), 400
+        response_message = answer['response']
+        products_for_response = answer['products']
+        total_matches = answer['total']
+        next_cursor = answer['next_cursor']
     else:
-        # --- Dynamic Product Search Logic for general queries ---
-        # Remove stop words and tokenize the query
-        cleaned_query = ' '.join([word for word in re.findall(r'\b\w+\b', user_query) if word not in stop_words])
-        search_terms = []
-        if cleaned_query:
-            # Simple stemming: add plural/singular forms for basic keywords
-            for term in cleaned_query.split():
-                search_terms.append(term)
-                if term.endswith('s') and len(term) > 3:
-                    search_terms.append(term[:-1])
-                elif term.endswith('e') and len(term) > 4: # e.g. 'mouse' -> 'mous' if you want a deeper stem
-                    pass # Not adding anything specific here for now, as it's general
-                # Add a very basic pluralization if it's a common singular form (e.g., 'laptop' -> 'laptops')
-                if not term.endswith('s') and len(term) > 2:
-                    search_terms.append(term + 's')
-
-        search_terms = list(set(search_terms)) # Ensure unique terms
-
-        if search_terms:
-            query_parts = []
-            query_params = []
-            # Search in name, category, and description
-            for keyword in search_terms:
-                like_keyword = f"%{keyword}%"
-                query_parts.append("(name LIKE ? OR category LIKE ? OR description LIKE ?)")
-                query_params.extend([like_keyword, like_keyword, like_keyword])
-
-            sql_query = f"SELECT * FROM products WHERE {' OR '.join(query_parts)}"
-            found_products_db = cursor.execute(sql_query, query_params).fetchall()
-            products_for_response = [dict(row) for row in found_products_db]
-
-            if products_for_response:
-                response_message = f"I found {len(products_for_response)} product(s) matching your search. "
-                # Add a brief text summary of a few top products
-                for product in products_for_response[:3]:
-                    response_message += (
-                        f"\n- {product['name']} ({product['category']}): ${product['price']:.2f}"
-                    )
-                if len(products_for_response) > 3:
-                    response_message += f"\n...and {len(products_for_response) - 3} more. Please see the dashboard for full details."
-                response_message += "\nIs there anything else I can help you find?"
-            else:
-                response_message = "I'm sorry, I couldn't find any products matching your specific query. Please try different keywords or ask for 'all products' to see everything."
-        else:
-            # If no meaningful search terms are extracted
-            response_message = "I didn't quite understand your request. Can you please be more specific about the product you're looking for, or try keywords like 'laptop', 'book', 'electronics', or 'show all products'?"
+        with metrics.stage('search'):
+            response_message = simple_intent_reply(conn, route.intent)
 
+    # Queue for the chat_history table; the background writer commits it in a batch
+    with metrics.stage('history_write'):
+        chat_history_writer.log(user_id, datetime.now().isoformat(), user_query, response_message)
 
-    # Save to chat_history table
+    # Return both the text response and the structured products data
+    with metrics.stage('serialize'):
+        return jsonify({
+            "response": response_message,
+            "products": products_for_response, # Always return products_for_response, even if empty
+            "total": total_matches if total_matches else len(products_for_response),
+            "next_cursor": next_cursor, # Pass back as 'cursor' to fetch the next page of results
+            "intent": route.intent
+        })
+
+@app.route('/api/chatbot/stream', methods=['POST'])
+@verify_token
+@rate_limited
+def chatbot_query_stream():
+    """
+    Streaming variant of /api/chatbot. The body is NDJSON, one JSON object per line:
+      {"type": "message", "response": ..., "intent": ..., "total": ...}  - the text reply, sent first
+      {"type": "products", "products": [...]}                           - ranked batches of matching products
+      {"type": "done", "next_cursor": ...}                              - pass next_cursor back as 'cursor' for the next page
+    Takes the same 'limit' and 'cursor' as /api/chatbot and shares its search cache. On a cache miss the
+    message is sent as soon as the first batch of a search has been read, and later batches are read
+    from the database as they are sent. Only the first page of a reply is logged to chat history.
+    """
+    user_id = request.user['uid']
+    user_query = request.json.get('query', '').lower().strip()
     try:
-        cursor.execute(
-            "INSERT INTO chat_history (user_id, timestamp, query, response) VALUES (?, ?, ?, ?)",
-            (user_id, datetime.now().isoformat(), user_query, response_message) # Store timestamp and text response
-        )
-        conn.commit()
-    except sqlite3.Error as e:
-        print(f"Error saving chat history: {e}")
-    finally:
-        conn.close()
+        limit, page_cursor = parse_pagination(request.json, DEFAULT_SEARCH_LIMIT, MAX_SEARCH_LIMIT)
+    except (TypeError, ValueError) as e:
+        return jsonify({"message": f"Invalid pagination parameters: {e}"}), 400
 
-    # Return both the text response and the structured products data
-    return jsonify({
-        "response": response_message,
-        "products": products_for_response # Always return products_for_response, even if empty
-    })
+    conn = get_db_connection()
+    if not conn:
+        return jsonify({"response": "Database connection error. Please try again later.", "products": []}), 500
+
+    with metrics.stage('intent_routing'):
+        route = intent_router.route(user_query)
+    search_terms = extract_search_terms(user_query) if route.intent == SEARCH_INTENT else []
+    with metrics.stage('fuzzy_expand'):
+        search_terms, corrections = expand_search_terms(conn, search_terms)
+
+    if route.intent == 'all_products' or search_terms:
+        events = product_answer_events(conn, route.intent, search_terms, limit, page_cursor, corrections)
+        try:
+            message_event = next(events) # Runs the search up to its first batch
+        except ValueError as e:
+            return jsonify({"message": f"Invalid pagination parameters: {e}"}), 400
+    else:
+        with metrics.stage('search'):
+            message_event = {"type": "message", "response": simple_intent_reply(conn, route.intent),
+                             "intent": route.intent, "total": 0}
+        events = iter([{"type": "done", "next_cursor": None}])
+
+    if not page_cursor:
+        with metrics.stage('history_write'):
+            chat_history_writer.log(user_id, datetime.now().isoformat(), user_query, message_event['response'])
+
+    def ndjson_line(event):
+        with metrics.stage('serialize'):
+            return app.json.dumps(event) + "\n"
+
+    def generate():
+        # Runs after the response headers are sent, so these stages reach /metrics but not Server-Timing
+        yield ndjson_line(message_event)
+        for event in events:
+            yield ndjson_line(event)
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='application/x-ndjson',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'} # Keep proxies from buffering the stream
+    )
 
 @app.route('/api/chat_history', methods=['GET'])
 @verify_token
 def get_chat_history():
+    """
+    Chat history for the current user, oldest first (in the order stored, with since_id).
+    Optional query parameters (timestamps and ids are the values returned by this endpoint):
+      since_id  - only messages stored after the one with this id (incremental refresh)
+      since     - only messages newer than this timestamp
+      before    - only messages older than this timestamp (paging backwards)
+      before_id - with 'before', the id of that message
+      limit     - at most this many messages; without 'since'/'since_id' these are the most recent ones
+    """
     user_id = request.user['uid']
+    since = request.args.get('since')
+    before = request.args.get('before')
+    limit = request.args.get('limit')
+    try:
+        if limit is not None:
+            limit = int(limit)
+            if limit <= 0:
+                raise ValueError
+    except ValueError:
+        return jsonify({"message": "Invalid 'limit': must be a positive integer."}), 400
+    if limit is not None:
+        limit = min(limit, MAX_CHAT_HISTORY_LIMIT)
+    since_id = request.args.get('since_id', type=int)
+    before_id = request.args.get('before_id', type=int)
+    if ('since_id' in request.args and since_id is None) or ('before_id' in request.args and before_id is None):
+        return jsonify({"message": "Invalid 'since_id' or 'before_id': must be an integer."}), 400
+
     conn = get_db_connection()
     if not conn:
         return jsonify({"message": "Database connection error."}), 500
 
+    # Make sure this user's most recent messages have left the write-behind queue
+    with metrics.stage('history_flush'):
+        chat_history_writer.flush()
+
     try:
-        # Fetch chat history for the specific user, ordered by timestamp
-        chat_logs = conn.execute(
-            "SELECT timestamp, query, response FROM chat_history WHERE user_id = ? ORDER BY timestamp ASC",
-            (user_id,)
-        ).fetchall()
-        
+        # Keyset pagination on (user_id, timestamp, id), served by idx_chat_history_user_timestamp_id;
+        # the id breaks ties between messages logged in the same instant, so none are skipped or repeated
+        conditions = ["user_id = ?"]
+        params = [user_id]
+        if since_id is not None:
+            # Ids follow insert order, unlike timestamps: each worker's write-behind queue stamps a message
+            # when it is queued, so another worker can store an older timestamp after this client's newest
+            conditions.append("id > ?")
+            params.append(since_id)
+        if since:
+            conditions.append("timestamp > ?")
+            params.append(since)
+        if before and before_id is not None:
+            conditions.append("(timestamp, id) < (?, ?)")
+            params.extend([before, before_id])
+        elif before:
+            conditions.append("timestamp < ?")
+            params.append(before)
+
+        # Walk the index newest-first when we want the latest 'limit' messages, then flip back to oldest-first
+        newest_first = limit is not None and not since and since_id is None
+        direction = 'DESC' if newest_first else 'ASC'
+        # An incremental refresh comes back in insert order, so its last entry carries the next since_id
+        order_by = f"id {direction}" if since_id is not None else f"timestamp {direction}, id {direction}"
+        sql_query = (
+            f"SELECT id, timestamp, query, response FROM chat_history WHERE {' AND '.join(conditions)} "
+            f"ORDER BY {order_by}"
+        )
+        if limit is not None:
+            sql_query += " LIMIT ?"
+            params.append(limit)
+        with metrics.stage('history_read'):
+            chat_logs = conn.execute(sql_query, params).fetchall()
+        if newest_first:
+            chat_logs.reverse()
+
         # Convert rows to a list of dictionaries
-        history = [dict(row) for row in chat_logs]
-        return jsonify(history)
+        with metrics.stage('serialize'):
+            history = [dict(row) for row in chat_logs]
+            return jsonify(history)
     except sqlite3.Error as e:
         print(f"Error fetching chat history: {e}")
         return jsonify({"message": "Error fetching chat history.", "error": str(e)}), 500
-    finally:
-        if conn:
-            conn.close()
 
 @app.route('/api/checkout', methods=['POST'])
 @verify_token
@@ -370,74 +1095,43 @@ def checkout():
         return jsonify({"message": "Database connection error."}), 500
 
     try:
-        cursor = conn.cursor()
-        total_amount = 0
-        products_for_order = []
+        order_lines = []
 
-        # Validate products and calculate total amount
+        # Validate every cart line before touching the database
         for item in cart_items:
             product_id = item.get('id')
             quantity = item.get('quantity')
 
             if not isinstance(product_id, (int, float)) or not isinstance(quantity, int) or quantity <= 0:
-                conn.close()
                 return jsonify({"message": f"Invalid product ID or quantity for item: {item}. Product IDs must be numeric (int/float) and quantity must be a positive integer."}), 400
-            
+
             # Convert product_id to int in case it came as float (e.g. from JSON parsing)
-            product_id = int(product_id)
-
-            # Fetch product details from DB to ensure price is correct and product exists
-            product_db = cursor.execute("SELECT id, name, price FROM products WHERE id = ?", (product_id,)).fetchone()
-            if not product_db:
-                conn.close()
-                return jsonify({"message": f"Product with ID {product_id} not found in inventory."}), 404
-
-            price_at_purchase = product_db['price']
-            total_amount += price_at_purchase * quantity
-            products_for_order.append({
-                'product_id': product_id,
-                'quantity': quantity,
-                'price_at_purchase': price_at_purchase
-            })
-
-        # Insert into orders table
-        order_date = datetime.now().isoformat()
-        cursor.execute(
-            "INSERT INTO orders (user_id, order_date, total_amount, status) VALUES (?, ?, ?, ?)",
-            (user_id, order_date, total_amount, 'completed') # Assuming direct completion for this simple case
-        )
-        order_id = cursor.lastrowid # Get the ID of the newly created order
+            order_lines.append((int(product_id), quantity))
 
-        # Insert into order_items table
-        for item in products_for_order:
-            cursor.execute(
-                "INSERT INTO order_items (order_id, product_id, quantity, price_at_purchase) VALUES (?, ?, ?, ?)",
-                (order_id, item['product_id'], item['quantity'], item['price_at_purchase'])
+        # One price lookup and one executemany for the whole cart (see orders.py)
+        with metrics.stage('checkout_sql'):
+            order_id, total_amount = place_order(
+                conn, user_id, order_lines, datetime.now().isoformat(),
+                status='completed' # Assuming direct completion for this simple case
             )
-
-        conn.commit()
-        conn.close()
         return jsonify({"message": "Order placed successfully!", "order_id": order_id, "total_amount": round(total_amount, 2)}), 201
 
+    except ProductNotFoundError as e:
+        return jsonify({"message": str(e)}), 404
     except sqlite3.Error as e:
         conn.rollback() # Rollback in case of an error during transaction
         print(f"Database error during checkout: {e}")
         return jsonify({"message": "Database error during checkout.", "error": str(e)}), 500
     except Exception as e:
+        conn.rollback()
         print(f"Server error during checkout: {e}")
         return jsonify({"message": "An unexpected error occurred.", "error": str(e)}), 500
-    finally:
-        if conn:
-            conn.close()
 
 # --- Run the App ---
 if __name__ == '__main__':
     # This block is for local development when you run 'python app.py' directly.
     # It will not be executed when Gunicorn runs your app on Render.
-    # The init_db() and add_sample_products() at the top-level are for Gunicorn.
-    with app.app_context():
-        init_db()
-        add_sample_products()
+    create_app()
 
     # UPDATED: Set debug=False for production readiness (even if this block isn't used by Gunicorn)
     app.run(debug=False, host='0.0.0.0', port=5000)
\ No newline at end of file
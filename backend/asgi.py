@@ -0,0 +1,170 @@
+# backend/asgi.py
+# Async serving mode: exposes the Flask routes from app.py as an ASGI application.
+# The event loop owns the sockets, so idle or slow clients cost a coroutine rather
+# than a worker. Each request's Flask handler (SQLite queries, token verification on
+# a cache miss) runs in a bounded thread pool, so a blocked write or a slow Firebase
+# key refresh ties up one pool slot instead of the whole process.
+#
+# Run from the backend directory with:
+#   uvicorn asgi:application --host 0.0.0.0 --port 5000
+# ASGI_MAX_THREADS (default 64) bounds how many requests run handlers concurrently.
+# A client that disconnects mid-response stops its handler at the next chunk (closing
+# the response iterable, so generator cleanup runs) instead of streaming to nobody.
+import io
+import os
+import sys
+import threading
+import traceback
+
+import anyio
+import anyio.from_thread
+import anyio.to_thread
+
+from app import app, chat_history_writer
+
+
+class WSGIToASGI:
+    """Minimal ASGI adapter that runs a WSGI app in a bounded worker-thread pool."""
+
+    def __init__(self, wsgi_app, max_threads=64):
+        self.wsgi_app = wsgi_app
+        self.max_threads = max_threads
+        self._limiter = None
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+        elif scope['type'] == 'http':
+            await self._http(scope, receive, send)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                # Drain the write-behind chat history queue before the process exits
+                await anyio.to_thread.run_sync(chat_history_writer.shutdown)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def _http(self, scope, receive, send):
+        if self._limiter is None:
+            self._limiter = anyio.CapacityLimiter(self.max_threads)
+
+        body = bytearray()
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return
+            body.extend(message.get('body', b''))
+            if not message.get('more_body'):
+                break
+
+        environ = self._build_environ(scope, bytes(body))
+        disconnected = threading.Event()
+        async with anyio.create_task_group() as task_group:
+            task_group.start_soon(self._watch_disconnect, receive, disconnected)
+            try:
+                await anyio.to_thread.run_sync(self._run_wsgi, environ, send, disconnected, limiter=self._limiter)
+            finally:
+                task_group.cancel_scope.cancel()
+
+    @staticmethod
+    async def _watch_disconnect(receive, disconnected):
+        # The body has been read in full, so the only message left to arrive is the disconnect
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                disconnected.set()
+                return
+
+    @staticmethod
+    def _build_environ(scope, body):
+        server_name, server_port = scope.get('server') or ('localhost', 80)
+        environ = {
+            'REQUEST_METHOD': scope['method'],
+            'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+            'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+            'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+            'SERVER_NAME': server_name,
+            'SERVER_PORT': str(server_port),
+            'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+            'REMOTE_ADDR': scope['client'][0] if scope.get('client') else '',
+            'CONTENT_LENGTH': str(len(body)),
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': scope.get('scheme', 'http'),
+            'wsgi.input': io.BytesIO(body),
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': True,
+            'wsgi.run_once': False,
+        }
+        for raw_name, raw_value in scope.get('headers', []):
+            name = raw_name.decode('latin-1').upper().replace('-', '_')
+            value = raw_value.decode('latin-1')
+            if name == 'CONTENT_TYPE':
+                environ['CONTENT_TYPE'] = value
+                continue
+            if name == 'CONTENT_LENGTH':
+                continue
+            key = f'HTTP_{name}'
+            environ[key] = f"{environ[key]},{value}" if key in environ else value
+        return environ
+
+    def _run_wsgi(self, environ, send, disconnected):
+        """Runs in a worker thread; hands each chunk back to the event loop as soon as it is produced."""
+        response_start = {}
+        started = False
+
+        def start_response(status, headers, exc_info=None):
+            # PEP 3333: a second call is only allowed with exc_info, and only replaces
+            # the status and headers if none of them have been sent yet
+            if exc_info is not None:
+                try:
+                    if started:
+                        raise exc_info[1].with_traceback(exc_info[2])
+                finally:
+                    exc_info = None # Avoid a reference cycle through the traceback
+            elif response_start:
+                raise AssertionError("start_response() called a second time without exc_info")
+            response_start['status'] = int(status.split(' ', 1)[0])
+            response_start['headers'] = [
+                (name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers
+            ]
+            return lambda _data: None # write() callable is not supported
+
+        def send_from_thread(message):
+            anyio.from_thread.run(send, message)
+
+        try:
+            iterable = self.wsgi_app(environ, start_response)
+            try:
+                for chunk in iterable:
+                    if disconnected.is_set():
+                        return # Nobody is listening; close the iterable and free the thread
+                    if not chunk:
+                        continue
+                    if not started:
+                        send_from_thread({'type': 'http.response.start', **response_start})
+                        started = True
+                    send_from_thread({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+            finally:
+                if hasattr(iterable, 'close'):
+                    iterable.close()
+        except Exception:
+            if started or disconnected.is_set():
+                raise # Too late for an error response; the server drops the connection instead
+            traceback.print_exc(file=environ['wsgi.errors'])
+            send_from_thread({'type': 'http.response.start', 'status': 500,
+                              'headers': [(b'content-type', b'text/plain; charset=utf-8')]})
+            send_from_thread({'type': 'http.response.body', 'body': b'Internal Server Error', 'more_body': False})
+            return
+        if disconnected.is_set():
+            return
+        if not started:
+            send_from_thread({'type': 'http.response.start', **response_start})
+        send_from_thread({'type': 'http.response.body', 'body': b'', 'more_body': False})
+
+
+application = WSGIToASGI(app, max_threads=int(os.getenv('ASGI_MAX_THREADS', '64')))
@@ -0,0 +1,171 @@
+# backend/benchmarks/bench_checkout.py
+# Checkout latency against cart size: the old per-line statements vs. the batched
+# orders.place_order, plus a concurrent run to confirm checkouts queue on the write
+# lock instead of failing with "database is locked".
+#
+# Usage (from the backend directory):
+#   python benchmarks/bench_checkout.py [--sizes 1,10,50,200,1000] [--repeat 50] [--threads 8] [--json out.json]
+import argparse
+import json
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db import open_connection  # noqa: E402
+from orders import place_order  # noqa: E402
+
+NUM_PRODUCTS = 5000
+
+
+def create_database(path):
+    conn = open_connection(path)
+    conn.executescript('''
+        CREATE TABLE products (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            category TEXT NOT NULL,
+            price REAL NOT NULL,
+            description TEXT
+        );
+        CREATE TABLE orders (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id TEXT NOT NULL,
+            order_date TEXT NOT NULL,
+            total_amount REAL NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending'
+        );
+        CREATE TABLE order_items (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            order_id INTEGER NOT NULL,
+            product_id INTEGER NOT NULL,
+            quantity INTEGER NOT NULL,
+            price_at_purchase REAL NOT NULL
+        );
+    ''')
+    conn.executemany(
+        "INSERT INTO products (name, category, price, description) VALUES (?, ?, ?, ?)",
+        [(f"Product {i}", "Electronics", round(random.uniform(10.0, 1500.0), 2), "Benchmark product")
+         for i in range(NUM_PRODUCTS)]
+    )
+    conn.commit()
+    conn.close()
+
+
+def legacy_place_order(conn, user_id, items, order_date, status='completed'):
+    """The pre-batching checkout: one SELECT and one INSERT per cart line."""
+    cursor = conn.cursor()
+    total_amount = 0
+    lines = []
+    for product_id, quantity in items:
+        product = cursor.execute("SELECT id, name, price FROM products WHERE id = ?", (product_id,)).fetchone()
+        total_amount += product['price'] * quantity
+        lines.append((product_id, quantity, product['price']))
+    cursor.execute(
+        "INSERT INTO orders (user_id, order_date, total_amount, status) VALUES (?, ?, ?, ?)",
+        (user_id, order_date, total_amount, status)
+    )
+    order_id = cursor.lastrowid
+    for product_id, quantity, price in lines:
+        cursor.execute(
+            "INSERT INTO order_items (order_id, product_id, quantity, price_at_purchase) VALUES (?, ?, ?, ?)",
+            (order_id, product_id, quantity, price)
+        )
+    conn.commit()
+    return order_id, total_amount
+
+
+def random_cart(size):
+    return [(random.randint(1, NUM_PRODUCTS), random.randint(1, 5)) for _ in range(size)]
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def time_checkouts(conn, implementation, cart_size, repeat):
+    samples = []
+    for _ in range(repeat):
+        cart = random_cart(cart_size)
+        started = time.perf_counter()
+        implementation(conn, "bench-user", cart, datetime.now().isoformat())
+        samples.append((time.perf_counter() - started) * 1000)
+    return {
+        "mean_ms": round(statistics.mean(samples), 3),
+        "p50_ms": round(percentile(samples, 0.50), 3),
+        "p99_ms": round(percentile(samples, 0.99), 3),
+    }
+
+
+def run_concurrent(path, implementation, threads, orders_per_thread, cart_size):
+    errors = []
+
+    def worker():
+        conn = open_connection(path)
+        for _ in range(orders_per_thread):
+            try:
+                implementation(conn, "bench-user", random_cart(cart_size), datetime.now().isoformat())
+            except sqlite3.OperationalError as e:
+                conn.rollback()
+                errors.append(str(e))
+        conn.close()
+
+    started = time.perf_counter()
+    pool = [threading.Thread(target=worker) for _ in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    return {
+        "orders": threads * orders_per_thread,
+        "errors": len(errors),
+        "orders_per_sec": round((threads * orders_per_thread - len(errors)) / elapsed, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Checkout latency against cart size.")
+    parser.add_argument('--sizes', default='1,10,50,200,1000', help="Comma-separated cart sizes")
+    parser.add_argument('--repeat', type=int, default=50, help="Checkouts per cart size")
+    parser.add_argument('--threads', type=int, default=8, help="Threads for the concurrent run")
+    parser.add_argument('--json', help="Also write results to this file")
+    args = parser.parse_args()
+    sizes = [int(size) for size in args.sizes.split(',')]
+    implementations = {"legacy": legacy_place_order, "batched": place_order}
+
+    results = {"latency": [], "concurrent": {}}
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.db')
+        create_database(path)
+        conn = open_connection(path)
+
+        print(f"{'cart size':>10} {'impl':>8} {'mean ms':>10} {'p50 ms':>10} {'p99 ms':>10}")
+        for size in sizes:
+            for name, implementation in implementations.items():
+                timing = time_checkouts(conn, implementation, size, args.repeat)
+                results["latency"].append({"cart_size": size, "impl": name, **timing})
+                print(f"{size:>10} {name:>8} {timing['mean_ms']:>10} {timing['p50_ms']:>10} {timing['p99_ms']:>10}")
+        conn.close()
+
+        print(f"\nConcurrent checkouts ({args.threads} threads, cart size 20):")
+        for name, implementation in implementations.items():
+            outcome = run_concurrent(path, implementation, args.threads, 25, 20)
+            results["concurrent"][name] = outcome
+            print(f"{name:>8}: {outcome['orders_per_sec']} orders/s, {outcome['errors']} errors")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
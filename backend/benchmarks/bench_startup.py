@@ -0,0 +1,171 @@
+# backend/benchmarks/bench_startup.py
+# Cold-start cost of the backend, phase by phase, each run in a fresh interpreter:
+#   import        - `import app` (should do no database or Firebase work)
+#   create_app    - schema check + search index warm-up, on a database that still needs
+#                   migrating and on one already migrated by a previous start
+#   first_request - the first authenticated request, which initialises Firebase lazily
+# and, if gunicorn is installed, the time until a multi-worker server answers its first
+# request and a burst spread over all workers, with preload_app on and off.
+#
+# Usage (from the backend directory):
+#   python benchmarks/bench_startup.py [--size 10000] [--repeat 5] [--workers 4] [--json out.json]
+import argparse
+import importlib.util
+import json
+import os
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCHMARKS_DIR)
+sys.path.insert(0, BENCHMARKS_DIR)
+
+from run_benchmarks import BENCH_USER, seed_database  # noqa: E402
+
+
+def measure_child(workdir):
+    """Runs in a child process: time each startup phase of the app in workdir."""
+    import offline_app
+
+    offline_app.prepare(workdir)
+    started = time.perf_counter()
+    import app as app_module
+    import_seconds = time.perf_counter() - started
+
+    # Stub verification without importing firebase_admin up front, so its import and
+    # initialize_app still land in the first request as they do in production
+    def verify_id_token(id_token):
+        app_module.init_firebase()
+        return offline_app.stub_verify_id_token(id_token)
+    app_module.verify_id_token = verify_id_token
+
+    started = time.perf_counter()
+    app_module.create_app()
+    create_app_seconds = time.perf_counter() - started
+
+    client = app_module.app.test_client()
+    started = time.perf_counter()
+    response = client.get('/api/products?limit=50', headers={"Authorization": f"Bearer {BENCH_USER}"})
+    first_request_seconds = time.perf_counter() - started
+    if response.status_code != 200:
+        raise RuntimeError(f"First request failed with {response.status_code}: {response.get_data(as_text=True)[:200]}")
+    app_module.chat_history_writer.shutdown()
+    return {
+        "import_ms": round(import_seconds * 1000, 1),
+        "create_app_ms": round(create_app_seconds * 1000, 1),
+        "first_request_ms": round(first_request_seconds * 1000, 1),
+    }
+
+
+def run_child(workdir):
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--child', workdir],
+        cwd=BACKEND_DIR, check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def median_phases(runs):
+    return {phase: round(statistics.median(run[phase] for run in runs), 1) for phase in runs[0]}
+
+
+def wait_for_response(url, headers, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(urllib.request.Request(url, headers=headers), timeout=5) as response:
+                response.read()
+                return
+        except OSError:
+            time.sleep(0.01)
+    raise RuntimeError(f"No response from {url} within {timeout}s")
+
+
+def time_gunicorn(workdir, workers, preload, port):
+    """Seconds until a fresh gunicorn answers one request, then a burst of 8 per worker."""
+    config_path = os.path.join(workdir, 'gunicorn.bench.py')
+    with open(config_path, 'w') as f:
+        f.write(f"preload_app = {preload}\n")
+    env = {**os.environ, "BENCH_WORKDIR": workdir}
+    url = f"http://127.0.0.1:{port}/api/products?limit=50"
+    headers = {"Authorization": f"Bearer {BENCH_USER}"}
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', config_path, '-w', str(workers), '-b', f'127.0.0.1:{port}',
+         '--pythonpath', BENCHMARKS_DIR, 'offline_app:application'],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        wait_for_response(url, headers)
+        first_response = time.perf_counter() - started
+        with ThreadPoolExecutor(max_workers=workers * 8) as pool:
+            list(pool.map(lambda _: wait_for_response(url, headers), range(workers * 8)))
+        burst_done = time.perf_counter() - started
+    finally:
+        server.terminate()
+        server.wait()
+    return {"first_response_ms": round(first_response * 1000, 1), "burst_done_ms": round(burst_done * 1000, 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold-start time of the backend, phase by phase.")
+    parser.add_argument('--size', type=int, default=10000, help="Products in the generated catalog")
+    parser.add_argument('--repeat', type=int, default=5, help="Runs per scenario (the median is reported)")
+    parser.add_argument('--workers', type=int, default=4, help="gunicorn workers (0 skips the gunicorn runs)")
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--json', help="Also write results to this file")
+    parser.add_argument('--child', help=argparse.SUPPRESS) # Child-process mode
+    args = parser.parse_args()
+    if args.child:
+        print(json.dumps(measure_child(args.child)))
+        return
+
+    results = {"size": args.size}
+    with tempfile.TemporaryDirectory() as tmp:
+        seeded = os.path.join(tmp, 'seeded.db')
+        seed_database(seeded, args.size)
+        # Mark the copy as behind so the first start in each run re-applies the schema, like after an upgrade
+        conn = sqlite3.connect(seeded)
+        conn.execute("PRAGMA user_version = 0")
+        conn.close()
+
+        unmigrated, migrated = [], []
+        for i in range(args.repeat):
+            workdir = os.path.join(tmp, f'run-{i}')
+            os.makedirs(workdir)
+            shutil.copy(seeded, os.path.join(workdir, 'ecommerce.db'))
+            unmigrated.append(run_child(workdir)) # Migrates the schema
+            migrated.append(run_child(workdir))   # Starts against what the first run left behind
+        results["unmigrated"] = median_phases(unmigrated)
+        results["migrated"] = median_phases(migrated)
+
+        print(f"{'database':>12} {'import ms':>10} {'create_app ms':>14} {'first req ms':>13}")
+        for name in ("unmigrated", "migrated"):
+            phases = results[name]
+            print(f"{name:>12} {phases['import_ms']:>10} {phases['create_app_ms']:>14} {phases['first_request_ms']:>13}")
+
+        if args.workers and importlib.util.find_spec('gunicorn'):
+            results["gunicorn"] = {}
+            print(f"\ngunicorn, {args.workers} workers, migrated database:")
+            for preload in (False, True):
+                runs = [time_gunicorn(os.path.join(tmp, 'run-0'), args.workers, preload, args.port)
+                        for _ in range(args.repeat)]
+                timing = median_phases(runs)
+                results["gunicorn"]["preload" if preload else "no_preload"] = timing
+                print(f"{'preload' if preload else 'no preload':>12}: first response {timing['first_response_ms']} ms, "
+                      f"{args.workers * 8} requests done at {timing['burst_done_ms']} ms")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
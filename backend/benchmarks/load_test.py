@@ -0,0 +1,162 @@
+# backend/benchmarks/load_test.py
+# Load test comparing the WSGI path (gunicorn sync workers) with the ASGI path
+# (uvicorn + asgi.py) on the same offline app and request mix.
+# Optional slow clients trickle a request body over several seconds, the way a
+# phone on a bad connection would; each one pins a sync worker but only costs the
+# ASGI server a coroutine.
+#
+# Usage (from the backend directory):
+#   python benchmarks/load_test.py [--duration 10] [--concurrency 50] [--slow-clients 20] [--workers 4] [--json out.json]
+import argparse
+import asyncio
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCHMARKS_DIR = os.path.join(BACKEND_DIR, 'benchmarks')
+
+REQUEST_MIX = [
+    ('GET', '/api/products?limit=20', None),
+    ('POST', '/api/chatbot', {"query": "laptop"}),
+    ('POST', '/api/chatbot', {"query": "show me smart devices"}),
+    ('GET', '/api/chat_history?limit=20', None),
+]
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def server_command(mode, port, workers):
+    if mode == 'wsgi':
+        return [sys.executable, '-m', 'gunicorn', '--pythonpath', BENCHMARKS_DIR, '--workers', str(workers),
+                '--bind', f'127.0.0.1:{port}', '--log-level', 'warning', 'offline_app:application']
+    return [sys.executable, '-m', 'uvicorn', '--app-dir', BENCHMARKS_DIR, '--host', '127.0.0.1',
+            '--port', str(port), '--log-level', 'warning', 'offline_app:asgi_application']
+
+
+def wait_until_ready(url, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if httpx.get(url, timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"Server at {url} did not start within {timeout}s")
+
+
+async def slow_client(port, stop):
+    """Sends a chatbot request whose body arrives one byte every 200ms."""
+    body = json.dumps({"query": "laptop"}).encode('utf-8')
+    while not stop.is_set():
+        try:
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            writer.write(
+                b"POST /api/chatbot HTTP/1.1\r\nHost: localhost\r\nAuthorization: Bearer slow-client\r\n"
+                b"Content-Type: application/json\r\nContent-Length: " + str(len(body)).encode() + b"\r\n\r\n"
+            )
+            for byte in body:
+                if stop.is_set():
+                    break
+                writer.write(bytes([byte]))
+                await writer.drain()
+                await asyncio.sleep(0.2)
+            await reader.read(65536)
+            writer.close()
+        except OSError:
+            await asyncio.sleep(0.2)
+
+
+async def active_client(client, client_id, deadline, latencies, errors):
+    index = client_id
+    headers = {"Authorization": f"Bearer load-user-{client_id % 100}"}
+    while time.perf_counter() < deadline:
+        method, path, payload = REQUEST_MIX[index % len(REQUEST_MIX)]
+        index += 1
+        started = time.perf_counter()
+        try:
+            response = await client.request(method, path, json=payload, headers=headers)
+            if response.status_code >= 400:
+                errors.append(response.status_code)
+            else:
+                latencies.append((time.perf_counter() - started) * 1000)
+        except httpx.HTTPError as e:
+            errors.append(type(e).__name__)
+
+
+async def run_load(port, duration, concurrency, slow_clients):
+    latencies = []
+    errors = []
+    stop = asyncio.Event()
+    slow_tasks = [asyncio.create_task(slow_client(port, stop)) for _ in range(slow_clients)]
+    await asyncio.sleep(0.5) # Let slow clients occupy their connections first
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=f'http://127.0.0.1:{port}', limits=limits, timeout=30) as client:
+        deadline = time.perf_counter() + duration
+        started = time.perf_counter()
+        await asyncio.gather(*(active_client(client, i, deadline, latencies, errors) for i in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    stop.set()
+    for task in slow_tasks:
+        task.cancel()
+    await asyncio.gather(*slow_tasks, return_exceptions=True)
+
+    ordered = sorted(latencies)
+    return {
+        "requests": len(latencies),
+        "errors": len(errors),
+        "throughput_rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(ordered[len(ordered) // 2], 2) if ordered else None,
+        "p99_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))], 2) if ordered else None,
+        "mean_ms": round(statistics.mean(latencies), 2) if latencies else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare WSGI (gunicorn) and ASGI (uvicorn) serving under load.")
+    parser.add_argument('--duration', type=float, default=10, help="Seconds of load per server")
+    parser.add_argument('--concurrency', type=int, default=50, help="Concurrent active clients")
+    parser.add_argument('--slow-clients', type=int, default=20, help="Clients that trickle their request body")
+    parser.add_argument('--workers', type=int, default=4, help="gunicorn sync workers for the WSGI run")
+    parser.add_argument('--modes', default='wsgi,asgi')
+    parser.add_argument('--json', help="Also write results to this file")
+    args = parser.parse_args()
+
+    results = {}
+    for mode in args.modes.split(','):
+        with tempfile.TemporaryDirectory() as workdir:
+            port = free_port()
+            env = dict(os.environ, BENCH_WORKDIR=workdir)
+            server = subprocess.Popen(server_command(mode, port, args.workers), cwd=BACKEND_DIR, env=env,
+                                      stdout=subprocess.DEVNULL)
+            try:
+                wait_until_ready(f'http://127.0.0.1:{port}/')
+                results[mode] = asyncio.run(run_load(port, args.duration, args.concurrency, args.slow_clients))
+            finally:
+                server.terminate()
+                server.wait(timeout=30)
+        outcome = results[mode]
+        print(f"{mode}: {outcome['throughput_rps']} req/s, p50 {outcome['p50_ms']} ms, "
+              f"p99 {outcome['p99_ms']} ms, {outcome['errors']} errors")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({"config": vars(args), "results": results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+# backend/benchmarks/offline_app.py
+# Boots app.py for benchmarks without network access or real Firebase credentials:
+# a throwaway service-account key satisfies the credential loader, the database lives
+# in a scratch directory, and auth.verify_id_token is replaced by a stub that accepts
+# any bearer token and uses it as the uid.
+#
+# Importable as a server entry point from the backend directory, e.g.
+#   BENCH_WORKDIR=/tmp/bench gunicorn --pythonpath benchmarks offline_app:application
+#   BENCH_WORKDIR=/tmp/bench uvicorn --app-dir benchmarks offline_app:asgi_application
+import json
+import os
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def write_throwaway_credentials(path):
+    """A syntactically valid service-account file; the key is never used to call Google."""
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import rsa
+
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    private_key = key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+    ).decode('ascii')
+    with open(path, 'w') as f:
+        json.dump({
+            "type": "service_account",
+            "project_id": "offline-benchmark",
+            "private_key_id": "offline",
+            "private_key": private_key,
+            "client_email": "benchmark@offline-benchmark.iam.gserviceaccount.com",
+            "client_id": "0",
+            "token_uri": "https://oauth2.googleapis.com/token",
+        }, f)
+
+
+def stub_verify_id_token(id_token, *args, **kwargs):
+    return {"uid": id_token, "exp": time.time() + 3600}
+
+
+def prepare(workdir):
+    """Point the app at workdir (database, caches, credentials). Must run before importing app."""
+    os.makedirs(workdir, exist_ok=True)
+    credentials_path = os.path.join(workdir, 'offline-service-account.json')
+    if not os.path.exists(credentials_path):
+        write_throwaway_credentials(credentials_path)
+    os.environ['GOOGLE_APPLICATION_CREDENTIALS'] = credentials_path
+    # Benchmarks drive thousands of chatbot requests from a handful of uids; measure the search, not the throttle
+    os.environ.setdefault('CHATBOT_RATE_LIMIT', '0')
+    os.chdir(workdir) # DATABASE and SEARCH_CACHE_PATH are relative paths
+    if BACKEND_DIR not in sys.path:
+        sys.path.insert(0, BACKEND_DIR)
+
+
+def load_app():
+    """Import app.py with token verification stubbed out; returns the module."""
+    import app as app_module
+    from firebase_admin import auth
+
+    auth.verify_id_token = stub_verify_id_token
+    app_module.create_app()
+    return app_module
+
+
+if os.getenv('BENCH_WORKDIR'):
+    prepare(os.environ['BENCH_WORKDIR'])
+    app_module = load_app()
+    application = app_module.app
+    from asgi import application as asgi_application  # noqa: E402,F401
@@ -0,0 +1,227 @@
+# backend/benchmarks/run_benchmarks.py
+# Offline micro-benchmarks for the backend endpoints.
+# For each catalog size a fresh app process is booted via offline_app.py (stubbed
+# token verification, scratch database), the catalog is generated from the same
+# templates as add_sample_products(), and every scenario is driven through the Flask
+# test client. Results are written as JSON so runs from two commits can be diffed.
+#
+# Usage (from the backend directory):
+#   python benchmarks/run_benchmarks.py [--sizes 1000,100000,1000000] [--requests 200] [--out results.json]
+#   python benchmarks/run_benchmarks.py --compare baseline.json [--threshold 20]   # exits 1 on regressions
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCHMARKS_DIR)
+sys.path.insert(0, BACKEND_DIR)
+
+from schema import create_schema  # noqa: E402
+
+# Same templates as add_sample_products() in app.py
+CATEGORIES = ["Electronics", "Books", "Apparel", "Home Appliances", "Sports & Outdoors", "Beauty"]
+ADJECTIVES = ["Advanced", "Smart", "Portable", "Durable", "Eco-friendly", "Classic", "Ergonomic", "High-Performance"]
+NOUNS = ["Gadget", "Tool", "Accessory", "Wearable", "Device", "System", "Kit", "Supply"]
+
+INTENT_QUERIES = ["hello", "what categories do you have", "thanks", "show all products"]
+SEARCH_QUERIES = ["laptop", "smart device", "books", "portable kit", "ergonomic wearable", "home appliances",
+                  "running shoes", "eco-friendly supply", "classic gadget", "durable tool"]
+
+CHAT_HISTORY_ROWS = 5000
+BENCH_USER = "bench-user"
+
+
+def generate_products(count, seed=1234):
+    rng = random.Random(seed)
+    for i in range(1, count + 1):
+        name = f"{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} {i}"
+        category = rng.choice(CATEGORIES)
+        price = round(rng.uniform(10.0, 1500.0), 2)
+        description = f"A high-quality {category.lower()} item ({name.lower()}) with various features designed for modern living. Ideal for everyday use."
+        yield (name, category, price, description)
+
+
+def seed_database(path, size):
+    """Create the app's schema and fill products and chat_history before the app boots."""
+    conn = sqlite3.connect(path)
+    create_schema(conn, fts5=os.getenv('SEARCH_BACKEND', 'index') == 'fts5')
+    generator = generate_products(size)
+    while True:
+        batch = [row for _, row in zip(range(50000), generator)]
+        if not batch:
+            break
+        conn.executemany("INSERT INTO products (name, category, price, description) VALUES (?, ?, ?, ?)", batch)
+    conn.executemany(
+        "INSERT INTO chat_history (user_id, timestamp, query, response) VALUES (?, ?, ?, ?)",
+        [(f"user-{i % 50}" if i % 5 else BENCH_USER, f"2025-01-01T00:00:{i:08d}", "laptop", "I found 1 product(s).")
+         for i in range(CHAT_HISTORY_ROWS)]
+    )
+    conn.commit()
+    conn.close()
+
+
+def summarise(samples, elapsed):
+    ordered = sorted(samples)
+    return {
+        "requests": len(samples),
+        "p50_ms": round(ordered[len(ordered) // 2], 3),
+        "p99_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))], 3),
+        "mean_ms": round(statistics.mean(samples), 3),
+        "throughput_rps": round(len(samples) / elapsed, 1),
+    }
+
+
+def run_scenario(make_request, count, before_each=None):
+    """Time count requests; before_each(i), if given, runs before each one and isn't counted."""
+    samples = []
+    elapsed = 0.0
+    for i in range(count):
+        if before_each:
+            before_each(i)
+        request_started = time.perf_counter()
+        response = make_request(i)
+        request_seconds = time.perf_counter() - request_started
+        samples.append(request_seconds * 1000)
+        elapsed += request_seconds
+        if response.status_code >= 400:
+            raise RuntimeError(f"Benchmark request failed with {response.status_code}: {response.get_data(as_text=True)[:200]}")
+    return summarise(samples, elapsed)
+
+
+def benchmark_single_size(size, count):
+    """Runs in a child process: boot the offline app on a generated catalog and time every scenario."""
+    sys.path.insert(0, BENCHMARKS_DIR)
+    import offline_app
+
+    with tempfile.TemporaryDirectory() as workdir:
+        offline_app.prepare(workdir)
+        seed_started = time.perf_counter()
+        seed_database(os.path.join(workdir, 'ecommerce.db'), size)
+        seed_seconds = time.perf_counter() - seed_started
+
+        boot_started = time.perf_counter()
+        app_module = offline_app.load_app()
+        boot_seconds = time.perf_counter() - boot_started
+
+        client = app_module.app.test_client()
+        headers = {"Authorization": f"Bearer {BENCH_USER}"}
+        rng = random.Random(42)
+        etag = client.get('/api/products', headers=headers).headers.get('ETag')
+
+        scenarios = {
+            "products_full": lambda i: client.get('/api/products', headers={**headers, "Accept-Encoding": "gzip"}),
+            "products_not_modified": lambda i: client.get('/api/products', headers={**headers, "If-None-Match": etag}),
+            "products_page": lambda i: client.get(
+                f'/api/products?category={CATEGORIES[i % len(CATEGORIES)]}&sort=price_asc&limit=50', headers=headers),
+            "chatbot_intent_mix": lambda i: client.post(
+                '/api/chatbot', json={"query": INTENT_QUERIES[i % len(INTENT_QUERIES)]}, headers=headers),
+            # Cold: the search cache is emptied before every request, so each one runs the search
+            "chatbot_search_mix": lambda i: client.post(
+                '/api/chatbot', json={"query": rng.choice(SEARCH_QUERIES)}, headers=headers),
+            # Warm: the same queries answered from the search cache after their first request
+            "chatbot_search_cached": lambda i: client.post(
+                '/api/chatbot', json={"query": SEARCH_QUERIES[i % len(SEARCH_QUERIES)]}, headers=headers),
+            "chat_history": lambda i: client.get('/api/chat_history?limit=50', headers=headers),
+            "checkout": lambda i: client.post('/api/checkout', headers=headers, json={"cartItems": [
+                {"id": rng.randint(1, size), "quantity": rng.randint(1, 3)} for _ in range(5)
+            ]}),
+        }
+        before_each = {"chatbot_search_mix": lambda i: app_module.search_cache.clear()}
+        results = {name: run_scenario(make_request, count, before_each.get(name))
+                   for name, make_request in scenarios.items()}
+        app_module.chat_history_writer.shutdown()
+
+    return {"seed_seconds": round(seed_seconds, 2), "boot_seconds": round(boot_seconds, 2), "scenarios": results}
+
+
+def environment_metadata():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BACKEND_DIR,
+                                capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "platform": platform.platform(),
+        "search_backend": os.getenv('SEARCH_BACKEND', 'index'),
+    }
+
+
+def compare(baseline_path, current, threshold):
+    """Print p50/p99 changes against a previous results file; returns True if anything regressed past threshold%."""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    regressed = False
+    print(f"\nComparison with {baseline_path} (commit {baseline['meta'].get('commit')}):")
+    for size, size_results in current["results"].items():
+        old_size_results = baseline["results"].get(size)
+        if not old_size_results:
+            continue
+        for scenario, timing in size_results["scenarios"].items():
+            old_timing = old_size_results["scenarios"].get(scenario)
+            if not old_timing:
+                continue
+            for metric in ("p50_ms", "p99_ms"):
+                change = (timing[metric] - old_timing[metric]) / old_timing[metric] * 100 if old_timing[metric] else 0.0
+                flag = ""
+                if change > threshold:
+                    flag = "  <-- REGRESSION"
+                    regressed = True
+                print(f"  {size:>8} {scenario:<24} {metric}: {old_timing[metric]:>9} -> {timing[metric]:>9} ({change:+.1f}%){flag}")
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline latency/throughput benchmarks for the backend endpoints.")
+    parser.add_argument('--sizes', default='1000,100000', help="Comma-separated catalog sizes (e.g. 1000,100000,1000000)")
+    parser.add_argument('--requests', type=int, default=200, help="Requests per scenario")
+    parser.add_argument('--out', default='bench_results.json', help="Where to write the JSON results")
+    parser.add_argument('--compare', help="Previous results file to diff against")
+    parser.add_argument('--threshold', type=float, default=20.0, help="Percent slowdown that counts as a regression")
+    parser.add_argument('--single-size', type=int, help=argparse.SUPPRESS) # Child-process mode
+    args = parser.parse_args()
+
+    if args.single_size:
+        print(json.dumps(benchmark_single_size(args.single_size, args.requests)))
+        return
+
+    current = {"meta": environment_metadata(), "config": {"requests": args.requests}, "results": {}}
+    for size in [int(size) for size in args.sizes.split(',')]:
+        print(f"Benchmarking catalog of {size} products...", flush=True)
+        # Fresh process per size so module-level state (indexes, caches) starts cold every time
+        child = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--single-size', str(size), '--requests', str(args.requests)],
+            cwd=BACKEND_DIR, capture_output=True, text=True
+        )
+        if child.returncode != 0:
+            sys.stderr.write(child.stderr)
+            raise SystemExit(f"Benchmark for size {size} failed")
+        size_results = json.loads(child.stdout.strip().splitlines()[-1])
+        current["results"][str(size)] = size_results
+        print(f"  seeded in {size_results['seed_seconds']}s, app booted in {size_results['boot_seconds']}s")
+        for scenario, timing in size_results["scenarios"].items():
+            print(f"  {scenario:<24} p50 {timing['p50_ms']:>9} ms  p99 {timing['p99_ms']:>9} ms  "
+                  f"{timing['throughput_rps']:>9} req/s")
+
+    with open(args.out, 'w') as f:
+        json.dump(current, f, indent=2, sort_keys=True)
+    print(f"\nResults written to {args.out}")
+
+    if args.compare and compare(args.compare, current, args.threshold):
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,236 @@
+# backend/bulk_import.py
+# Streaming bulk loader for the product catalog.
+# Reads CSV or NDJSON one record at a time (memory stays flat however large the file
+# is) and writes them in large executemany transactions. For the duration of the load
+# the read-only product indexes and the catalog-version / changelog / FTS5 triggers are
+# dropped; they are rebuilt in one pass afterwards, the catalog version is bumped once,
+# the FTS5 index (if present) is rebuilt from scratch and running app workers are told
+# to rebuild their in-memory search indexes.
+# Rows that carry a SKU are upserted, so re-importing a catalog refreshes prices and
+# descriptions in place instead of duplicating products. Rows without one are always
+# appended: importing the same SKU-less file twice (or re-running one that crashed part
+# way) adds those products again.
+#
+# Run from the backend directory while the app is stopped (or idle), e.g.
+#   python bulk_import.py catalog.csv
+#   python bulk_import.py catalog.ndjson --batch-size 100000
+#   zcat catalog.ndjson.gz | python bulk_import.py - --format ndjson
+#   python bulk_import.py price_changes.csv --incremental   # small refresh, indexes stay live
+#
+# Columns / keys: name, category, price (required), description, sku (optional).
+import argparse
+import csv
+import io
+import itertools
+import json
+import math
+import sqlite3
+import sys
+import time
+
+from db import open_connection
+from schema import (
+    CATALOG_VERSION_TRIGGERS, FTS5_TRIGGERS, PRODUCT_CHANGELOG_TRIGGERS, PRODUCT_INDEXES,
+    create_schema, fts5_table_exists, rebuild_fts5,
+)
+
+DATABASE = 'ecommerce.db'
+DEFAULT_BATCH_SIZE = 50000
+MAX_REPORTED_REJECTS = 10
+
+# Applied on top of db.CONNECTION_PRAGMAS for the loader's own connection only.
+# Skipping fsync trades durability for load speed: if the process dies, the batches already
+# committed stay, and re-running the import upserts rows with a SKU over them but appends
+# SKU-less rows a second time. A power loss or OS crash mid-load can leave the database
+# corrupt, so take a copy of ecommerce.db before a large import.
+BULK_LOAD_PRAGMAS = (
+    "PRAGMA synchronous=OFF",
+    "PRAGMA cache_size=-262144",   # ~256 MB page cache while building the tables
+    "PRAGMA temp_store=MEMORY",
+)
+
+UPSERT_PRODUCT_SQL = '''
+    INSERT INTO products (sku, name, category, price, description) VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT(sku) DO UPDATE SET
+        name = excluded.name,
+        category = excluded.category,
+        price = excluded.price,
+        description = excluded.description
+'''
+
+
+def read_csv(stream):
+    """Yield one dict per CSV row; the header row names the columns."""
+    yield from csv.DictReader(stream)
+
+
+def read_ndjson(stream):
+    """Yield one dict per non-blank line; unparseable lines are yielded as ValueError so they can be counted."""
+    for line in stream:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError as e:
+            yield ValueError(f"invalid JSON: {e}")
+
+
+READERS = {'csv': read_csv, 'ndjson': read_ndjson}
+
+
+def detect_format(path):
+    lowered = path.lower()
+    if lowered.endswith(('.ndjson', '.jsonl')):
+        return 'ndjson'
+    if lowered.endswith('.csv'):
+        return 'csv'
+    raise ValueError(f"Cannot tell the format of '{path}'; pass --format csv or --format ndjson")
+
+
+def product_row(record):
+    """Validate one record and return the (sku, name, category, price, description) tuple to insert."""
+    if isinstance(record, Exception):
+        raise record
+    if not isinstance(record, dict):
+        raise ValueError("record is not an object")
+    name = str(record.get('name') or '').strip()
+    category = str(record.get('category') or '').strip()
+    if not name or not category:
+        raise ValueError("name and category are required")
+    try:
+        price = round(float(record.get('price')), 2)
+    except (TypeError, ValueError):
+        raise ValueError(f"invalid price {record.get('price')!r}") from None
+    if not math.isfinite(price) or price < 0:
+        raise ValueError(f"invalid price {price}")
+    description = record.get('description')
+    description = str(description).strip() if description not in (None, '') else None
+    sku = str(record.get('sku') or '').strip() or None
+    return (sku, name, category, price, description)
+
+
+def defer_catalog_maintenance(conn):
+    """Drop the read-only product indexes and the per-row triggers for the duration of a load."""
+    with conn:
+        for index_name in PRODUCT_INDEXES:
+            conn.execute(f"DROP INDEX IF EXISTS {index_name}")
+        for trigger_name in CATALOG_VERSION_TRIGGERS + PRODUCT_CHANGELOG_TRIGGERS + FTS5_TRIGGERS:
+            conn.execute(f"DROP TRIGGER IF EXISTS {trigger_name}")
+
+
+def restore_catalog_maintenance(conn, fts5):
+    """Rebuild what defer_catalog_maintenance() dropped and publish the load as a single catalog version."""
+    create_schema(conn, fts5=fts5)
+    with conn:
+        if fts5:
+            rebuild_fts5(conn.cursor())
+        conn.execute("UPDATE catalog_version SET version = version + 1 WHERE id = 1")
+        # Tell the app's in-memory indexes to rebuild; older changelog entries are superseded by it
+        conn.execute("DELETE FROM product_changes")
+        conn.execute("INSERT INTO product_changes (product_id) VALUES (NULL)")
+    conn.execute("PRAGMA optimize")
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+
+def bulk_load(conn, records, batch_size=DEFAULT_BATCH_SIZE, defer_indexes=True, report=print):
+    """
+    Insert or upsert records (an iterable of dicts) into products.
+    defer_indexes=False keeps indexes and triggers live, which is cheaper for small refreshes
+    of a large catalog than rebuilding them afterwards.
+    Returns a summary dict with loaded/rejected/without_sku counts, elapsed seconds and rows per second.
+    """
+    rejected = 0
+    without_sku = 0
+
+    def valid_rows():
+        nonlocal rejected, without_sku
+        for record_number, record in enumerate(records, start=1):
+            try:
+                row = product_row(record)
+            except ValueError as e:
+                rejected += 1
+                if rejected <= MAX_REPORTED_REJECTS:
+                    report(f"  Skipping record {record_number}: {e}")
+                continue
+            if row[0] is None:
+                without_sku += 1
+            yield row
+
+    for pragma in BULK_LOAD_PRAGMAS:
+        conn.execute(pragma)
+    create_schema(conn)
+    fts5 = fts5_table_exists(conn.cursor())
+    if defer_indexes:
+        defer_catalog_maintenance(conn)
+
+    loaded = 0
+    started = time.perf_counter()
+    try:
+        rows = valid_rows()
+        # Only one batch is ever held in memory
+        for batch in iter(lambda: list(itertools.islice(rows, batch_size)), []):
+            with conn:
+                conn.executemany(UPSERT_PRODUCT_SQL, batch)
+            loaded += len(batch)
+            report(f"  {loaded:,} rows loaded ({loaded / (time.perf_counter() - started):,.0f} rows/s)")
+        load_seconds = time.perf_counter() - started
+    finally:
+        if defer_indexes:
+            report("Rebuilding indexes and triggers...")
+            restore_catalog_maintenance(conn, fts5)
+
+    total_seconds = time.perf_counter() - started
+    return {
+        "loaded": loaded,
+        "rejected": rejected,
+        "without_sku": without_sku,
+        "load_seconds": round(load_seconds, 2),
+        "total_seconds": round(total_seconds, 2),
+        "rows_per_second": round(loaded / total_seconds) if total_seconds else 0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stream a CSV or NDJSON product catalog into the database.")
+    parser.add_argument('path', help="Catalog file, or '-' to read standard input")
+    parser.add_argument('--format', choices=sorted(READERS), help="Defaults to the file extension")
+    parser.add_argument('--database', default=DATABASE)
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help="Rows per transaction")
+    parser.add_argument('--incremental', action='store_true',
+                        help="Keep indexes and triggers in place; faster for small updates to a large catalog")
+    args = parser.parse_args()
+
+    if args.path == '-' and not args.format:
+        parser.error("--format is required when reading standard input")
+    try:
+        catalog_format = args.format or detect_format(args.path)
+    except ValueError as e:
+        parser.error(str(e))
+
+    if args.path == '-':
+        stream = io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8-sig', newline='')
+    else:
+        stream = open(args.path, encoding='utf-8-sig', newline='')
+
+    conn = open_connection(args.database)
+    try:
+        print(f"Importing {args.path} ({catalog_format}) into {args.database}...")
+        with stream:
+            summary = bulk_load(conn, READERS[catalog_format](stream), batch_size=args.batch_size,
+                                defer_indexes=not args.incremental)
+    except sqlite3.Error as e:
+        raise SystemExit(f"Import failed: {e}")
+    finally:
+        conn.close()
+
+    print(f"Imported {summary['loaded']:,} products ({summary['rejected']:,} rejected) in "
+          f"{summary['total_seconds']}s: {summary['rows_per_second']:,} rows/s overall, "
+          f"{summary['load_seconds']}s loading rows before the index rebuild.")
+    if summary['without_sku']:
+        print(f"{summary['without_sku']:,} products had no SKU and were added as new rows; "
+              "importing them again would duplicate them.")
+
+
+if __name__ == '__main__':
+    main()
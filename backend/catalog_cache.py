@@ -0,0 +1,52 @@
+# backend/catalog_cache.py
+# Pre-serialised, pre-compressed copy of the full product catalog.
+# The payload is rebuilt only when the catalog version (bumped by triggers on the
+# products table) changes, so repeated /api/products calls skip the query, the
+# JSON encoding and the gzip step, and unchanged clients get a 304 via the ETag.
+import gzip
+import hashlib
+import threading
+from collections import namedtuple
+
+CatalogPayload = namedtuple('CatalogPayload', ['version', 'count', 'body', 'gzip_body', 'etag', 'gzip_etag'])
+
+
+class CatalogPayloadCache:
+    """
+    serialize(products) must return the JSON text for a list of product dicts.
+    Holds a single payload: the one for the most recently requested catalog version.
+    """
+
+    def __init__(self, serialize, compresslevel=6):
+        self.serialize = serialize
+        self.compresslevel = compresslevel
+        self._payload = None
+        self._lock = threading.Lock()
+        self.builds = 0
+
+    def get(self, version, load_products):
+        """Return the payload for this catalog version, calling load_products() only when it changed."""
+        payload = self._payload
+        if payload is not None and payload.version == version:
+            return payload
+
+        with self._lock:
+            payload = self._payload
+            if payload is not None and payload.version == version:
+                return payload
+            products = load_products()
+            body = self.serialize(products).encode('utf-8')
+            # Content hash keeps ETags distinct across databases that happen to share a version number
+            digest = hashlib.sha256(body).hexdigest()[:16]
+            etag = f"catalog-{version}-{digest}"
+            payload = CatalogPayload(
+                version=version,
+                count=len(products),
+                body=body,
+                gzip_body=gzip.compress(body, compresslevel=self.compresslevel, mtime=0),
+                etag=etag,
+                gzip_etag=f"{etag}-gzip", # Distinct strong ETag for the compressed representation
+            )
+            self._payload = payload
+            self.builds += 1
+            return payload
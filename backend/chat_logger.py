@@ -0,0 +1,126 @@
+# backend/chat_logger.py
+# Write-behind logger for the chat_history table.
+# Chatbot replies enqueue their log entry and return immediately; a background
+# thread writes queued entries in batches (one executemany per transaction),
+# flushing whenever a batch fills up or the oldest pending entry gets too old.
+import atexit
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+INSERT_CHAT_HISTORY = "INSERT INTO chat_history (user_id, timestamp, query, response) VALUES (?, ?, ?, ?)"
+
+_STOP = object()
+
+
+class ChatHistoryWriter:
+    """
+    get_connection is called from the writer thread (or the caller's thread in
+    synchronous mode) and must return a usable sqlite3 connection for that thread.
+    With synchronous=True every entry is written and committed before log() returns.
+    """
+
+    def __init__(self, get_connection, batch_size=100, flush_interval=0.5, max_queue_size=10000, synchronous=False):
+        self.get_connection = get_connection
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_queue_size = max_queue_size
+        self.synchronous = synchronous
+        self._queue = None
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self.entries_written = 0
+        self.batches_written = 0
+        self.write_errors = 0
+        atexit.register(self.shutdown)
+
+    def log(self, user_id, timestamp, query, response):
+        entry = (user_id, timestamp, query, response)
+        if self.synchronous:
+            self._write([entry])
+            return
+        try:
+            self._ensure_started().put_nowait(entry)
+        except queue.Full:
+            # Writer can't keep up; apply backpressure by writing inline rather than dropping the entry
+            self._write([entry])
+
+    def flush(self, timeout=5.0):
+        """Block until every entry queued so far has been written (or timeout seconds pass)."""
+        if self.synchronous or not self._is_running():
+            return
+        done = threading.Event()
+        self._queue.put(done)
+        done.wait(timeout)
+
+    def shutdown(self, timeout=10.0):
+        """Write out everything still queued and stop the writer thread."""
+        if not self._is_running():
+            return
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+        self._thread = None
+
+    def stats(self):
+        return {
+            "mode": "synchronous" if self.synchronous else "write-behind",
+            "queued": self._queue.qsize() if self._is_running() else 0,
+            "entries_written": self.entries_written,
+            "batches_written": self.batches_written,
+            "write_errors": self.write_errors,
+        }
+
+    def _is_running(self):
+        return self._thread is not None and self._pid == os.getpid() and self._thread.is_alive()
+
+    def _ensure_started(self):
+        # Started lazily (and again after a fork) so each worker process gets its own thread and queue
+        if not self._is_running():
+            with self._lock:
+                if not self._is_running():
+                    self._queue = queue.Queue(maxsize=self.max_queue_size)
+                    self._pid = os.getpid()
+                    self._thread = threading.Thread(target=self._run, name="chat-history-writer", daemon=True)
+                    self._thread.start()
+        return self._queue
+
+    def _run(self):
+        pending = []
+        deadline = None
+        while True:
+            timeout = max(0.0, deadline - time.monotonic()) if pending else None
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None # Oldest pending entry has waited flush_interval seconds
+
+            if isinstance(item, tuple):
+                if not pending:
+                    deadline = time.monotonic() + self.flush_interval
+                pending.append(item)
+                if len(pending) < self.batch_size:
+                    continue
+
+            if pending:
+                self._write(pending)
+                pending = []
+            if isinstance(item, threading.Event):
+                item.set()
+            elif item is _STOP:
+                return
+
+    def _write(self, entries):
+        try:
+            conn = self.get_connection()
+            with conn: # Single transaction per batch
+                conn.executemany(INSERT_CHAT_HISTORY, entries)
+            with self._lock:
+                self.entries_written += len(entries)
+                self.batches_written += 1
+        except sqlite3.Error as e:
+            with self._lock:
+                self.write_errors += 1
+            print(f"Error saving chat history batch of {len(entries)} entries: {e}")
@@ -0,0 +1,98 @@
+# backend/db.py
+# SQLite connection management: one long-lived connection per thread (per gunicorn
+# worker for sync workers), opened in WAL mode with tuned pragmas and handed back
+# to its thread at the end of every Flask app context instead of being closed.
+import os
+import sqlite3
+import threading
+
+# Applied to every new connection.
+# WAL lets readers keep going while a chat-history insert or checkout is writing;
+# synchronous=NORMAL is durable in WAL mode apart from the last commits on power loss.
+CONNECTION_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA cache_size=-16000",    # ~16 MB page cache per connection
+    "PRAGMA mmap_size=268435456",  # Memory-map up to 256 MB of the database file
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA busy_timeout=5000",    # Wait up to 5s for a lock instead of failing immediately
+)
+
+
+def open_connection(database):
+    """Open a new SQLite connection with the standard row factory and pragmas."""
+    conn = sqlite3.connect(database)
+    conn.row_factory = sqlite3.Row # This makes rows behave like dictionaries
+    for pragma in CONNECTION_PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+
+class ThreadLocalConnections:
+    """
+    Hands out one reusable connection per thread.
+    Connections are keyed by process id as well, so a worker forked from a master
+    that already touched the database opens its own connection rather than sharing
+    the parent's file handle.
+    """
+
+    def __init__(self, database):
+        self.database = database
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.opened = 0 # Total connections opened, useful to confirm reuse
+
+    def get(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = open_connection(self.database)
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+            with self._lock:
+                self.opened += 1
+        return conn
+
+    def release(self, _exception=None):
+        """Return this thread's connection to a clean state, keeping it open for the next request."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and self._local.pid == os.getpid() and conn.in_transaction:
+            conn.rollback()
+
+    def close(self):
+        """Close this thread's connection (e.g. on worker shutdown)."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            if self._local.pid == os.getpid():
+                conn.close()
+            self._local.conn = None
+
+    def init_app(self, app):
+        # Runs after every request/app context, so a route that returns early never leaves a transaction open
+        app.teardown_appcontext(self.release)
+
+
+class LazyStore:
+    """
+    A SQLite file used by a helper that every worker on the host shares (the search cache,
+    the rate limiter). The file and its tables are created on first use rather than at
+    construction, so importing the app, or a gunicorn master that never serves a request,
+    doesn't open it. `schema` is the CREATE ... IF NOT EXISTS statements for its tables.
+    """
+
+    def __init__(self, database, *schema):
+        self._connections = ThreadLocalConnections(database)
+        self._schema = schema
+        self._ready = False
+
+    def connection(self):
+        conn = self._connections.get()
+        if not self._ready:
+            with conn:
+                for statement in self._schema:
+                    conn.execute(statement)
+            self._ready = True
+        return conn
+
+    def close(self):
+        """Close this thread's connection to the store; it is reopened on next use."""
+        self._connections.close()
@@ -0,0 +1,140 @@
+# backend/fuzzy_index.py
+# Typo-tolerant query correction.
+# Keeps the vocabulary of stemmed terms that appear in product names and categories,
+# plus a trigram -> terms index over it. A query term the catalog doesn't use anywhere
+# (descriptions included) is matched against the terms that share trigrams with it, so
+# "keybaord" finds "keyboard" and "headphones" finds "headset" by touching a few short
+# posting lists rather than comparing against every word in the catalog. Words that do
+# occur somewhere, like "beans" in a coffee maker's description, are left alone.
+import threading
+from collections import Counter, defaultdict
+
+from search_index import tokenize
+
+# Terms shorter than this are left alone; two or three letters carry too few trigrams to correct reliably
+MIN_FUZZY_TERM_LENGTH = 4
+
+# Score multiplier for corrections relative to words the user actually typed
+CORRECTION_WEIGHT = 0.5
+
+
+def trigrams(term):
+    """Character trigrams of a term padded like pg_trgm, so prefixes and suffixes weigh in."""
+    padded = f"  {term} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class FuzzyTermIndex:
+    """
+    Similarity is the Dice coefficient of two terms' trigram sets (2 * shared / (|a| + |b|)),
+    between 0 and 1; candidates below `threshold` are never suggested.
+    """
+
+    def __init__(self, threshold=0.4, max_corrections=3):
+        self.threshold = threshold
+        self.max_corrections = max_corrections
+        self._term_counts = Counter()         # term -> number of products using it
+        self._known_counts = Counter()        # Same, for terms in any field (descriptions included)
+        self._trigram_counts = {}              # term -> size of its trigram set
+        self._trigram_terms = defaultdict(set) # trigram -> terms containing it
+        self._product_terms = {}               # product_id -> set of terms, for removal
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._term_counts)
+
+    def clear(self):
+        with self._lock:
+            self._term_counts.clear()
+            self._known_counts.clear()
+            self._trigram_counts.clear()
+            self._trigram_terms.clear()
+            self._product_terms.clear()
+
+    def empty_copy(self):
+        """A new, empty index with the same settings."""
+        return FuzzyTermIndex(threshold=self.threshold, max_corrections=self.max_corrections)
+
+    def replace(self, other):
+        """Take over the contents of `other` (e.g. a copy rebuilt in the background) in one step."""
+        with self._lock, other._lock:
+            self._term_counts = other._term_counts
+            self._known_counts = other._known_counts
+            self._trigram_counts = other._trigram_counts
+            self._trigram_terms = other._trigram_terms
+            self._product_terms = other._product_terms
+
+    def add_product(self, product):
+        """Add (or re-add) one product row/dict; name and category terms become correction candidates."""
+        terms = set(tokenize(product['name'])) | set(tokenize(product['category']))
+        known_terms = terms | set(tokenize(product['description']))
+        with self._lock:
+            self.remove_product(product['id'])
+            self._product_terms[product['id']] = (terms, known_terms)
+            self._known_counts.update(known_terms)
+            for term in terms:
+                if self._term_counts[term] == 0:
+                    term_trigrams = trigrams(term)
+                    self._trigram_counts[term] = len(term_trigrams)
+                    for trigram in term_trigrams:
+                        self._trigram_terms[trigram].add(term)
+                self._term_counts[term] += 1
+
+    def remove_product(self, product_id):
+        with self._lock:
+            terms, known_terms = self._product_terms.pop(product_id, ((), ()))
+            self._known_counts.subtract(known_terms)
+            for term in known_terms:
+                if self._known_counts[term] <= 0:
+                    del self._known_counts[term]
+            for term in terms:
+                self._term_counts[term] -= 1
+                if self._term_counts[term] <= 0:
+                    del self._term_counts[term]
+                    del self._trigram_counts[term]
+                    for trigram in trigrams(term):
+                        terms = self._trigram_terms[trigram]
+                        terms.discard(term)
+                        if not terms:
+                            del self._trigram_terms[trigram]
+
+    def corrections(self, term):
+        """Known terms similar to `term`, most similar (then most common) first."""
+        query_trigrams = trigrams(term)
+        with self._lock:
+            shared = Counter()
+            for trigram in query_trigrams:
+                shared.update(self._trigram_terms.get(trigram, ()))
+            scored = []
+            for candidate, shared_count in shared.items():
+                similarity = 2 * shared_count / (len(query_trigrams) + self._trigram_counts[candidate])
+                if similarity >= self.threshold:
+                    scored.append((-similarity, -self._term_counts[candidate], candidate))
+        return [candidate for _, _, candidate in sorted(scored)[:self.max_corrections]]
+
+    def is_known(self, term):
+        """True if any product uses the stemmed term in its name, category or description."""
+        with self._lock:
+            return term in self._known_counts
+
+    def expand(self, words):
+        """
+        Stem the query words and add corrections for terms no product uses anywhere.
+        Returns (terms, corrections): every original term followed by the corrections, plus the
+        set of added corrections, which searches should weight below the original terms
+        (see CORRECTION_WEIGHT).
+        """
+        expanded = []
+        corrections = set()
+        for word in words:
+            for term in tokenize(word):
+                if term not in expanded:
+                    expanded.append(term)
+                corrections.discard(term) # Typed by the user after all
+                if len(term) < MIN_FUZZY_TERM_LENGTH or term.isdigit() or self.is_known(term):
+                    continue
+                for correction in self.corrections(term):
+                    if correction not in expanded:
+                        expanded.append(correction)
+                        corrections.add(correction)
+        return expanded, corrections
@@ -0,0 +1,24 @@
+# backend/gunicorn.conf.py
+# Gunicorn picks this file up automatically when started from the backend directory,
+# e.g. `gunicorn wsgi:application`.
+import sys
+
+# Import the app and build the search indexes once in the master; workers fork with them
+# already in memory (copy-on-write) instead of each redoing the work on boot. Firebase is
+# only initialised on a worker's first authenticated request, never in the master.
+# Run `flask --app app init-db` before starting so the master doesn't migrate either.
+preload_app = True
+
+
+def when_ready(server):
+    # wsgi:application is warmed on import; this covers `gunicorn app:app` as well
+    app_module = sys.modules.get('app')
+    if app_module is not None and server.cfg.preload_app:
+        app_module.create_app()
+
+
+def worker_exit(server, worker):
+    # Drain the write-behind chat history queue before the worker process goes away
+    app_module = sys.modules.get('app')
+    if app_module is not None:
+        app_module.chat_history_writer.shutdown()
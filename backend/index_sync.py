@@ -0,0 +1,167 @@
+# backend/index_sync.py
+# Keeps the in-process product indexes (BM25 search index, fuzzy term index) in step
+# with the products table. Triggers append the id of every written product to the
+# product_changes log (see schema.py); each worker remembers the last entry it applied
+# and, on the next search, re-reads just the products written since then. A NULL entry
+# (left by bulk_import.py), or a gap where entries it never applied were pruned (the log
+# only keeps the newest PRODUCT_CHANGELOG_RETENTION), makes it rebuild everything
+# instead: on a background thread when it has a connection of its own to use, serving
+# the current indexes until the new ones are swapped in. With a `reset` hook it calls
+# that instead (the vector index reloads its prebuilt files rather than re-vectorising
+# the catalog).
+import sqlite3
+import threading
+
+PRODUCT_INDEX_COLUMNS = "id, name, category, description"
+
+
+class ProductIndexSync:
+    """
+    Indexes must provide clear(), add_product(row) and remove_product(product_id);
+    add_product() must replace any earlier version of the same product. For background
+    rebuilds they must also provide empty_copy() (a new, empty index with the same settings)
+    and replace(other) (take over other's contents).
+    """
+
+    def __init__(self, chunk_size=500, reset=None, get_connection=None):
+        self.chunk_size = chunk_size
+        # Called on the rebuild thread for a connection of its own; without it rebuilds run inline
+        self.get_connection = get_connection
+        # Optional reset(conn, marker_seq), called instead of a rebuild. Returns the log position the
+        # index reflects after it (e.g. that of reloaded files), or None to carry on from last_seq.
+        self.reset = reset
+        self.indexes = []
+        self.last_seq = 0 # Newest product_changes entry already applied
+        self.rebuilds = 0
+        self.changes_applied = 0
+        self._rebuild_thread = None
+        self._lock = threading.Lock()
+
+    def register(self, index):
+        with self._lock:
+            if index not in self.indexes:
+                self.indexes.append(index)
+
+    def rebuild(self, conn):
+        """Re-index every product; returns how many were indexed."""
+        with self._lock:
+            return self._rebuild(conn)
+
+    def _rebuild(self, conn):
+        for index in self.indexes:
+            index.clear()
+        self.last_seq, indexed = self._index_catalog(conn, self.indexes)
+        self.rebuilds += 1
+        return indexed
+
+    def _index_catalog(self, conn, indexes):
+        """Add every product to indexes; returns (log position the result reflects, products indexed)."""
+        # Read the log position first: anything written while we scan gets replayed by the next refresh
+        last_seq = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM product_changes").fetchone()[0]
+        indexed = 0
+        rows = conn.execute(f"SELECT {PRODUCT_INDEX_COLUMNS} FROM products ORDER BY id")
+        for batch in iter(lambda: rows.fetchmany(self.chunk_size), []):
+            for product in batch:
+                for index in indexes:
+                    index.add_product(product)
+            indexed += len(batch)
+        return last_seq, indexed
+
+    def _start_background_rebuild(self):
+        # Called with self._lock held
+        if self._rebuild_thread is None:
+            self._rebuild_thread = threading.Thread(
+                target=self._background_rebuild, name="product-index-rebuild", daemon=True
+            )
+            self._rebuild_thread.start()
+
+    def _background_rebuild(self):
+        """Build fresh copies of the indexes off the request path, then swap them in."""
+        try:
+            # A thread-local connection from get_connection goes away with this thread
+            conn = self.get_connection()
+            fresh = [index.empty_copy() for index in self.indexes]
+            last_seq, indexed = self._index_catalog(conn, fresh)
+            with self._lock:
+                for index, rebuilt in zip(self.indexes, fresh):
+                    index.replace(rebuilt)
+                self.last_seq = last_seq
+                self.rebuilds += 1
+            print(f"Search indexes rebuilt in the background with {indexed} products.")
+        except sqlite3.Error as e:
+            # last_seq hasn't moved, so the next refresh tries again
+            print(f"Background index rebuild failed: {e}")
+        finally:
+            with self._lock:
+                self._rebuild_thread = None
+
+    def generation(self):
+        """
+        Completed rebuilds so far, or None while one is running. Results computed from these indexes are
+        only as fresh as the catalog if this is not None and unchanged from before the computation.
+        """
+        with self._lock:
+            return None if self._rebuild_thread is not None else self.rebuilds
+
+    def wait_for_rebuild(self, timeout=None):
+        """Block until a running background rebuild has finished (for tests and benchmarks)."""
+        thread = self._rebuild_thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def refresh(self, conn):
+        """Apply product changes logged since the last refresh; returns how many log entries were applied."""
+        if not conn.execute("SELECT 1 FROM product_changes WHERE seq > ? LIMIT 1", (self.last_seq,)).fetchone():
+            return 0 # The common case: nothing written since the last search
+        with self._lock:
+            if self._rebuild_thread is not None:
+                return 0 # Keep serving the current indexes; the rebuild replays anything newer
+            changes = conn.execute(
+                "SELECT seq, product_id FROM product_changes WHERE seq > ? ORDER BY seq", (self.last_seq,)
+            ).fetchall()
+            if not changes:
+                return 0 # Another thread applied them while we waited for the lock
+            newest_seq = changes[-1]['seq']
+            markers = [change['seq'] for change in changes if change['product_id'] is None]
+            if changes[0]['seq'] > self.last_seq + 1:
+                # Entries we never applied were pruned from the log; anything up to here may have changed
+                markers.insert(0, changes[0]['seq'] - 1)
+            if markers and self.reset is None:
+                if self.get_connection is not None:
+                    self._start_background_rebuild()
+                    return 0
+                self._rebuild(conn)
+                return len(changes)
+            if markers:
+                resume_seq = self.reset(conn, markers[-1])
+                if resume_seq is not None:
+                    self.last_seq = resume_seq
+                # Individually logged writes are still applied; only the bulk-loaded rows are missed
+                changes = [change for change in changes
+                           if change['seq'] > self.last_seq and change['product_id'] is not None]
+
+            product_ids = list(dict.fromkeys(change['product_id'] for change in changes))
+            for start in range(0, len(product_ids), self.chunk_size):
+                chunk = product_ids[start:start + self.chunk_size]
+                placeholders = ','.join('?' * len(chunk))
+                rows = conn.execute(
+                    f"SELECT {PRODUCT_INDEX_COLUMNS} FROM products WHERE id IN ({placeholders})", chunk
+                ).fetchall()
+                current = {row['id']: row for row in rows}
+                for product_id in chunk:
+                    for index in self.indexes:
+                        if product_id in current:
+                            index.add_product(current[product_id])
+                        else:
+                            index.remove_product(product_id) # Deleted since it was logged
+            self.last_seq = max(self.last_seq, newest_seq)
+            self.changes_applied += len(changes)
+            return len(changes)
+
+    def stats(self):
+        return {
+            "last_seq": self.last_seq,
+            "rebuilds": self.rebuilds,
+            "changes_applied": self.changes_applied,
+            "rebuilding": self._rebuild_thread is not None,
+        }
@@ -0,0 +1,99 @@
+# backend/intent_router.py
+# Intent detection for chatbot queries.
+# All trigger phrases are compiled into a single regex when the router is built,
+# so routing a query is one scan over the query text instead of a series of
+# substring checks over phrase lists on every request.
+import re
+import threading
+import time
+from collections import Counter, namedtuple
+
+# Common stop words filtered out of search queries (can be expanded)
+STOP_WORDS = frozenset([
+    "a", "an", "the", "and", "or", "but", "is", "are", "was", "were", "be", "been", "being",
+    "have", "has", "had", "do", "does", "did", "of", "at", "by", "for", "with", "from", "on",
+    "in", "to", "up", "out", "down", "off", "over", "under", "again", "further", "then", "once",
+    "here", "there", "when", "where", "why", "how", "all", "any", "both", "each", "few", "more",
+    "most", "other", "some", "such", "no", "nor", "not", "only", "own", "same", "so", "than",
+    "too", "very", "s", "t", "can", "will", "just", "don", "should", "now", "what", "which",
+    "who", "whom", "this", "that", "these", "those", "am", "i", "me", "my", "myself", "we",
+    "our", "ours", "ourselves", "you", "your", "yours", "yourself", "yourselves", "he", "him",
+    "his", "himself", "she", "her", "hers", "herself", "it", "its", "itself", "they", "them",
+    "their", "theirs", "themselves", "please",
+    # Shopping filler; without these, typo correction would turn "show" into "shoe"
+    "show", "find", "search", "look", "looking", "want", "need", "buy", "get", "got", "give",
+    "sell", "something", "anything",
+])
+
+WORD_PATTERN = re.compile(r'\b\w+\b')
+
+# Intent used when no trigger phrase matches
+SEARCH_INTENT = 'search'
+
+RouteResult = namedtuple('RouteResult', ['intent', 'elapsed_ms'])
+
+
+def extract_search_terms(query):
+    """Split a lower-cased query into words, dropping stop words."""
+    return [word for word in WORD_PATTERN.findall(query) if word not in STOP_WORDS]
+
+
+class IntentRouter:
+    """
+    Maps a query to the first registered intent whose trigger phrase appears in it.
+    Phrases match on word boundaries, so 'hi' fires for "hi there" but not for "white shirt".
+    Intents registered earlier win when several match.
+    """
+
+    def __init__(self):
+        self._intents = [] # (name, phrases) in priority order
+        self._group_to_intent = {}
+        self._pattern = None
+        self._lock = threading.Lock()
+        self.counts = Counter()
+        self.total_routing_ms = 0.0
+
+    def register(self, name, phrases):
+        """Add an intent triggered by any of the given phrases and recompile the matcher."""
+        self._intents.append((name, tuple(phrase.lower() for phrase in phrases)))
+        self._compile()
+
+    def _compile(self):
+        alternatives = []
+        group_to_intent = {}
+        for index, (name, phrases) in enumerate(self._intents):
+            group = f"intent_{index}"
+            group_to_intent[group] = index
+            # Longest phrases first so overlapping alternatives prefer the most specific one
+            escaped = '|'.join(re.escape(phrase) for phrase in sorted(phrases, key=len, reverse=True))
+            alternatives.append(f"(?P<{group}>{escaped})")
+        self._group_to_intent = group_to_intent
+        self._pattern = re.compile(r'\b(?:' + '|'.join(alternatives) + r')\b') if alternatives else None
+
+    def route(self, query):
+        """Return a RouteResult naming the matched intent (or SEARCH_INTENT) and how long routing took."""
+        started = time.perf_counter()
+        best_index = None
+        if self._pattern is not None:
+            for match in self._pattern.finditer(query):
+                index = self._group_to_intent[match.lastgroup]
+                if best_index is None or index < best_index:
+                    best_index = index
+                    if index == 0:
+                        break
+        intent = self._intents[best_index][0] if best_index is not None else SEARCH_INTENT
+        elapsed_ms = (time.perf_counter() - started) * 1000
+
+        with self._lock:
+            self.counts[intent] += 1
+            self.total_routing_ms += elapsed_ms
+        return RouteResult(intent, elapsed_ms)
+
+    def stats(self):
+        with self._lock:
+            routed = sum(self.counts.values())
+            return {
+                "intents": dict(self.counts),
+                "routed": routed,
+                "avg_routing_ms": round(self.total_routing_ms / routed, 4) if routed else 0.0,
+            }
@@ -0,0 +1,198 @@
+# backend/metrics.py
+# Request instrumentation: per-stage timings (token verification, DB connect, intent
+# routing, search SQL, serialization, history write, ...), request latency histograms
+# and an opt-in cProfile hook, rendered in the Prometheus text exposition format.
+# Metrics are kept per process, like the cache counters in /api/stats; with several
+# gunicorn workers each scrape reports the worker that happened to answer it.
+#
+# Every timed request also gets a Server-Timing header, so the stage breakdown of a
+# single request shows up in the browser's network panel.
+#
+# Profiling is controlled by PROFILE_REQUESTS:
+#   off    - never (default)
+#   header - only requests sent with 'X-Profile: 1'
+#   all    - every request
+# Profiles are written as .prof files to PROFILE_DIR (open with pstats or snakeviz).
+import cProfile
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import g, has_request_context, request
+
+# Upper bounds in seconds; covers sub-millisecond cache hits up to multi-second scans
+DURATION_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+PROFILE_MODES = ('off', 'header', 'all')
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the shape Prometheus expects. Not thread-safe on its own."""
+
+    def __init__(self, buckets=DURATION_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.sum += value
+        self.count += 1
+        for i, upper_bound in enumerate(self.buckets):
+            if value <= upper_bound:
+                self.counts[i] += 1
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(**labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape_label(value)}"' for name, value in labels.items()) + '}'
+
+
+class RequestMetrics:
+    def __init__(self, prefix='ecommerce', profile_mode='off', profile_dir='profiles'):
+        if profile_mode not in PROFILE_MODES:
+            raise ValueError(f"PROFILE_REQUESTS must be one of {', '.join(PROFILE_MODES)}, not '{profile_mode}'")
+        self.prefix = prefix
+        self.profile_mode = profile_mode
+        self.profile_dir = profile_dir
+        self._lock = threading.Lock()
+        self._stage_durations = {}   # stage -> Histogram
+        self._request_durations = {} # endpoint -> Histogram
+        self._requests_total = {}    # (endpoint, method, status) -> count
+        # cProfile hooks the interpreter globally on newer Pythons; profile one request at a time
+        self._profile_lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name):
+        """Time the enclosed block as one stage of the current request."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe_stage(name, time.perf_counter() - started)
+
+    def observe_stage(self, name, seconds):
+        with self._lock:
+            histogram = self._stage_durations.get(name)
+            if histogram is None:
+                histogram = self._stage_durations[name] = Histogram()
+            histogram.observe(seconds)
+        if has_request_context() and 'stage_timings' in g:
+            g.stage_timings[name] = g.stage_timings.get(name, 0.0) + seconds
+
+    def init_app(self, app):
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        # Also runs when a view raised, so a profiler is never left switched on
+        app.teardown_request(self._stop_profiler)
+
+    def _before_request(self):
+        g.request_started = time.perf_counter()
+        g.stage_timings = {}
+        if self._should_profile() and self._profile_lock.acquire(blocking=False):
+            g.profiler = cProfile.Profile()
+            g.profiler.enable()
+
+    def _should_profile(self):
+        if self.profile_mode == 'all':
+            return True
+        return self.profile_mode == 'header' and request.headers.get('X-Profile') == '1'
+
+    def _after_request(self, response):
+        if 'request_started' not in g:
+            return response
+        elapsed = time.perf_counter() - g.request_started
+        endpoint = request.endpoint or 'unmatched' # Keep 404 paths from creating a label per URL
+        with self._lock:
+            histogram = self._request_durations.get(endpoint)
+            if histogram is None:
+                histogram = self._request_durations[endpoint] = Histogram()
+            histogram.observe(elapsed)
+            key = (endpoint, request.method, str(response.status_code))
+            self._requests_total[key] = self._requests_total.get(key, 0) + 1
+
+        timings = [f"{name};dur={seconds * 1000:.3f}" for name, seconds in g.stage_timings.items()]
+        timings.append(f"total;dur={elapsed * 1000:.3f}")
+        response.headers['Server-Timing'] = ', '.join(timings)
+
+        profile_path = self._stop_profiler()
+        if profile_path:
+            response.headers['X-Profile-File'] = os.path.basename(profile_path)
+        return response
+
+    def _stop_profiler(self, _exception=None):
+        """Stop this request's profiler (if any) and write it out; returns the .prof path."""
+        profiler = g.pop('profiler', None)
+        if profiler is None:
+            return None
+        try:
+            profiler.disable()
+            os.makedirs(self.profile_dir, exist_ok=True)
+            path = os.path.join(self.profile_dir, f"{request.endpoint or 'unmatched'}-{time.time_ns()}.prof")
+            profiler.dump_stats(path)
+            print(f"Request profile written to {path}")
+            return path
+        except OSError as e:
+            print(f"Could not write request profile: {e}")
+            return None
+        finally:
+            self._profile_lock.release()
+
+    def render(self, stats=None):
+        """
+        Prometheus text format. stats is an optional {component: stats_dict} mapping (the /api/stats
+        payload); its numeric values become gauges and nested dicts become labelled series.
+        """
+        lines = []
+        with self._lock:
+            name = f'{self.prefix}_http_requests_total'
+            lines += [f'# HELP {name} Requests handled, by endpoint, method and status.', f'# TYPE {name} counter']
+            for (endpoint, method, status), count in sorted(self._requests_total.items()):
+                lines.append(f'{name}{_labels(endpoint=endpoint, method=method, status=status)} {count}')
+            lines += self._render_histograms(
+                f'{self.prefix}_http_request_duration_seconds', 'Request latency by endpoint.',
+                'endpoint', self._request_durations
+            )
+            lines += self._render_histograms(
+                f'{self.prefix}_stage_duration_seconds', 'Time spent in each stage of request handling.',
+                'stage', self._stage_durations
+            )
+        for component, component_stats in (stats or {}).items():
+            lines += self._render_stats(f'{self.prefix}_{component}', component_stats)
+        return '\n'.join(lines) + '\n'
+
+    @staticmethod
+    def _render_histograms(name, help_text, label, histograms):
+        lines = [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+        for label_value, histogram in sorted(histograms.items()):
+            for upper_bound, count in zip(histogram.buckets, histogram.counts):
+                lines.append(f'{name}_bucket{_labels(**{label: label_value, "le": upper_bound})} {count}')
+            lines.append(f'{name}_bucket{_labels(**{label: label_value, "le": "+Inf"})} {histogram.count}')
+            lines.append(f'{name}_sum{_labels(**{label: label_value})} {histogram.sum:.6f}')
+            lines.append(f'{name}_count{_labels(**{label: label_value})} {histogram.count}')
+        return lines
+
+    @staticmethod
+    def _render_stats(prefix, stats):
+        lines = []
+        for key, value in stats.items():
+            name = f'{prefix}_{key}'
+            if isinstance(value, dict):
+                series = [(label_value, v) for label_value, v in value.items() if _is_number(v)]
+                if series:
+                    label = key[:-1] if key.endswith('s') else key # e.g. intents{intent="search"}
+                    lines.append(f'# TYPE {name} gauge')
+                    lines += [f'{name}{_labels(**{label: label_value})} {v}' for label_value, v in series]
+            elif _is_number(value):
+                lines += [f'# TYPE {name} gauge', f'{name} {value}']
+        return lines
@@ -0,0 +1,60 @@
+# backend/orders.py
+# Order placement for /api/checkout.
+# Prices for the whole cart come from one set-based query and all line items are
+# inserted with a single executemany, inside a BEGIN IMMEDIATE transaction so
+# concurrent checkouts queue on the write lock (busy_timeout) instead of failing
+# half-way with "database is locked".
+
+# Keeps each IN (...) list well below SQLite's bound-parameter limit
+PRICE_LOOKUP_CHUNK_SIZE = 500
+
+
+class ProductNotFoundError(LookupError):
+    def __init__(self, product_id):
+        super().__init__(f"Product with ID {product_id} not found in inventory.")
+        self.product_id = product_id
+
+
+def fetch_prices(conn, product_ids):
+    """Return {product_id: price} for the given ids using IN-list queries."""
+    unique_ids = list(dict.fromkeys(product_ids))
+    prices = {}
+    for start in range(0, len(unique_ids), PRICE_LOOKUP_CHUNK_SIZE):
+        chunk = unique_ids[start:start + PRICE_LOOKUP_CHUNK_SIZE]
+        placeholders = ','.join('?' * len(chunk))
+        for row in conn.execute(f"SELECT id, price FROM products WHERE id IN ({placeholders})", chunk):
+            prices[row[0]] = row[1]
+    return prices
+
+
+def place_order(conn, user_id, items, order_date, status='completed'):
+    """
+    Create an order with its line items in one transaction.
+    items is a list of (product_id, quantity) pairs that have already been validated.
+    Returns (order_id, total_amount). Raises ProductNotFoundError if any product is missing,
+    in which case nothing is written.
+    """
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        # Prices are read under the write lock so they can't change before the order is stored
+        prices = fetch_prices(conn, [product_id for product_id, _quantity in items])
+        total_amount = 0
+        for product_id, quantity in items:
+            if product_id not in prices:
+                raise ProductNotFoundError(product_id)
+            total_amount += prices[product_id] * quantity
+
+        cursor = conn.execute(
+            "INSERT INTO orders (user_id, order_date, total_amount, status) VALUES (?, ?, ?, ?)",
+            (user_id, order_date, total_amount, status)
+        )
+        order_id = cursor.lastrowid
+        conn.executemany(
+            "INSERT INTO order_items (order_id, product_id, quantity, price_at_purchase) VALUES (?, ?, ?, ?)",
+            [(order_id, product_id, quantity, prices[product_id]) for product_id, quantity in items]
+        )
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    return order_id, total_amount
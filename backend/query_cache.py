@@ -0,0 +1,113 @@
+# backend/query_cache.py
+# Result cache for chatbot product queries.
+# A small in-process LRU sits in front of a SQLite table that every gunicorn worker
+# on the host shares, so a query answered by one worker is a cache hit for the
+# others. Entries are tagged with the catalog version they were computed against
+# and are ignored (and purged) as soon as the products table changes.
+import json
+import sqlite3
+import threading
+import time
+
+from cachetools import TTLCache
+
+from db import LazyStore
+
+SEARCH_CACHE_SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS search_cache (
+        cache_key TEXT PRIMARY KEY,
+        catalog_version INTEGER NOT NULL,
+        created_at REAL NOT NULL,
+        value TEXT NOT NULL
+    )
+'''
+
+
+class SearchResultCache:
+    """
+    Values are JSON-serialisable dicts. get() and set() take the current catalog version;
+    an entry computed for any other version is treated as a miss.
+    """
+
+    def __init__(self, database, maxsize=1024, ttl=300):
+        self.ttl = ttl
+        self._local = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+        self._store = LazyStore(database, SEARCH_CACHE_SCHEMA)
+        self._newest_version = None
+        self.local_hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+
+    def get(self, key, catalog_version):
+        with self._lock:
+            entry = self._local.get(key)
+            if entry is not None and entry[0] == catalog_version:
+                self.local_hits += 1
+                return entry[1]
+
+        try:
+            conn = self._store.connection()
+            row = conn.execute(
+                "SELECT value FROM search_cache WHERE cache_key = ? AND catalog_version = ? AND created_at > ?",
+                (key, catalog_version, time.time() - self.ttl)
+            ).fetchone()
+        except sqlite3.Error as e:
+            print(f"Search cache read failed: {e}")
+            row = None
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return None
+            self.shared_hits += 1
+            value = json.loads(row['value'])
+            self._local[key] = (catalog_version, value)
+            return value
+
+    def set(self, key, catalog_version, value):
+        with self._lock:
+            self._local[key] = (catalog_version, value)
+            purge_stale = self._newest_version != catalog_version
+            self._newest_version = catalog_version
+
+        try:
+            conn = self._store.connection()
+            with conn:
+                if purge_stale:
+                    # First write for a new catalog version: drop everything computed against older ones
+                    conn.execute("DELETE FROM search_cache WHERE catalog_version != ? OR created_at <= ?",
+                                 (catalog_version, time.time() - self.ttl))
+                conn.execute(
+                    "INSERT OR REPLACE INTO search_cache (cache_key, catalog_version, created_at, value) VALUES (?, ?, ?, ?)",
+                    (key, catalog_version, time.time(), json.dumps(value))
+                )
+        except sqlite3.Error as e:
+            # The shared store is best-effort; the local LRU still has the entry
+            print(f"Search cache write failed: {e}")
+
+    def clear(self):
+        """Drop every entry, in this process and in the shared store."""
+        with self._lock:
+            self._local.clear()
+        try:
+            conn = self._store.connection()
+            with conn:
+                conn.execute("DELETE FROM search_cache")
+        except sqlite3.Error as e:
+            print(f"Search cache clear failed: {e}")
+
+    def close(self):
+        """Close this thread's connection to the store; it is reopened on next use."""
+        self._store.close()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.local_hits + self.shared_hits + self.misses
+            hits = self.local_hits + self.shared_hits
+            return {
+                "local_hits": self.local_hits,
+                "shared_hits": self.shared_hits,
+                "misses": self.misses,
+                "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+                "local_size": len(self._local),
+            }
@@ -0,0 +1,103 @@
+# backend/rate_limit.py
+# Per-user token buckets for the expensive chatbot endpoints.
+# Bucket state lives in a small SQLite file that every gunicorn worker on the host
+# shares (like the search cache), so a client can't multiply its allowance by being
+# spread across workers. Each check is a single UPSERT: it refills the bucket for
+# the time elapsed since the last request and takes a token only if one is there,
+# so two workers can never both spend the last token.
+import math
+import sqlite3
+import threading
+import time
+
+from db import LazyStore
+
+RATE_LIMIT_SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS rate_limit_buckets (
+        bucket_key TEXT PRIMARY KEY,
+        tokens REAL NOT NULL,
+        updated_at REAL NOT NULL
+    )
+'''
+
+# Refill, spend one token, but only if the refilled bucket holds at least one; otherwise change nothing
+TAKE_TOKEN_SQL = '''
+    INSERT INTO rate_limit_buckets (bucket_key, tokens, updated_at) VALUES (:key, :burst - :cost, :now)
+    ON CONFLICT(bucket_key) DO UPDATE SET
+        tokens = MIN(:burst, tokens + (:now - updated_at) * :rate) - :cost,
+        updated_at = :now
+    WHERE MIN(:burst, tokens + (:now - updated_at) * :rate) >= :cost
+'''
+
+
+class TokenBucketLimiter:
+    """
+    Allows `burst` requests at once per key, refilled at `rate` tokens per second.
+    acquire() returns (allowed, retry_after_seconds). If the shared store is unavailable the
+    limiter fails open: an outage of the throttle shouldn't take the chatbot down with it.
+    """
+
+    def __init__(self, database, rate, burst, prune_interval=60, timer=time.time):
+        if rate <= 0 or burst < 1:
+            raise ValueError("rate must be positive and burst at least 1")
+        self.rate = rate
+        self.burst = burst
+        self.prune_interval = prune_interval
+        self._timer = timer
+        self._store = LazyStore(database, RATE_LIMIT_SCHEMA)
+        self._lock = threading.Lock()
+        self._last_prune = timer()
+        self.allowed = 0
+        self.limited = 0
+
+    def acquire(self, key, cost=1):
+        now = self._timer()
+        params = {"key": key, "burst": self.burst, "cost": cost, "now": now, "rate": self.rate}
+        try:
+            conn = self._store.connection()
+            with conn:
+                taken = conn.execute(TAKE_TOKEN_SQL, params).rowcount > 0
+                if taken:
+                    self._maybe_prune(conn, now)
+                    retry_after = 0.0
+                else:
+                    row = conn.execute(
+                        "SELECT tokens, updated_at FROM rate_limit_buckets WHERE bucket_key = ?", (key,)
+                    ).fetchone()
+                    tokens = min(self.burst, row['tokens'] + (now - row['updated_at']) * self.rate) if row else 0.0
+                    retry_after = max(cost - tokens, 0.0) / self.rate
+        except sqlite3.Error as e:
+            print(f"Rate limiter check failed, allowing the request: {e}")
+            taken, retry_after = True, 0.0
+        with self._lock:
+            if taken:
+                self.allowed += 1
+            else:
+                self.limited += 1
+        return taken, retry_after
+
+    def _maybe_prune(self, conn, now):
+        # A bucket untouched for long enough to refill completely is the same as no row at all
+        with self._lock:
+            if now - self._last_prune < self.prune_interval:
+                return
+            self._last_prune = now
+        conn.execute("DELETE FROM rate_limit_buckets WHERE updated_at < ?", (now - self.burst / self.rate,))
+
+    def close(self):
+        """Close this thread's connection to the store; it is reopened on next use."""
+        self._store.close()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "allowed": self.allowed,
+                "limited": self.limited,
+                "rate_per_second": self.rate,
+                "burst": self.burst,
+            }
+
+
+def retry_after_header(seconds):
+    """Retry-After takes whole seconds; round up so a client that waits that long gets through."""
+    return str(max(1, math.ceil(seconds)))
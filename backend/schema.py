@@ -0,0 +1,210 @@
+# backend/schema.py
+# Database schema for the backend: tables, indexes and the triggers that keep the
+# catalog version and the optional FTS5 index in step with products.
+# Every statement is idempotent, so create_schema() is safe to run on every start;
+# it also stamps PRAGMA user_version with SCHEMA_VERSION, which lets the app skip the
+# DDL entirely at startup when the database is already current (schema_is_current()).
+# The bulk importer (bulk_import.py) drops the deferrable indexes and triggers
+# before a load and calls create_schema() again afterwards to rebuild them.
+import sqlite3
+
+# Secondary indexes on products that only serve reads; rebuilt in one pass after a bulk load.
+# idx_products_sku is not listed: the importer's upserts need it during the load.
+PRODUCT_INDEXES = {
+    # Serve category/price filters and the catalog sort orders with index range scans
+    'idx_products_category_price': "CREATE INDEX IF NOT EXISTS idx_products_category_price ON products (category, price)",
+    'idx_products_price': "CREATE INDEX IF NOT EXISTS idx_products_price ON products (price)",
+    'idx_products_name': "CREATE INDEX IF NOT EXISTS idx_products_name ON products (name)",
+}
+
+CATALOG_VERSION_TRIGGERS = tuple(
+    f'products_catalog_version_{trigger_event}' for trigger_event in ('insert', 'update', 'delete')
+)
+PRODUCT_CHANGELOG_TRIGGERS = tuple(
+    f'products_changelog_{trigger_event}' for trigger_event in ('insert', 'update', 'delete')
+)
+FTS5_TRIGGERS = ('products_fts_ai', 'products_fts_ad', 'products_fts_au')
+
+# Newest product_changes entries kept; older ones are pruned as new ones arrive. A worker
+# that falls further behind than this (or starts from older vector files) sees a gap in the
+# log and rebuilds instead of replaying it (see index_sync.py). Changing it only reaches
+# existing databases once the products_changelog_prune trigger is dropped and recreated.
+PRODUCT_CHANGELOG_RETENTION = 10000
+
+# Bump whenever create_schema() gains a table, column, index or trigger, so existing
+# databases get migrated on their next start or 'flask --app app init-db'.
+SCHEMA_VERSION = 3
+
+
+def create_schema(conn, fts5=False):
+    """Create any missing tables, indexes and triggers. Returns True if the FTS5 index is in place."""
+    cursor = conn.cursor()
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS products (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            category TEXT NOT NULL,
+            price REAL NOT NULL,
+            description TEXT,
+            sku TEXT
+        )
+    ''')
+    migrate_products_sku(cursor)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS chat_history (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id TEXT,
+            timestamp TEXT NOT NULL,
+            query TEXT NOT NULL,
+            response TEXT NOT NULL
+        )
+    ''')
+    # --- NEW TABLES FOR CHECKOUT ---
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS orders (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id TEXT NOT NULL,
+            order_date TEXT NOT NULL,
+            total_amount REAL NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending' -- e.g., pending, completed, cancelled
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS order_items (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            order_id INTEGER NOT NULL,
+            product_id INTEGER NOT NULL,
+            quantity INTEGER NOT NULL,
+            price_at_purchase REAL NOT NULL, -- Price at the time of purchase
+            FOREIGN KEY (order_id) REFERENCES orders(id),
+            FOREIGN KEY (product_id) REFERENCES products(id)
+        )
+    ''')
+    # --- END NEW TABLES ---
+    # --- CATALOG VERSION ---
+    # Single-row counter bumped by triggers on every products write; caches key off it
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS catalog_version (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            version INTEGER NOT NULL
+        )
+    ''')
+    cursor.execute("INSERT OR IGNORE INTO catalog_version (id, version) VALUES (1, 1)")
+    for trigger_name in CATALOG_VERSION_TRIGGERS:
+        trigger_event = trigger_name.rsplit('_', 1)[1].upper()
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {trigger_name}
+            AFTER {trigger_event} ON products BEGIN
+                UPDATE catalog_version SET version = version + 1 WHERE id = 1;
+            END
+        ''')
+    # --- PRODUCT CHANGELOG ---
+    # Ids of written products, in write order, so each worker's in-memory indexes can apply
+    # just the changes since their last sync. A NULL product_id means "everything changed"
+    # (written by bulk_import.py, whose loads bypass these triggers).
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS product_changes (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            product_id INTEGER
+        )
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS products_changelog_insert AFTER INSERT ON products BEGIN
+            INSERT INTO product_changes (product_id) VALUES (new.id);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS products_changelog_update AFTER UPDATE ON products BEGIN
+            INSERT INTO product_changes (product_id) VALUES (old.id);
+            INSERT INTO product_changes (product_id) SELECT new.id WHERE new.id != old.id;
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS products_changelog_delete AFTER DELETE ON products BEGIN
+            INSERT INTO product_changes (product_id) VALUES (old.id);
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS products_changelog_prune AFTER INSERT ON product_changes BEGIN
+            DELETE FROM product_changes WHERE seq <= new.seq - {PRODUCT_CHANGELOG_RETENTION};
+        END
+    ''')
+    for index_sql in PRODUCT_INDEXES.values():
+        cursor.execute(index_sql)
+    # Upsert target for catalog imports; rows without a SKU are NULL and never conflict
+    cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_products_sku ON products (sku)")
+    # Serves per-user history lookups and keyset pagination on (timestamp, id) without a scan + sort;
+    # it supersedes the older (user_id, timestamp) index
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_chat_history_user_timestamp_id ON chat_history (user_id, timestamp, id)"
+    )
+    cursor.execute("DROP INDEX IF EXISTS idx_chat_history_user_timestamp")
+    fts5_enabled = init_fts5(cursor) if fts5 else False
+    cursor.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    conn.commit()
+    return fts5_enabled
+
+
+def schema_is_current(conn, fts5=False):
+    """True if create_schema() has already been run at this SCHEMA_VERSION (with FTS5, if asked for)."""
+    cursor = conn.cursor()
+    if cursor.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+        return False
+    return not fts5 or fts5_table_exists(cursor)
+
+
+def migrate_products_sku(cursor):
+    """Add the sku column to products tables created before it existed."""
+    columns = {row[1] for row in cursor.execute("PRAGMA table_info(products)")}
+    if 'sku' not in columns:
+        cursor.execute("ALTER TABLE products ADD COLUMN sku TEXT")
+
+
+def init_fts5(cursor):
+    """Create the products_fts index and the triggers that keep it in sync with products."""
+    already_exists = fts5_table_exists(cursor)
+    try:
+        cursor.execute('''
+            CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5(
+                name, category, description,
+                content='products', content_rowid='id',
+                tokenize='porter unicode61'
+            )
+        ''')
+    except sqlite3.OperationalError as e:
+        print(f"FTS5 is not available in this SQLite build ({e}). Falling back to the in-process search index.")
+        return False
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS products_fts_ai AFTER INSERT ON products BEGIN
+            INSERT INTO products_fts(rowid, name, category, description)
+            VALUES (new.id, new.name, new.category, new.description);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS products_fts_ad AFTER DELETE ON products BEGIN
+            INSERT INTO products_fts(products_fts, rowid, name, category, description)
+            VALUES ('delete', old.id, old.name, old.category, old.description);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS products_fts_au AFTER UPDATE ON products BEGIN
+            INSERT INTO products_fts(products_fts, rowid, name, category, description)
+            VALUES ('delete', old.id, old.name, old.category, old.description);
+            INSERT INTO products_fts(rowid, name, category, description)
+            VALUES (new.id, new.name, new.category, new.description);
+        END
+    ''')
+    if not already_exists:
+        # Backfill products that were inserted before the triggers existed
+        rebuild_fts5(cursor)
+    return True
+
+
+def fts5_table_exists(cursor):
+    return cursor.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'products_fts'"
+    ).fetchone() is not None
+
+
+def rebuild_fts5(cursor):
+    cursor.execute("INSERT INTO products_fts(products_fts) VALUES ('rebuild')")
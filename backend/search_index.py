@@ -0,0 +1,148 @@
+# backend/search_index.py
+# In-process inverted index over the products table.
+# Each product is tokenised into stemmed terms; a query only touches the posting
+# lists of its own terms, so search cost grows with the number of matching
+# products instead of with the size of the catalog.
+import math
+import re
+import threading
+from collections import defaultdict
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+# Matches in the product name count more than matches in the category,
+# which count more than matches buried in the description.
+FIELD_WEIGHTS = {
+    'name': 3.0,
+    'category': 2.0,
+    'description': 1.0,
+}
+
+
+def stem(token):
+    """Very light English suffix stripping so 'laptops' and 'laptop' share a term."""
+    if len(token) <= 3 or token.isdigit():
+        return token
+    if token.endswith('ies') and len(token) > 4:
+        return token[:-3] + 'y'          # accessories -> accessory
+    if token.endswith('sses'):
+        return token[:-2]                # glasses -> glass
+    if token.endswith(('ches', 'shes', 'xes', 'zes')):
+        return token[:-2]                # watches -> watch, boxes -> box
+    if token.endswith('s') and not token.endswith(('ss', 'us', 'is')):
+        return token[:-1]                # books -> book
+    return token
+
+
+def tokenize(text):
+    """Lower-case, split on non-alphanumerics and stem."""
+    if not text:
+        return []
+    return [stem(token) for token in TOKEN_PATTERN.findall(text.lower())]
+
+
+class ProductSearchIndex:
+    """Inverted index with BM25 ranking over product name, category and description."""
+
+    def __init__(self, k1=1.2, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self._postings = defaultdict(dict)  # term -> {product_id: weighted term frequency}
+        self._doc_terms = {}                # product_id -> {term: weighted term frequency}
+        self._doc_lengths = {}              # product_id -> weighted document length
+        self._total_length = 0.0
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._doc_lengths)
+
+    def clear(self):
+        with self._lock:
+            self._postings.clear()
+            self._doc_terms.clear()
+            self._doc_lengths.clear()
+            self._total_length = 0.0
+
+    def empty_copy(self):
+        """A new, empty index with the same BM25 parameters."""
+        return ProductSearchIndex(k1=self.k1, b=self.b)
+
+    def replace(self, other):
+        """Take over the contents of `other` (e.g. a copy rebuilt in the background) in one step."""
+        with self._lock, other._lock:
+            self._postings = other._postings
+            self._doc_terms = other._doc_terms
+            self._doc_lengths = other._doc_lengths
+            self._total_length = other._total_length
+
+    def build(self, products):
+        """Rebuild the index from an iterable of product rows/dicts."""
+        with self._lock:
+            self.clear()
+            for product in products:
+                self.add_product(product)
+
+    def add_product(self, product):
+        """Index (or re-index) a single product row/dict with id, name, category and description."""
+        product_id = product['id']
+        term_frequencies = defaultdict(float)
+        for field, weight in FIELD_WEIGHTS.items():
+            for term in tokenize(product[field]):
+                term_frequencies[term] += weight
+
+        with self._lock:
+            if product_id in self._doc_terms:
+                self.remove_product(product_id)
+            doc_length = sum(term_frequencies.values())
+            for term, frequency in term_frequencies.items():
+                self._postings[term][product_id] = frequency
+            self._doc_terms[product_id] = dict(term_frequencies)
+            self._doc_lengths[product_id] = doc_length
+            self._total_length += doc_length
+
+    def remove_product(self, product_id):
+        with self._lock:
+            terms = self._doc_terms.pop(product_id, None)
+            if terms is None:
+                return
+            for term in terms:
+                postings = self._postings.get(term)
+                if postings is not None:
+                    postings.pop(product_id, None)
+                    if not postings:
+                        del self._postings[term]
+            self._total_length -= self._doc_lengths.pop(product_id)
+
+    def search(self, query_terms, limit=None, term_weights=None):
+        """
+        Rank products matching any of the query terms.
+        query_terms are raw words; they are stemmed here the same way products were.
+        term_weights optionally maps stemmed terms to a score multiplier (default 1.0).
+        Returns a list of (product_id, score) tuples, best match first.
+        """
+        term_weights = term_weights or {}
+        terms = set()
+        for term in query_terms:
+            terms.update(tokenize(term))
+
+        with self._lock:
+            doc_count = len(self._doc_lengths)
+            if not doc_count or not terms:
+                return []
+            average_length = self._total_length / doc_count
+            scores = defaultdict(float)
+            for term in terms:
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                document_frequency = len(postings)
+                idf = math.log(1 + (doc_count - document_frequency + 0.5) / (document_frequency + 0.5))
+                idf *= term_weights.get(term, 1.0)
+                for product_id, frequency in postings.items():
+                    length_norm = 1 - self.b + self.b * self._doc_lengths[product_id] / average_length
+                    scores[product_id] += idf * frequency * (self.k1 + 1) / (frequency + self.k1 * length_norm)
+
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        if limit is not None:
+            ranked = ranked[:limit]
+        return ranked
@@ -0,0 +1,63 @@
+# backend/singleflight.py
+# In-flight request coalescing. When several threads of one worker (gthread workers,
+# the ASGI thread pool) miss the search cache for the same query at the same time,
+# the first one runs the search and the rest wait for its result instead of each
+# running the same scans. Across workers the shared search cache covers the repeats
+# that arrive after the first search finished.
+import threading
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {} # key -> _Call currently running
+        self.executions = 0
+        self.shared = 0
+
+    def do(self, key, fn):
+        """
+        Run fn() for key, or wait for the call already running for key and return its result.
+        Returns (result, shared), where shared is True if this caller didn't run fn itself.
+        Exceptions raised by fn propagate to every caller waiting on it.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                self.shared += 1
+                leader = False
+            else:
+                call = self._calls[key] = _Call()
+                self.executions += 1
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+    def stats(self):
+        with self._lock:
+            return {
+                "executions": self.executions,
+                "shared": self.shared,
+                "in_flight": len(self._calls),
+            }
@@ -0,0 +1,51 @@
+# backend/tests/conftest.py
+# Run from the backend directory with `python -m pytest`.
+# Unit tests import the backend modules directly; tests that go through the Flask routes
+# share one app booted offline (see benchmarks/offline_app.py) in a scratch directory.
+import os
+import sys
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.join(BACKEND_DIR, 'benchmarks'))
+
+# Tight enough that the rate-limit tests hit it quickly; other route tests use their own uids
+TEST_RATE_LIMIT_BURST = 3
+
+
+@pytest.fixture(scope='session')
+def app_module(tmp_path_factory):
+    """app.py imported against a fresh database with the 200 sample products and stubbed token checks."""
+    import offline_app
+
+    workdir = str(tmp_path_factory.mktemp('app'))
+    previous_cwd = os.getcwd()
+    os.environ.update({
+        'CHAT_HISTORY_SYNC': '1',
+        'CHATBOT_RATE_LIMIT': '60',
+        'CHATBOT_RATE_BURST': str(TEST_RATE_LIMIT_BURST),
+        'VECTOR_SEARCH': 'off',
+    })
+    offline_app.prepare(workdir)
+    module = offline_app.load_app()
+    yield module
+    module.chat_history_writer.shutdown()
+    os.chdir(previous_cwd)
+
+
+@pytest.fixture
+def client(app_module):
+    return app_module.app.test_client()
+
+
+@pytest.fixture
+def db(app_module):
+    """The app's database connection, inside an app context."""
+    with app_module.app.app_context():
+        yield app_module.get_db_connection()
+
+
+def auth_headers(uid):
+    return {"Authorization": f"Bearer {uid}"} # The offline stub uses the token as the uid
@@ -0,0 +1,153 @@
+import json
+import sys
+import threading
+import time
+
+import anyio
+import pytest
+
+from conftest import auth_headers
+
+
+@pytest.fixture(scope='module')
+def asgi(app_module):
+    import asgi
+    return asgi
+
+
+def http_scope(path='/', method='GET', headers=()):
+    return {
+        'type': 'http', 'method': method, 'path': path, 'query_string': b'', 'http_version': '1.1',
+        'headers': [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers],
+    }
+
+
+def call(application, scope, body=b'', disconnect_after_chunks=None):
+    """Drive one request through an ASGI app; returns the messages it sent."""
+    sent = []
+    chunks_sent = anyio.Event() if disconnect_after_chunks is not None else None
+
+    async def receive():
+        if not hasattr(receive, 'body_sent'):
+            receive.body_sent = True
+            return {'type': 'http.request', 'body': body, 'more_body': False}
+        if chunks_sent is None:
+            await anyio.sleep_forever()
+        await chunks_sent.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(message):
+        sent.append(message)
+        body_chunks = [m for m in sent if m['type'] == 'http.response.body' and m['body']]
+        if chunks_sent is not None and len(body_chunks) >= disconnect_after_chunks:
+            chunks_sent.set()
+
+    async def main():
+        with anyio.fail_after(10):
+            await application(scope, receive, send)
+
+    anyio.run(main)
+    return sent
+
+
+def response_status(sent):
+    return next(m['status'] for m in sent if m['type'] == 'http.response.start')
+
+
+def response_body(sent):
+    return b''.join(m.get('body', b'') for m in sent if m['type'] == 'http.response.body')
+
+
+def test_streams_chunks_and_finishes_the_response(asgi):
+    def wsgi_app(environ, start_response):
+        start_response('200 OK', [('Content-Type', 'text/plain')])
+        return [b'a', b'', b'b']
+
+    sent = call(asgi.WSGIToASGI(wsgi_app), http_scope())
+    assert response_status(sent) == 200
+    assert [m.get('body') for m in sent[1:]] == [b'a', b'b', b'']
+    assert sent[-1]['more_body'] is False
+
+
+def test_error_before_the_response_starts_becomes_a_500(asgi, capsys):
+    def wsgi_app(environ, start_response):
+        raise RuntimeError("boom")
+
+    sent = call(asgi.WSGIToASGI(wsgi_app), http_scope())
+    assert response_status(sent) == 500
+    assert sent[-1]['more_body'] is False
+    assert "RuntimeError: boom" in capsys.readouterr().err
+
+
+def test_exc_info_replaces_headers_that_were_not_sent(asgi):
+    def wsgi_app(environ, start_response):
+        start_response('200 OK', [('Content-Type', 'text/plain')])
+        try:
+            raise ValueError("bad row")
+        except ValueError:
+            start_response('500 Internal Server Error', [('Content-Type', 'text/plain')], sys.exc_info())
+        return [b'failed']
+
+    sent = call(asgi.WSGIToASGI(wsgi_app), http_scope())
+    assert response_status(sent) == 500
+    assert response_body(sent) == b'failed'
+
+
+def test_exc_info_after_the_response_started_aborts_it(asgi):
+    def wsgi_app(environ, start_response):
+        start_response('200 OK', [('Content-Type', 'text/plain')])
+        yield b'partial'
+        try:
+            raise ValueError("bad row")
+        except ValueError:
+            start_response('500 Internal Server Error', [], sys.exc_info())
+        yield b'never sent'
+
+    # The server sees the error (through the adapter's task group) and drops the half-sent response
+    with pytest.raises(BaseExceptionGroup) as raised:
+        call(asgi.WSGIToASGI(wsgi_app), http_scope())
+    assert raised.group_contains(ValueError, match="bad row")
+
+
+def test_second_start_response_without_exc_info_is_an_error(asgi):
+    def wsgi_app(environ, start_response):
+        start_response('200 OK', [])
+        start_response('200 OK', [])
+        return [b'']
+
+    sent = call(asgi.WSGIToASGI(wsgi_app), http_scope())
+    assert response_status(sent) == 500
+
+
+def test_disconnect_stops_a_streaming_response(asgi):
+    closed = threading.Event()
+    produced = []
+
+    def wsgi_app(environ, start_response):
+        start_response('200 OK', [('Content-Type', 'application/x-ndjson')])
+
+        def stream():
+            try:
+                while True:
+                    produced.append(1)
+                    yield b'{}\n'
+                    time.sleep(0.001)
+            finally:
+                closed.set()
+        return stream()
+
+    sent = call(asgi.WSGIToASGI(wsgi_app), http_scope(), disconnect_after_chunks=3)
+    assert closed.is_set()
+    assert len(produced) < 1000
+    assert not any(m['type'] == 'http.response.body' and m.get('more_body') is False for m in sent)
+
+
+def test_serves_the_flask_routes(asgi):
+    scope = http_scope('/api/chatbot/stream', 'POST',
+                       [('Authorization', auth_headers('asgi-user')['Authorization']),
+                        ('Content-Type', 'application/json')])
+    sent = call(asgi.application, scope, json.dumps({"query": "keyboard", "limit": 2}).encode('utf-8'))
+    assert response_status(sent) == 200
+    events = [json.loads(line) for line in response_body(sent).splitlines()]
+    assert events[0]['type'] == 'message'
+    assert events[-1]['type'] == 'done'
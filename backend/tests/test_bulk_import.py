@@ -0,0 +1,106 @@
+import io
+import subprocess
+import sys
+
+import pytest
+
+from bulk_import import bulk_load, defer_catalog_maintenance, read_csv, read_ndjson, restore_catalog_maintenance
+from conftest import BACKEND_DIR
+from db import open_connection
+from schema import (
+    CATALOG_VERSION_TRIGGERS, PRODUCT_CHANGELOG_TRIGGERS, PRODUCT_INDEXES, create_schema,
+)
+
+CATALOG_CSV = """name,category,price,description,sku
+Laptop Pro X,Electronics,1200,16GB RAM,LAP-1
+Desk Lamp,Home,30,,
+Broken Row,Home,not-a-price,,BRK-1
+,Home,10,,NONAME
+"""
+
+
+@pytest.fixture
+def database(tmp_path):
+    path = str(tmp_path / 'ecommerce.db')
+    conn = open_connection(path)
+    create_schema(conn)
+    yield path, conn
+    conn.close()
+
+
+def quiet(message):
+    pass
+
+
+def object_names(conn, object_type):
+    return {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = ?", (object_type,))}
+
+
+def catalog_version(conn):
+    return conn.execute("SELECT version FROM catalog_version WHERE id = 1").fetchone()[0]
+
+
+def test_loads_valid_rows_and_counts_rejects(database):
+    _path, conn = database
+    summary = bulk_load(conn, read_csv(io.StringIO(CATALOG_CSV)), report=quiet)
+    assert (summary['loaded'], summary['rejected'], summary['without_sku']) == (2, 2, 1)
+    rows = conn.execute("SELECT sku, name, price, description FROM products ORDER BY id").fetchall()
+    assert [tuple(row) for row in rows] == [('LAP-1', 'Laptop Pro X', 1200.0, '16GB RAM'), (None, 'Desk Lamp', 30.0, None)]
+
+
+def test_unparseable_ndjson_lines_are_rejected(database):
+    _path, conn = database
+    lines = '{"name": "Mug", "category": "Home", "price": 5}\n{not json\n\n[1, 2]\n'
+    summary = bulk_load(conn, read_ndjson(io.StringIO(lines)), report=quiet)
+    assert (summary['loaded'], summary['rejected']) == (1, 2)
+
+
+def test_sku_rows_are_updated_in_place(database):
+    _path, conn = database
+    bulk_load(conn, [{"name": "Laptop Pro X", "category": "Electronics", "price": 1200, "sku": "LAP-1"}], report=quiet)
+    product_id = conn.execute("SELECT id FROM products WHERE sku = 'LAP-1'").fetchone()[0]
+
+    bulk_load(conn, [{"name": "Laptop Pro X2", "category": "Electronics", "price": 999.999, "sku": "LAP-1"},
+                     {"name": "Desk Lamp", "category": "Home", "price": 30}], report=quiet)
+    rows = conn.execute("SELECT id, name, price FROM products WHERE sku = 'LAP-1'").fetchall()
+    assert [tuple(row) for row in rows] == [(product_id, 'Laptop Pro X2', 1000.0)]
+    assert conn.execute("SELECT COUNT(*) FROM products").fetchone()[0] == 2
+
+
+def test_full_load_restores_maintenance_and_publishes_one_version(database):
+    _path, conn = database
+    indexes, triggers = object_names(conn, 'index'), object_names(conn, 'trigger')
+    version = catalog_version(conn)
+
+    bulk_load(conn, read_csv(io.StringIO(CATALOG_CSV)), batch_size=1, report=quiet)
+    assert object_names(conn, 'index') == indexes
+    assert object_names(conn, 'trigger') == triggers
+    assert catalog_version(conn) == version + 1
+    changes = conn.execute("SELECT product_id FROM product_changes").fetchall()
+    assert [row[0] for row in changes] == [None]
+
+
+def test_maintenance_is_dropped_during_the_load(database):
+    _path, conn = database
+    defer_catalog_maintenance(conn)
+    assert not set(PRODUCT_INDEXES) & object_names(conn, 'index')
+    assert not set(CATALOG_VERSION_TRIGGERS + PRODUCT_CHANGELOG_TRIGGERS) & object_names(conn, 'trigger')
+    restore_catalog_maintenance(conn, fts5=False)
+    assert set(PRODUCT_INDEXES) <= object_names(conn, 'index')
+    assert set(CATALOG_VERSION_TRIGGERS + PRODUCT_CHANGELOG_TRIGGERS) <= object_names(conn, 'trigger')
+
+
+def test_incremental_cli_keeps_triggers_live(database, tmp_path):
+    path, conn = database
+    catalog = tmp_path / 'catalog.csv'
+    catalog.write_text(CATALOG_CSV)
+    version = catalog_version(conn)
+
+    output = subprocess.run([sys.executable, 'bulk_import.py', str(catalog), '--database', path, '--incremental'],
+                            cwd=BACKEND_DIR, capture_output=True, text=True, check=True).stdout
+    assert "Imported 2 products (2 rejected)" in output
+    assert "Rebuilding indexes" not in output
+    # Each row went through the per-row triggers: one version bump and one changelog entry apiece
+    assert catalog_version(conn) == version + 2
+    changes = conn.execute("SELECT product_id FROM product_changes ORDER BY seq").fetchall()
+    assert [row[0] for row in changes] == [1, 2]
@@ -0,0 +1,70 @@
+import gzip
+import json
+
+from catalog_cache import CatalogPayloadCache
+from conftest import auth_headers
+
+HEADERS = auth_headers('catalog-cache-user')
+
+
+def get_catalog(client, **headers):
+    return client.get('/api/products', headers={**HEADERS, **headers})
+
+
+def test_payload_is_built_once_per_version():
+    loads = []
+
+    def load_products():
+        loads.append(1)
+        return [{"id": 1, "name": "Desk Lamp"}]
+
+    cache = CatalogPayloadCache(json.dumps)
+    first = cache.get(1, load_products)
+    assert cache.get(1, load_products) is first
+    assert len(loads) == 1
+    second = cache.get(2, load_products)
+    assert len(loads) == 2
+    assert second.etag != first.etag
+    assert gzip.decompress(second.gzip_body) == second.body
+
+
+def test_plain_and_gzip_responses_have_distinct_etags(client):
+    plain = get_catalog(client)
+    compressed = get_catalog(client, **{"Accept-Encoding": "gzip"})
+    assert plain.status_code == compressed.status_code == 200
+    assert 'Content-Encoding' not in plain.headers
+    assert compressed.headers['Content-Encoding'] == 'gzip'
+    assert plain.headers['ETag'] != compressed.headers['ETag']
+    assert 'Accept-Encoding' in plain.headers['Vary'] and 'Accept-Encoding' in compressed.headers['Vary']
+    assert gzip.decompress(compressed.get_data()) == plain.get_data()
+    assert len(json.loads(plain.get_data())) == 200
+
+
+def test_matching_etag_gets_304(client):
+    plain = get_catalog(client)
+    compressed = get_catalog(client, **{"Accept-Encoding": "gzip"})
+    for etag in (plain.headers['ETag'], compressed.headers['ETag']):
+        response = get_catalog(client, **{"If-None-Match": etag})
+        assert response.status_code == 304
+        assert response.get_data() == b''
+    assert get_catalog(client, **{"If-None-Match": '"catalog-0-stale"'}).status_code == 200
+
+
+def test_payload_is_rebuilt_only_after_a_products_write(app_module, client, db):
+    first = get_catalog(client)
+    builds = app_module.catalog_cache.builds
+    assert get_catalog(client).headers['ETag'] == first.headers['ETag']
+    assert app_module.catalog_cache.builds == builds
+
+    original = db.execute("SELECT price FROM products WHERE id = 1").fetchone()[0]
+    with db:
+        db.execute("UPDATE products SET price = price + 1 WHERE id = 1")
+    try:
+        stale = get_catalog(client, **{"If-None-Match": first.headers['ETag']})
+        assert stale.status_code == 200
+        assert stale.headers['ETag'] != first.headers['ETag']
+        assert app_module.catalog_cache.builds == builds + 1
+        assert json.loads(stale.get_data())[0]['price'] == original + 1
+    finally:
+        with db:
+            db.execute("UPDATE products SET price = ? WHERE id = 1", (original,))
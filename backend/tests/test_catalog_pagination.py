@@ -0,0 +1,75 @@
+import base64
+import json
+
+import pytest
+
+from conftest import auth_headers
+
+
+def walk(app_module, conn, sort, limit, **filters):
+    products, cursor, pages = [], None, 0
+    while True:
+        page, cursor = app_module.fetch_catalog_page(conn, sort=sort, limit=limit, cursor=cursor, **filters)
+        products.extend(page)
+        pages += 1
+        if cursor is None:
+            return products, pages
+
+
+def raw_cursor(position):
+    return base64.urlsafe_b64encode(json.dumps(position).encode('utf-8')).decode('ascii')
+
+
+@pytest.mark.parametrize('sort', ['id', 'price_asc', 'price_desc', 'name'])
+def test_pages_cover_the_catalog_in_order(app_module, db, sort):
+    order_by = app_module.CATALOG_SORTS[sort][0]
+    expected = [row['id'] for row in db.execute(f"SELECT id FROM products ORDER BY {order_by}")]
+    products, pages = walk(app_module, db, sort, limit=7)
+    assert [product['id'] for product in products] == expected
+    assert pages == -(-len(expected) // 7)
+
+
+def test_pages_respect_filters(app_module, db):
+    expected = [row['id'] for row in db.execute(
+        "SELECT id FROM products WHERE category = 'Electronics' AND price >= 50 ORDER BY price DESC, id DESC")]
+    products, _pages = walk(app_module, db, 'price_desc', limit=5, category='Electronics', min_price=50)
+    assert [product['id'] for product in products] == expected
+
+
+def test_exact_page_boundary_has_no_trailing_cursor(app_module, db):
+    total = db.execute("SELECT COUNT(*) FROM products").fetchone()[0]
+    page, cursor = app_module.fetch_catalog_page(db, limit=total)
+    assert len(page) == total
+    assert cursor is None
+
+
+@pytest.mark.parametrize('cursor', [
+    'not base64 !',
+    raw_cursor(['id', None]),
+    raw_cursor(['id', None, 'x']),
+    raw_cursor(['id', None, True]),
+    raw_cursor(['id', [1], 5]),
+    raw_cursor(['id', {"a": 1}, 5]),
+    raw_cursor('id'),
+    raw_cursor(['price_asc', 10.0, 5]), # Issued for another sort order
+    12,
+])
+def test_malformed_cursors_raise_value_error(app_module, db, cursor):
+    with pytest.raises(ValueError):
+        app_module.fetch_catalog_page(db, sort='id', cursor=cursor)
+
+
+def test_products_route_pages_with_cursors(client):
+    headers = auth_headers('catalog-user')
+    seen, cursor = [], None
+    while True:
+        query = "/api/products?sort=name&limit=50" + (f"&cursor={cursor}" if cursor else "")
+        body = client.get(query, headers=headers).get_json()
+        seen.extend(product['id'] for product in body['products'])
+        cursor = body['next_cursor']
+        if cursor is None:
+            break
+    assert len(seen) == len(set(seen)) == 200
+
+    response = client.get('/api/products?limit=5&cursor=garbage', headers=headers)
+    assert response.status_code == 400
@@ -0,0 +1,72 @@
+from conftest import auth_headers
+
+
+def seed_history(db, user_id):
+    # Several messages share a timestamp, as when history is written in one batch
+    timestamps = ["2025-01-01T00:00:01", "2025-01-01T00:00:02", "2025-01-01T00:00:02",
+                  "2025-01-01T00:00:02", "2025-01-01T00:00:02", "2025-01-01T00:00:03"]
+    with db:
+        db.executemany(
+            "INSERT INTO chat_history (user_id, timestamp, query, response) VALUES (?, ?, ?, ?)",
+            [(user_id, timestamp, f"query {i}", "reply") for i, timestamp in enumerate(timestamps)]
+        )
+    return [f"query {i}" for i in range(len(timestamps))]
+
+
+def get_history(client, user_id, query_string):
+    response = client.get(f'/api/chat_history?{query_string}', headers=auth_headers(user_id))
+    assert response.status_code == 200
+    return response.get_json()
+
+
+def test_paging_backwards_through_equal_timestamps(client, db):
+    expected = seed_history(db, 'history-backwards')
+    page = get_history(client, 'history-backwards', 'limit=2')
+    seen = list(page)
+    while page:
+        oldest = page[0]
+        page = get_history(client, 'history-backwards',
+                           f"limit=2&before={oldest['timestamp']}&before_id={oldest['id']}")
+        seen = page + seen
+    assert [entry['query'] for entry in seen] == expected
+
+
+def test_incremental_refresh_through_equal_timestamps(client, db):
+    expected = seed_history(db, 'history-forwards')
+    page = get_history(client, 'history-forwards', 'limit=6')[:2]
+    seen = list(page)
+    while page:
+        page = get_history(client, 'history-forwards', f"limit=2&since_id={page[-1]['id']}")
+        seen += page
+    assert [entry['query'] for entry in seen] == expected
+
+
+def test_incremental_refresh_picks_up_late_writes_with_older_timestamps(client, db):
+    # Another worker's write-behind queue can store a message stamped before the client's newest one
+    seed_history(db, 'history-late')
+    newest = get_history(client, 'history-late', 'limit=1')[-1]
+    with db:
+        db.execute("INSERT INTO chat_history (user_id, timestamp, query, response) VALUES (?, ?, ?, ?)",
+                   ('history-late', "2025-01-01T00:00:02", "late query", "reply"))
+    entries = get_history(client, 'history-late', f"since_id={newest['id']}")
+    assert [entry['query'] for entry in entries] == ["late query"]
+
+
+def test_timestamp_only_cursors_still_work(client, db):
+    seed_history(db, 'history-legacy')
+    entries = get_history(client, 'history-legacy', 'since=2025-01-01T00:00:02')
+    assert [entry['query'] for entry in entries] == ['query 5']
+
+
+def test_history_query_uses_the_keyset_index(db):
+    plan = ' '.join(row[3] for row in db.execute(
+        "EXPLAIN QUERY PLAN SELECT id, timestamp, query, response FROM chat_history "
+        "WHERE user_id = ? AND (timestamp, id) < (?, ?) ORDER BY timestamp DESC, id DESC LIMIT 2",
+        ('u', '2025', 1)))
+    assert 'idx_chat_history_user_timestamp_id' in plan
+    assert 'TEMP B-TREE' not in plan
+
+
+def test_rejects_non_integer_ids(client):
+    response = client.get('/api/chat_history?since=2025&since_id=abc', headers=auth_headers('history-bad'))
+    assert response.status_code == 400
@@ -0,0 +1,104 @@
+import time
+
+import pytest
+
+from chat_logger import ChatHistoryWriter
+from db import ThreadLocalConnections, open_connection
+from schema import create_schema
+
+
+@pytest.fixture
+def database(tmp_path):
+    path = str(tmp_path / 'ecommerce.db')
+    conn = open_connection(path)
+    create_schema(conn)
+    yield path, conn
+    conn.close()
+
+
+@pytest.fixture
+def make_writer(database):
+    path, _conn = database
+    writers = []
+
+    def make_writer(**options):
+        writers.append(ChatHistoryWriter(ThreadLocalConnections(path).get, **options))
+        return writers[-1]
+    yield make_writer
+    for writer in writers:
+        writer.shutdown()
+
+
+def stored(conn):
+    return [row[0] for row in conn.execute("SELECT query FROM chat_history ORDER BY id")]
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("condition not met in time")
+        time.sleep(0.005)
+
+
+def log_queries(writer, count, start=0):
+    for i in range(start, start + count):
+        writer.log('user', f"2025-01-01T00:00:{i:02d}", f"query {i}", "reply")
+
+
+def test_full_batches_are_written_without_waiting(database, make_writer):
+    _path, conn = database
+    writer = make_writer(batch_size=5, flush_interval=60)
+    log_queries(writer, 12)
+    wait_until(lambda: writer.stats()['entries_written'] == 10)
+    assert writer.stats()['batches_written'] == 2
+    assert stored(conn) == [f"query {i}" for i in range(10)]
+
+
+def test_partial_batch_is_written_after_the_flush_interval(database, make_writer):
+    _path, conn = database
+    writer = make_writer(batch_size=100, flush_interval=0.05)
+    log_queries(writer, 3)
+    wait_until(lambda: writer.stats()['entries_written'] == 3)
+    assert writer.stats()['batches_written'] == 1
+    assert stored(conn) == ["query 0", "query 1", "query 2"]
+
+
+def test_flush_writes_everything_queued_so_far(database, make_writer):
+    _path, conn = database
+    writer = make_writer(batch_size=100, flush_interval=60)
+    log_queries(writer, 3)
+    writer.flush()
+    assert stored(conn) == ["query 0", "query 1", "query 2"]
+    log_queries(writer, 2, start=3)
+    writer.flush()
+    assert len(stored(conn)) == 5
+    assert writer.stats()['batches_written'] == 2
+
+
+def test_shutdown_drains_the_queue(database, make_writer):
+    _path, conn = database
+    writer = make_writer(batch_size=100, flush_interval=60)
+    log_queries(writer, 7)
+    writer.shutdown()
+    assert len(stored(conn)) == 7
+    assert writer.stats()['mode'] == 'write-behind'
+    assert writer.stats()['queued'] == 0
+
+    log_queries(writer, 1, start=7) # Logging again starts a new writer thread
+    writer.shutdown()
+    assert len(stored(conn)) == 8
+
+
+def test_synchronous_mode_writes_before_returning(database, make_writer):
+    _path, conn = database
+    writer = make_writer(synchronous=True)
+    log_queries(writer, 2)
+    assert stored(conn) == ["query 0", "query 1"]
+    assert writer.stats()['batches_written'] == 2
+
+
+def test_write_errors_are_counted_not_raised(tmp_path):
+    writer = ChatHistoryWriter(lambda: open_connection(str(tmp_path / 'no-schema.db')), synchronous=True)
+    log_queries(writer, 1)
+    assert writer.stats()['write_errors'] == 1
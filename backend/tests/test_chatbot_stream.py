@@ -0,0 +1,71 @@
+import json
+
+from conftest import auth_headers
+
+
+def stream(client, uid, **body):
+    response = client.post('/api/chatbot/stream', json=body, headers=auth_headers(uid), buffered=False)
+    assert response.status_code == 200
+    assert response.mimetype == 'application/x-ndjson'
+    return response
+
+
+def read_events(response):
+    return [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+
+def test_events_are_message_then_product_batches_then_done(app_module, client):
+    app_module.search_cache.clear()
+    events = read_events(stream(client, 'stream-user-1', query="quality", limit=45))
+
+    assert events[0]['type'] == 'message'
+    assert events[0]['intent'] == 'search'
+    assert events[-1]['type'] == 'done'
+    batches = events[1:-1]
+    assert [event['type'] for event in batches] == ['products'] * 3
+    assert [len(event['products']) for event in batches] == [20, 20, 5]
+    assert events[0]['total'] == 188 # Every generated product says "high-quality"
+    assert events[-1]['next_cursor'] == '45'
+
+
+def test_cursor_pages_continue_where_the_last_one_stopped(app_module, client):
+    app_module.search_cache.clear()
+    first = read_events(stream(client, 'stream-user-2', query="quality", limit=100))
+    second = read_events(stream(client, 'stream-user-2', query="quality", limit=100, cursor=first[-1]['next_cursor']))
+
+    ids = [product['id'] for events in (first, second) for event in events if event['type'] == 'products'
+           for product in event['products']]
+    assert len(ids) == 188
+    assert len(set(ids)) == 188
+    assert second[-1] == {"type": "done", "next_cursor": None}
+
+
+def test_a_miss_sends_the_message_before_reading_every_batch(app_module, client):
+    app_module.search_cache.clear()
+    response = stream(client, 'stream-user-3', query="quality", limit=60)
+    chunks = iter(response.response)
+    message = json.loads(next(chunks))
+    assert message['type'] == 'message'
+    # The page is cached only once its last batch has been streamed
+    assert app_module.search_cache.stats()['local_size'] == 0
+    rest = [json.loads(chunk) for chunk in chunks]
+    response.close()
+    assert rest[-1]['type'] == 'done'
+    assert app_module.search_cache.stats()['local_size'] == 1
+
+    # A cache hit replays the same lines
+    replayed = read_events(stream(client, 'stream-user-4', query="quality", limit=60))
+    assert replayed == [message, *rest]
+
+
+def test_intents_without_products_send_message_and_done(client):
+    events = read_events(stream(client, 'stream-user-5', query="hello"))
+    assert [event['type'] for event in events] == ['message', 'done']
+    assert events[0]['intent'] == 'greeting'
+    assert events[-1]['next_cursor'] is None
+
+
+def test_bad_cursor_is_rejected_before_streaming(client):
+    response = client.post('/api/chatbot/stream', json={"query": "quality", "cursor": "-5"},
+                           headers=auth_headers('stream-user-6'))
+    assert response.status_code == 400
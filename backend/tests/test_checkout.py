@@ -0,0 +1,60 @@
+import pytest
+
+from conftest import auth_headers
+
+
+def checkout(client, uid, items):
+    return client.post('/api/checkout', json={"cartItems": items}, headers=auth_headers(uid))
+
+
+def order_counts(db):
+    return (db.execute("SELECT COUNT(*) FROM orders").fetchone()[0],
+            db.execute("SELECT COUNT(*) FROM order_items").fetchone()[0])
+
+
+def price(db, product_id):
+    return db.execute("SELECT price FROM products WHERE id = ?", (product_id,)).fetchone()[0]
+
+
+def test_total_counts_every_line_of_a_repeated_product(client, db):
+    response = checkout(client, 'checkout-repeat', [{"id": 1, "quantity": 2}, {"id": 2, "quantity": 1},
+                                                    {"id": 1, "quantity": 3}])
+    assert response.status_code == 201
+    body = response.get_json()
+    assert body['total_amount'] == pytest.approx(round(price(db, 1) * 5 + price(db, 2), 2))
+
+    lines = db.execute("SELECT product_id, quantity, price_at_purchase FROM order_items WHERE order_id = ? ORDER BY id",
+                       (body['order_id'],)).fetchall()
+    assert [tuple(line) for line in lines] == [(1, 2, price(db, 1)), (2, 1, price(db, 2)), (1, 3, price(db, 1))]
+
+
+def test_missing_product_writes_nothing(client, db):
+    before = order_counts(db)
+    response = checkout(client, 'checkout-missing', [{"id": 1, "quantity": 1}, {"id": 999999, "quantity": 1}])
+    assert response.status_code == 404
+    assert '999999' in response.get_json()['message']
+    assert order_counts(db) == before
+
+
+@pytest.mark.parametrize('items', [
+    [],
+    [{"id": 1, "quantity": 0}],
+    [{"id": "1", "quantity": 1}],
+    [{"id": 1, "quantity": 1.5}],
+])
+def test_invalid_carts_are_rejected(client, db, items):
+    before = order_counts(db)
+    assert checkout(client, 'checkout-invalid', items).status_code == 400
+    assert order_counts(db) == before
+
+
+def test_checkouts_reuse_the_thread_connection(app_module, client, db):
+    # BEGIN IMMEDIATE fails on a connection left inside a transaction, so run checkouts back to back on the
+    # same thread-local connection, after a failed one and after a read-only request
+    opened = app_module.db_connections.opened
+    assert checkout(client, 'checkout-reuse', [{"id": 3, "quantity": 1}]).status_code == 201
+    assert checkout(client, 'checkout-reuse', [{"id": 999999, "quantity": 1}]).status_code == 404
+    assert client.get('/api/products?limit=5', headers=auth_headers('checkout-reuse')).status_code == 200
+    assert checkout(client, 'checkout-reuse', [{"id": 3, "quantity": 2}]).status_code == 201
+    assert app_module.db_connections.opened == opened
+    assert not db.in_transaction
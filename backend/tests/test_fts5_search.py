@@ -0,0 +1,113 @@
+import pytest
+
+from conftest import auth_headers
+from db import open_connection
+from schema import create_schema
+
+PRODUCTS = [
+    ("Laptop Pro X", "Electronics", 1200.00, "Powerful laptop for professionals."),
+    ("Laptop Sleeve", "Accessories", 25.00, "Padded sleeve that fits any laptop."),
+    ("Desk Lamp", "Home", 30.00, "Bright lamp, a good companion for a laptop desk."),
+    ("Wireless Mouse", "Electronics", 25.00, "Ergonomic mouse with long battery life."),
+    ("Mouse Pad", "Accessories", 9.00, "Large mouse pad."),
+    ("Coffee Maker", "Home Appliances", 120.00, "Programmable coffee maker."),
+]
+
+
+@pytest.fixture
+def fts5_search(app_module, tmp_path, monkeypatch):
+    """A scratch catalog with the FTS5 index, searched through app.py's FTS5 code path."""
+    conn = open_connection(str(tmp_path / 'ecommerce.db'))
+    if not create_schema(conn, fts5=True):
+        conn.close()
+        pytest.skip("This SQLite build has no FTS5")
+    with conn:
+        conn.executemany("INSERT INTO products (name, category, price, description) VALUES (?, ?, ?, ?)", PRODUCTS)
+    monkeypatch.setattr(app_module, 'FTS5_ENABLED', True)
+    monkeypatch.setattr(app_module, 'VECTOR_SEARCH', 'off')
+    yield conn
+    conn.close()
+
+
+def names(products):
+    return [product['name'] for product in products]
+
+
+def test_matches_are_ranked_by_bm25(app_module, fts5_search):
+    products, total = app_module.search_products(fts5_search, ['laptop'], limit=10, offset=0)
+    assert total == 3
+    # Name matches are weighted above description-only matches
+    assert set(names(products[:2])) == {"Laptop Pro X", "Laptop Sleeve"}
+    assert names(products)[2] == "Desk Lamp"
+
+
+def test_pages_cover_every_match_once(app_module, fts5_search):
+    ranked, total = app_module.search_products(fts5_search, ['laptop', 'mouse'], limit=10, offset=0)
+    pages = []
+    for offset in range(0, total, 2):
+        page, page_total = app_module.search_products(fts5_search, ['laptop', 'mouse'], limit=2, offset=offset)
+        assert page_total == total == 5
+        pages.extend(page)
+    assert names(pages) == names(ranked)
+
+
+def test_keyword_ranking_matches_the_row_query(app_module, fts5_search):
+    products, _total = app_module.search_products(fts5_search, ['laptop', 'mouse'], limit=10, offset=0)
+    ids = app_module.keyword_ranked_ids(fts5_search, ['laptop', 'mouse'])
+    assert ids == [product['id'] for product in products]
+
+
+def test_typed_terms_rank_above_typo_corrections(app_module, fts5_search):
+    # "mouse" stands in for a correction added by expand_search_terms; its matches follow every "lamp" match
+    products, total = app_module.search_products(fts5_search, ['lamp', 'mouse'], limit=10, offset=0,
+                                                 corrections=('mouse',))
+    assert total == 3
+    assert names(products)[0] == "Desk Lamp"
+    assert set(names(products[1:])) == {"Wireless Mouse", "Mouse Pad"}
+    assert app_module.keyword_ranked_ids(fts5_search, ['lamp', 'mouse'], corrections=('mouse',)) == [
+        product['id'] for product in products
+    ]
+
+
+def test_rank_order_only_splits_typed_terms_from_corrections(app_module):
+    plain_order = "bm25(products_fts, 3.0, 2.0, 1.0), rowid"
+    assert app_module.fts5_rank_order(['lamp'], (), 'rowid') == (plain_order, ())
+    assert app_module.fts5_rank_order(['lamp'], ('lamp',), 'rowid') == (plain_order, ())
+    order_by, params = app_module.fts5_rank_order(['lamp', 'mouse'], ('mouse',), 'rowid')
+    assert order_by.endswith(plain_order)
+    assert params == ('"lamp"',)
+
+
+def test_triggers_keep_the_index_in_sync(app_module, fts5_search):
+    with fts5_search:
+        fts5_search.execute("UPDATE products SET name = 'Notebook Sleeve' WHERE name = 'Laptop Sleeve'")
+        fts5_search.execute("DELETE FROM products WHERE name = 'Desk Lamp'")
+    products, total = app_module.search_products(fts5_search, ['laptop'], limit=10, offset=0)
+    # The sleeve still mentions laptops in its description
+    assert total == 2
+    assert names(products) == ["Laptop Pro X", "Notebook Sleeve"]
+    assert names(app_module.search_products(fts5_search, ['notebook'], limit=10, offset=0)[0]) == ["Notebook Sleeve"]
+
+
+@pytest.mark.parametrize('params, expected', [
+    ({}, (50, None)),
+    ({'limit': ''}, (50, None)),
+    ({'limit': '5', 'cursor': '10'}, (5, '10')),
+    ({'limit': 7}, (7, None)),
+    ({'limit': 1000}, (200, None)),
+])
+def test_pagination_params(app_module, params, expected):
+    assert app_module.parse_pagination(params, 50, 200) == expected
+
+
+@pytest.mark.parametrize('limit', [0, '0', -3, '-3', 2.5, '2.5', 5.0, True, 'ten', [5]])
+def test_pagination_rejects_non_positive_and_non_integer_limits(app_module, limit):
+    with pytest.raises(ValueError):
+        app_module.parse_pagination({'limit': limit}, 50, 200)
+
+
+def test_routes_reject_bad_limits(client):
+    response = client.post('/api/chatbot', json={"query": "laptop", "limit": 0}, headers=auth_headers('fts5-user-1'))
+    assert response.status_code == 400
+    response = client.get('/api/products?limit=2.5', headers=auth_headers('fts5-user-1'))
+    assert response.status_code == 400
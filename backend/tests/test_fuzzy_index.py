@@ -0,0 +1,62 @@
+import pytest
+
+from fuzzy_index import FuzzyTermIndex, trigrams
+
+PRODUCTS = [
+    {"id": 1, "name": "Mechanical Keyboard", "category": "Electronics", "description": "RGB keyboard with blue switches."},
+    {"id": 2, "name": "Gaming Headset", "category": "Electronics", "description": "Surround sound for long sessions."},
+    {"id": 3, "name": "Coffee Maker Deluxe", "category": "Home Appliances", "description": "Brews fresh beans in minutes."},
+]
+
+
+@pytest.fixture
+def index():
+    index = FuzzyTermIndex()
+    for product in PRODUCTS:
+        index.add_product(product)
+    return index
+
+
+def test_trigrams_are_padded():
+    assert trigrams('cat') == {'  c', ' ca', 'cat', 'at '}
+
+
+def test_misspelt_terms_are_corrected(index):
+    assert index.corrections('keybaord')[0] == 'keyboard'
+    terms, corrections = index.expand(['wireless', 'keybaord'])
+    assert terms[:2] == ['wireless', 'keybaord']
+    assert 'keyboard' in terms
+    assert 'keyboard' in corrections
+    assert 'keybaord' not in corrections
+
+
+def test_words_used_anywhere_in_the_catalog_are_left_alone(index):
+    # 'bean' only appears in a description; it must not be "corrected" to a similar name term
+    assert index.is_known('bean')
+    assert index.expand(['beans']) == (['bean'], set())
+    assert index.expand(['keyboard']) == (['keyboard'], set())
+
+
+def test_short_and_numeric_terms_are_not_corrected(index):
+    assert index.expand(['kbd']) == (['kbd'], set())
+    assert index.expand(['12345']) == (['12345'], set())
+
+
+def test_typed_terms_are_never_marked_as_corrections(index):
+    terms, corrections = index.expand(['keybaord', 'keyboard'])
+    assert 'keyboard' in terms
+    assert 'keyboard' not in corrections
+
+
+def test_removing_a_product_forgets_its_vocabulary(index):
+    index.remove_product(1)
+    assert index.corrections('keybaord') == []
+    assert not index.is_known('switch')
+    assert index.is_known('electronic') # Still used by the headset
+
+    index.add_product(PRODUCTS[0])
+    assert index.corrections('keybaord')[0] == 'keyboard'
+
+
+def test_dissimilar_terms_get_no_corrections(index):
+    assert index.corrections('zzzzzz') == []
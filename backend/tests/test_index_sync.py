@@ -0,0 +1,141 @@
+import sqlite3
+
+import pytest
+
+from db import open_connection
+from fuzzy_index import FuzzyTermIndex
+from index_sync import ProductIndexSync
+from schema import PRODUCT_CHANGELOG_RETENTION, create_schema
+from search_index import ProductSearchIndex
+
+
+@pytest.fixture
+def database(tmp_path):
+    path = str(tmp_path / 'ecommerce.db')
+    conn = open_connection(path)
+    create_schema(conn)
+    conn.executemany(
+        "INSERT INTO products (name, category, price, description) VALUES (?, ?, ?, ?)",
+        [("Mechanical Keyboard", "Electronics", 85.5, "Blue switches."),
+         ("Wireless Mouse", "Electronics", 25.0, "Long battery life."),
+         ("Desk Lamp", "Home", 30.0, "Warm light.")]
+    )
+    conn.commit()
+    yield path, conn
+    conn.close()
+
+
+def matching_ids(index, word):
+    return [product_id for product_id, _score in index.search([word])]
+
+
+def log_size(conn):
+    return conn.execute("SELECT COUNT(*) FROM product_changes").fetchone()[0]
+
+
+def bulk_load_marker(conn):
+    # What bulk_import.py leaves behind: rows written with the triggers off, then a NULL entry
+    with conn:
+        conn.execute("DROP TRIGGER products_changelog_insert")
+        conn.execute("INSERT INTO products (name, category, price, description) VALUES ('Gaming Headset', 'Electronics', 60, '')")
+        conn.execute("DELETE FROM product_changes")
+        conn.execute("INSERT INTO product_changes (product_id) VALUES (NULL)")
+    create_schema(conn)
+
+
+def test_refresh_applies_logged_writes(database):
+    _path, conn = database
+    index = ProductSearchIndex()
+    sync = ProductIndexSync()
+    sync.register(index)
+    assert sync.rebuild(conn) == 3
+
+    with conn:
+        conn.execute("UPDATE products SET name = 'Ergonomic Keyboard' WHERE id = 1")
+        conn.execute("DELETE FROM products WHERE id = 2")
+        conn.execute("INSERT INTO products (name, category, price, description) VALUES ('Keyboard Tray', 'Home', 20, '')")
+    assert sync.refresh(conn) == 3
+    assert sorted(matching_ids(index, 'keyboard')) == [1, 4]
+    assert matching_ids(index, 'mouse') == []
+    assert sync.refresh(conn) == 0
+
+
+def test_changelog_keeps_only_the_newest_entries(database):
+    _path, conn = database
+    with conn:
+        conn.executemany("UPDATE products SET price = ? WHERE id = 1",
+                         [(price,) for price in range(PRODUCT_CHANGELOG_RETENTION + 50)])
+    assert log_size(conn) == PRODUCT_CHANGELOG_RETENTION
+
+
+def test_pruned_entries_force_a_rebuild(database):
+    _path, conn = database
+    index = ProductSearchIndex()
+    sync = ProductIndexSync()
+    sync.register(index)
+    sync.rebuild(conn)
+
+    with conn:
+        conn.execute("UPDATE products SET name = 'Wired Mouse' WHERE id = 2")
+        conn.executemany("UPDATE products SET price = ? WHERE id = 1",
+                         [(price,) for price in range(PRODUCT_CHANGELOG_RETENTION)])
+    # The rename is no longer in the log; only a rebuild can pick it up
+    sync.refresh(conn)
+    assert matching_ids(index, 'wired') == [2]
+    assert sync.stats()['rebuilds'] == 2
+
+
+def test_bulk_loads_rebuild_in_the_background(database):
+    path, conn = database
+    index, terms = ProductSearchIndex(), FuzzyTermIndex()
+    sync = ProductIndexSync(get_connection=lambda: open_connection(path))
+    sync.register(index)
+    sync.register(terms)
+    sync.rebuild(conn)
+
+    bulk_load_marker(conn)
+    assert sync.refresh(conn) == 0 # Returns at once; the request keeps the current indexes
+    sync.wait_for_rebuild(timeout=5)
+    assert not sync.stats()['rebuilding']
+    assert matching_ids(index, 'headset') == [4]
+    assert terms.is_known('headset')
+    assert sync.stats()['rebuilds'] == 2
+    assert sync.refresh(conn) == 0
+
+
+def test_failed_background_rebuild_is_retried(database):
+    path, conn = database
+    index = ProductSearchIndex()
+    attempts = []
+
+    def get_connection():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise sqlite3.OperationalError("unable to open database file")
+        return open_connection(path)
+
+    sync = ProductIndexSync(get_connection=get_connection)
+    sync.register(index)
+    sync.rebuild(conn)
+    bulk_load_marker(conn)
+
+    sync.refresh(conn)
+    sync.wait_for_rebuild(timeout=5)
+    assert matching_ids(index, 'headset') == []
+    sync.refresh(conn)
+    sync.wait_for_rebuild(timeout=5)
+    assert matching_ids(index, 'headset') == [4]
+
+
+def test_reset_hook_replaces_the_rebuild(database):
+    _path, conn = database
+    calls = []
+    sync = ProductIndexSync(reset=lambda conn, marker_seq: calls.append(marker_seq))
+    sync.register(ProductSearchIndex())
+    sync.rebuild(conn)
+    bulk_load_marker(conn)
+
+    sync.refresh(conn)
+    marker_seq = conn.execute("SELECT seq FROM product_changes WHERE product_id IS NULL").fetchone()[0]
+    assert calls == [marker_seq]
+    assert sync.last_seq == marker_seq
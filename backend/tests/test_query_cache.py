@@ -0,0 +1,110 @@
+import pytest
+
+from conftest import auth_headers
+from query_cache import SearchResultCache
+
+
+@pytest.fixture
+def cache_path(tmp_path):
+    return str(tmp_path / 'query_cache.db')
+
+
+def test_hit_only_for_the_same_catalog_version(cache_path):
+    cache = SearchResultCache(cache_path)
+    cache.set('laptop', 1, {"products": [1]})
+    assert cache.get('laptop', 1) == {"products": [1]}
+    assert cache.get('laptop', 2) is None
+    assert cache.get('phone', 1) is None
+    assert cache.stats()['local_hits'] == 1
+    assert cache.stats()['misses'] == 2
+
+
+def test_entries_are_shared_between_instances(cache_path):
+    # Two instances on one file stand in for two gunicorn workers
+    writer, reader = SearchResultCache(cache_path), SearchResultCache(cache_path)
+    writer.set('laptop', 1, {"products": [1]})
+    assert reader.get('laptop', 1) == {"products": [1]}
+    assert reader.stats()['shared_hits'] == 1
+
+
+def test_a_new_version_purges_older_entries(cache_path):
+    writer, reader = SearchResultCache(cache_path), SearchResultCache(cache_path)
+    writer.set('laptop', 1, {"products": [1]})
+    writer.set('phone', 2, {"products": [2]})
+    assert reader.get('laptop', 1) is None
+    assert reader.get('phone', 2) == {"products": [2]}
+
+
+def test_store_is_created_on_first_use(tmp_path):
+    path = tmp_path / 'query_cache.db'
+    cache = SearchResultCache(str(path))
+    assert not path.exists()
+    cache.set('laptop', 1, {"products": []})
+    assert path.exists()
+
+
+def test_product_changes_invalidate_cached_answers(app_module, client, db):
+    def ask(uid):
+        response = client.post('/api/chatbot', json={"query": "mechanical keyboard"}, headers=auth_headers(uid))
+        assert response.status_code == 200
+        return [product['name'] for product in response.get_json()['products']]
+
+    product_id = db.execute("SELECT id FROM products WHERE name = 'Mechanical Keyboard'").fetchone()[0]
+    assert 'Mechanical Keyboard' in ask('cache-user-1')
+    hits = app_module.search_cache.stats()['local_hits']
+    assert 'Mechanical Keyboard' in ask('cache-user-2')
+    assert app_module.search_cache.stats()['local_hits'] == hits + 1
+
+    with db:
+        db.execute("UPDATE products SET name = 'Mechanical Keyboard Mk II' WHERE id = ?", (product_id,))
+    try:
+        names = ask('cache-user-3')
+        assert 'Mechanical Keyboard Mk II' in names
+        assert 'Mechanical Keyboard' not in names
+    finally:
+        with db:
+            db.execute("UPDATE products SET name = 'Mechanical Keyboard' WHERE id = ?", (product_id,))
+
+
+def test_clear_empties_both_tiers(cache_path):
+    cache, other = SearchResultCache(cache_path), SearchResultCache(cache_path)
+    cache.set('laptop', 1, {"products": [1]})
+    cache.clear()
+    assert cache.get('laptop', 1) is None
+    assert other.get('laptop', 1) is None
+
+
+def test_answers_from_a_rebuilding_index_are_not_cached(app_module, client, monkeypatch):
+    import threading
+
+    from bulk_import import bulk_load
+    from db import open_connection
+
+    sync = app_module.product_indexes
+    release = threading.Event()
+    get_connection = sync.get_connection
+
+    def slow_connection():
+        release.wait(5) # Hold the rebuild so the first search runs against the old indexes
+        return get_connection()
+    monkeypatch.setattr(sync, 'get_connection', slow_connection)
+
+    def ask(uid):
+        response = client.post('/api/chatbot', json={"query": "zebrafone"}, headers=auth_headers(uid))
+        assert response.status_code == 200
+        return [product['name'] for product in response.get_json()['products']]
+
+    conn = open_connection(app_module.DATABASE)
+    try:
+        bulk_load(conn, [{"name": "Zebrafone Deluxe", "category": "Electronics", "price": 99, "sku": "ZEB-1"}],
+                  report=lambda message: None)
+        assert ask('rebuild-user-1') == [] # Served from the old indexes while the rebuild waits
+        release.set()
+        sync.wait_for_rebuild(timeout=5)
+        assert ask('rebuild-user-2') == ['Zebrafone Deluxe']
+    finally:
+        release.set()
+        sync.wait_for_rebuild(timeout=5)
+        with conn:
+            conn.execute("DELETE FROM products WHERE sku = 'ZEB-1'")
+        conn.close()
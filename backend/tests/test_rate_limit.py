@@ -0,0 +1,106 @@
+import pytest
+
+from conftest import TEST_RATE_LIMIT_BURST, auth_headers
+from rate_limit import TokenBucketLimiter, retry_after_header
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def limiter(tmp_path, clock):
+    return TokenBucketLimiter(str(tmp_path / 'rate_limit.db'), rate=1.0, burst=3, timer=clock)
+
+
+def test_allows_burst_then_limits(limiter):
+    assert [limiter.acquire('alice')[0] for _ in range(3)] == [True, True, True]
+    allowed, retry_after = limiter.acquire('alice')
+    assert not allowed
+    assert retry_after == pytest.approx(1.0)
+    assert limiter.stats()['allowed'] == 3
+    assert limiter.stats()['limited'] == 1
+
+
+def test_refills_at_rate_up_to_burst(limiter, clock):
+    for _ in range(3):
+        limiter.acquire('alice')
+    clock.now += 2
+    assert [limiter.acquire('alice')[0] for _ in range(3)] == [True, True, False]
+
+    clock.now += 100 # Idle for a long time: the bucket holds at most `burst` tokens
+    assert [limiter.acquire('alice')[0] for _ in range(4)] == [True, True, True, False]
+
+
+def test_retry_after_reflects_partial_refill(limiter, clock):
+    for _ in range(3):
+        limiter.acquire('alice')
+    clock.now += 0.25
+    allowed, retry_after = limiter.acquire('alice')
+    assert not allowed
+    assert retry_after == pytest.approx(0.75)
+
+
+def test_buckets_are_per_key(limiter):
+    for _ in range(3):
+        limiter.acquire('alice')
+    assert not limiter.acquire('alice')[0]
+    assert limiter.acquire('bob')[0]
+
+
+def test_state_is_shared_through_the_database(tmp_path, clock):
+    # Two limiters on one file stand in for two gunicorn workers
+    path = str(tmp_path / 'rate_limit.db')
+    workers = [TokenBucketLimiter(path, rate=1.0, burst=3, timer=clock) for _ in range(2)]
+    results = [workers[i % 2].acquire('alice')[0] for i in range(6)]
+    assert results.count(True) == 3
+
+
+def test_store_is_created_on_first_use(tmp_path, clock):
+    path = tmp_path / 'rate_limit.db'
+    limiter = TokenBucketLimiter(str(path), rate=1.0, burst=3, timer=clock)
+    assert not path.exists()
+    limiter.acquire('alice')
+    assert path.exists()
+
+
+def test_fails_open_when_the_store_is_unavailable(tmp_path, clock):
+    limiter = TokenBucketLimiter(str(tmp_path / 'missing-dir' / 'rate_limit.db'), rate=1.0, burst=1, timer=clock)
+    assert limiter.acquire('alice') == (True, 0.0)
+    assert limiter.acquire('alice') == (True, 0.0)
+
+
+def test_rejects_invalid_configuration(tmp_path):
+    with pytest.raises(ValueError):
+        TokenBucketLimiter(str(tmp_path / 'rate_limit.db'), rate=0, burst=3)
+    with pytest.raises(ValueError):
+        TokenBucketLimiter(str(tmp_path / 'rate_limit.db'), rate=1, burst=0)
+
+
+@pytest.mark.parametrize('seconds, header', [(0.0, '1'), (0.2, '1'), (1.0, '1'), (1.5, '2'), (59.01, '60')])
+def test_retry_after_header_rounds_up_to_whole_seconds(seconds, header):
+    assert retry_after_header(seconds) == header
+
+
+def test_chatbot_answers_429_with_retry_after(client):
+    headers = auth_headers('rate-limited-user')
+    for _ in range(TEST_RATE_LIMIT_BURST):
+        assert client.post('/api/chatbot', json={"query": "hello"}, headers=headers).status_code == 200
+
+    response = client.post('/api/chatbot', json={"query": "hello"}, headers=headers)
+    assert response.status_code == 429
+    assert int(response.headers['Retry-After']) >= 1
+    assert response.get_json()['retry_after'] > 0
+
+    # The stream endpoint draws from the same bucket; other users are unaffected
+    assert client.post('/api/chatbot/stream', json={"query": "hello"}, headers=headers).status_code == 429
+    assert client.post('/api/chatbot', json={"query": "hello"}, headers=auth_headers('another-user')).status_code == 200
@@ -0,0 +1,73 @@
+import pytest
+
+from search_index import ProductSearchIndex, stem, tokenize
+
+PRODUCTS = [
+    {"id": 1, "name": "Mechanical Keyboard", "category": "Electronics", "description": "RGB keyboard with blue switches."},
+    {"id": 2, "name": "Wireless Mouse", "category": "Electronics", "description": "Pairs with any wireless keyboard."},
+    {"id": 3, "name": "Python Programming Book", "category": "Books", "description": "A guide to Python for beginners."},
+    {"id": 4, "name": "Desk Lamp", "category": "Home", "description": "Warm light for reading books."},
+]
+
+
+@pytest.fixture
+def index():
+    index = ProductSearchIndex()
+    index.build(PRODUCTS)
+    return index
+
+
+def ids(results):
+    return [product_id for product_id, _score in results]
+
+
+@pytest.mark.parametrize('word, term', [
+    ('laptops', 'laptop'), ('accessories', 'accessory'), ('glasses', 'glass'),
+    ('watches', 'watch'), ('books', 'book'), ('status', 'status'), ('16gb', '16gb'),
+])
+def test_stem(word, term):
+    assert stem(word) == term
+
+
+def test_tokenize_lowercases_and_splits():
+    assert tokenize("RGB Keyboards, 16GB-RAM!") == ['rgb', 'keyboard', '16gb', 'ram']
+
+
+def test_name_match_outranks_description_match(index):
+    assert ids(index.search(['keyboard'])) == [1, 2]
+    assert ids(index.search(['books'])) == [3, 4]
+
+
+def test_rare_terms_weigh_more_than_common_ones(index):
+    # 'electronics' is on two products, 'mouse' on one, so mouse decides the order
+    assert ids(index.search(['electronics', 'mouse']))[0] == 2
+
+
+def test_matching_more_terms_ranks_higher(index):
+    results = index.search(['wireless', 'keyboard'])
+    assert ids(results)[:2] == [2, 1]
+    assert results[0][1] > results[1][1]
+
+
+def test_limit_and_unknown_terms(index):
+    assert len(index.search(['keyboard'], limit=1)) == 1
+    assert index.search(['nonexistent']) == []
+    assert index.search([]) == []
+
+
+def test_term_weights_scale_scores(index):
+    full = dict(index.search(['keyboard']))
+    halved = dict(index.search(['keyboard'], term_weights={'keyboard': 0.5}))
+    assert halved[1] == pytest.approx(full[1] * 0.5)
+
+
+def test_reindexing_and_removal(index):
+    index.add_product({"id": 4, "name": "Desk Lamp", "category": "Home", "description": "Keyboard light."})
+    assert 4 in ids(index.search(['keyboard']))
+    assert ids(index.search(['reading'])) == []
+
+    index.remove_product(1)
+    assert ids(index.search(['mechanical'])) == []
+    assert len(index) == 3
+    index.remove_product(1) # Removing twice is harmless
+    assert len(index) == 3
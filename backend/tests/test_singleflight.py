@@ -0,0 +1,95 @@
+import threading
+import time
+
+import pytest
+
+from singleflight import SingleFlight
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("condition not met in time")
+        time.sleep(0.001)
+
+
+def run_concurrently(flight, key, fn, callers):
+    """Start `callers` threads calling flight.do(key, fn); returns (threads, outcomes)."""
+    outcomes = []
+    lock = threading.Lock()
+
+    def call():
+        try:
+            outcome = flight.do(key, fn)
+        except Exception as e:
+            outcome = e
+        with lock:
+            outcomes.append(outcome)
+
+    threads = [threading.Thread(target=call) for _ in range(callers)]
+    for thread in threads:
+        thread.start()
+    return threads, outcomes
+
+
+def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def search():
+        calls.append(1)
+        release.wait(5)
+        return {"products": [1, 2, 3]}
+
+    threads, outcomes = run_concurrently(flight, 'laptop', search, callers=8)
+    wait_until(lambda: flight.stats()['shared'] == 7) # Everyone but the leader is waiting on it
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert all(result == {"products": [1, 2, 3]} for result, _shared in outcomes)
+    assert sorted(shared for _result, shared in outcomes) == [False] + [True] * 7
+    assert flight.stats() == {"executions": 1, "shared": 7, "in_flight": 0}
+
+
+def test_errors_reach_every_waiter():
+    flight = SingleFlight()
+    release = threading.Event()
+
+    def failing_search():
+        release.wait(5)
+        raise RuntimeError("database is locked")
+
+    threads, outcomes = run_concurrently(flight, 'laptop', failing_search, callers=4)
+    wait_until(lambda: flight.stats()['shared'] == 3)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(outcomes) == 4
+    assert all(isinstance(outcome, RuntimeError) and str(outcome) == "database is locked" for outcome in outcomes)
+    assert flight.stats()['in_flight'] == 0
+
+
+def test_results_are_not_kept_after_the_call():
+    flight = SingleFlight()
+    results = iter([1, 2])
+    assert flight.do('laptop', lambda: next(results)) == (1, False)
+    assert flight.do('laptop', lambda: next(results)) == (2, False)
+
+
+def test_different_keys_run_separately():
+    flight = SingleFlight()
+    assert flight.do('laptop', lambda: 'a') == ('a', False)
+    assert flight.do('phone', lambda: 'b') == ('b', False)
+    assert flight.stats()['executions'] == 2
+
+
+def test_leader_sees_its_own_exception():
+    flight = SingleFlight()
+    with pytest.raises(ValueError):
+        flight.do('laptop', lambda: int('x'))
+    assert flight.do('laptop', lambda: 'recovered') == ('recovered', False)
@@ -0,0 +1,16 @@
+import os
+import subprocess
+import sys
+
+from conftest import BACKEND_DIR
+
+
+def run_python(code, cwd, **env):
+    return subprocess.run([sys.executable, '-c', code], cwd=cwd, capture_output=True, text=True, check=True,
+                          env={**os.environ, "PYTHONPATH": BACKEND_DIR, **env}).stdout
+
+
+def test_import_does_no_database_work_or_numpy_import(tmp_path):
+    output = run_python("import sys, app; print('numpy' in sys.modules)", str(tmp_path), VECTOR_SEARCH='off')
+    assert output.strip().splitlines()[-1] == 'False'
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,77 @@
+import pytest
+
+from token_cache import TokenVerificationCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+class Verifier:
+    def __init__(self, exp, error=None):
+        self.exp = exp
+        self.error = error
+        self.calls = 0
+
+    def __call__(self, id_token):
+        self.calls += 1
+        if self.error:
+            raise self.error
+        return {"uid": id_token, "exp": self.exp}
+
+
+def test_entry_is_served_until_the_token_expires(clock):
+    cache = TokenVerificationCache(timer=clock)
+    verifier = Verifier(exp=clock.now + 60)
+    assert cache.verify('token', verifier)['uid'] == 'token'
+    clock.now += 59
+    cache.verify('token', verifier)
+    assert verifier.calls == 1
+
+    clock.now += 1 # Reaches 'exp': the expired token must be checked again
+    cache.verify('token', verifier)
+    assert verifier.calls == 2
+    assert cache.stats()['hits'] == 1
+    assert cache.stats()['misses'] == 2
+
+
+def test_entry_lifetime_is_capped_at_max_ttl(clock):
+    cache = TokenVerificationCache(max_ttl=300, timer=clock)
+    verifier = Verifier(exp=clock.now + 3600)
+    cache.verify('token', verifier)
+    clock.now += 299
+    cache.verify('token', verifier)
+    assert verifier.calls == 1
+    clock.now += 1
+    cache.verify('token', verifier)
+    assert verifier.calls == 2
+
+
+def test_verifier_errors_are_not_cached(clock):
+    cache = TokenVerificationCache(timer=clock)
+    failing = Verifier(exp=clock.now + 60, error=ValueError("revoked"))
+    for _ in range(2):
+        with pytest.raises(ValueError):
+            cache.verify('token', failing)
+    assert failing.calls == 2
+    assert cache.stats()['size'] == 0
+
+    # The same token verifies once the verifier accepts it
+    assert cache.verify('token', Verifier(exp=clock.now + 60))['uid'] == 'token'
+
+
+def test_tokens_are_cached_separately(clock):
+    cache = TokenVerificationCache(timer=clock)
+    verifier = Verifier(exp=clock.now + 60)
+    assert cache.verify('alice', verifier)['uid'] == 'alice'
+    assert cache.verify('bob', verifier)['uid'] == 'bob'
+    assert verifier.calls == 2
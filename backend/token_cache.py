@@ -0,0 +1,64 @@
+# backend/token_cache.py
+# Caches successful Firebase ID-token verifications so a token's JWT parsing and
+# RSA signature check happen once per token instead of once per request.
+import hashlib
+import threading
+import time
+
+from cachetools import TLRUCache
+
+
+class TokenVerificationCache:
+    """
+    Bounded cache of decoded ID tokens, keyed by a SHA-256 hash of the raw token.
+    Each entry expires at the token's own 'exp' claim (capped at max_ttl seconds),
+    so an expired token is never served from the cache.
+    """
+
+    def __init__(self, maxsize=10000, max_ttl=3600, timer=time.time):
+        self.max_ttl = max_ttl
+        self._cache = TLRUCache(maxsize=maxsize, ttu=self._time_to_use, timer=timer)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _time_to_use(self, _key, decoded_token, now):
+        expires_at = decoded_token.get('exp', now)
+        return min(expires_at, now + self.max_ttl)
+
+    @staticmethod
+    def _key(id_token):
+        return hashlib.sha256(id_token.encode('utf-8')).hexdigest()
+
+    def verify(self, id_token, verifier):
+        """
+        Return the decoded token, calling verifier(id_token) only on a cache miss.
+        Exceptions from the verifier propagate and failed tokens are not cached.
+        """
+        key = self._key(id_token)
+        with self._lock:
+            decoded_token = self._cache.get(key)
+            if decoded_token is not None:
+                self.hits += 1
+                return decoded_token
+            self.misses += 1
+
+        decoded_token = verifier(id_token)
+        with self._lock:
+            self._cache[key] = decoded_token
+        return decoded_token
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "size": len(self._cache),
+                "maxsize": self._cache.maxsize,
+            }
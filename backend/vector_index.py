@@ -0,0 +1,279 @@
+# backend/vector_index.py
+# Vector retrieval for chatbot queries that share no keywords with a product's name.
+# Every product becomes a fixed-size vector of hashed features: its stemmed words
+# plus the character trigrams of those words, so "smoothie" still lands near
+# "smoothies" and "blend" near "blender". Vectors are L2-normalised float32 rows of
+# one matrix; a query is scored against all products with a single matrix-vector
+# product and the top k come out of argpartition, so there is no Python loop over
+# products. Query features are weighted by inverse document frequency, which keeps
+# words every description shares ("high-quality", "item") from dominating.
+#
+# The matrix is stored as .npy files and memory-mapped, so gunicorn workers share
+# one copy through the page cache and start without re-vectorising the catalog.
+# Products written after the files were built are kept in a small in-memory delta
+# (superseded base rows are masked) until the files are rebuilt. The app never builds
+# or rewrites them; vectorising the catalog takes seconds per 10k products, so that
+# happens offline. Build or refresh the files from the backend directory with:
+#   python vector_index.py [--database ecommerce.db] [--path vector_index] [--dim 512]
+#
+# numpy is optional: without it VECTOR_AVAILABLE is False and the app skips vector search.
+import argparse
+import json
+import math
+import os
+import sqlite3
+import threading
+import zlib
+from collections import defaultdict
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from search_index import FIELD_WEIGHTS, tokenize
+
+VECTOR_AVAILABLE = np is not None
+
+# 512 float32 dimensions = 2 KB per product (~200 MB mapped for 100k products). Fewer dimensions
+# mean more hash collisions, which show up as unrelated products scoring well.
+DEFAULT_DIM = 512
+TRIGRAM_WEIGHT = 0.25 # Relative to the word itself
+METADATA_FILE = 'meta.json'
+
+
+def _features(text, weight, features):
+    for term in tokenize(text):
+        features['w:' + term] += weight
+        padded = f" {term} "
+        for i in range(len(padded) - 2):
+            features['c:' + padded[i:i + 3]] += weight * TRIGRAM_WEIGHT
+
+
+def hashed_features(fields, dim):
+    """
+    Map {field_name: text} to {bucket: signed weight}. crc32 is stable across processes,
+    so vectors built offline match queries hashed by the app; the sign bit halves the bias
+    that colliding features would otherwise add.
+    """
+    features = defaultdict(float)
+    for field, text in fields.items():
+        if text:
+            _features(text, FIELD_WEIGHTS.get(field, 1.0), features)
+    buckets = defaultdict(float)
+    for feature, weight in features.items():
+        digest = zlib.crc32(feature.encode('utf-8'))
+        sign = 1.0 if digest & 0x80000000 else -1.0
+        buckets[digest % dim] += sign * (1 + math.log(weight)) if weight >= 1 else sign * weight
+    return buckets
+
+
+class ProductVectorIndex:
+    """
+    Has the clear() / add_product() / remove_product() interface expected by index_sync.ProductIndexSync.
+    search() returns [(product_id, score)], best first, with scores roughly in [-1, 1].
+    """
+
+    def __init__(self, dim=DEFAULT_DIM, path=None):
+        if not VECTOR_AVAILABLE:
+            raise RuntimeError("numpy is required for the vector index")
+        self.dim = dim
+        self.path = path
+        self.last_seq = 0 # product_changes position the saved files reflect
+        self._lock = threading.RLock()
+        self.clear()
+
+    def __len__(self):
+        with self._lock:
+            return int(self._base_live.sum()) + len(self._delta)
+
+    def clear(self):
+        with self._lock:
+            self._base_vectors = np.zeros((0, self.dim), dtype=np.float32)
+            self._base_ids = np.zeros(0, dtype=np.int64)
+            self._base_live = np.zeros(0, dtype=bool) # False for rows superseded or deleted since the base was built
+            self._base_rows = {}                      # product_id -> row in the base matrix
+            self._base_df = np.zeros(self.dim, dtype=np.int64)
+            self._delta = {}                          # product_id -> vector written after the base
+            self._delta_ids = None
+            self._delta_matrix = None                 # Stacked copy of _delta, rebuilt lazily
+            self._df = np.zeros(self.dim, dtype=np.int64) # Live products with a non-zero value per bucket
+
+    def vectorize(self, fields):
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for bucket, weight in hashed_features(fields, self.dim).items():
+            vector[bucket] = weight
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def add_product(self, product):
+        vector = self.vectorize({field: product[field] for field in FIELD_WEIGHTS})
+        with self._lock:
+            self.remove_product(product['id'])
+            self._delta[product['id']] = vector
+            self._delta_matrix = None
+            self._df += vector != 0
+
+    def remove_product(self, product_id):
+        with self._lock:
+            vector = self._delta.pop(product_id, None)
+            if vector is not None:
+                self._delta_matrix = None
+                self._df -= vector != 0
+            row = self._base_rows.get(product_id)
+            if row is not None and self._base_live[row]:
+                self._base_live[row] = False
+                self._df -= self._base_vectors[row] != 0
+
+    def search(self, query_terms, limit=20, min_score=0.0):
+        """Rank products against the query words with one matrix-vector product per matrix."""
+        with self._lock:
+            total = len(self._base_ids) + len(self._delta)
+            if not total or not query_terms:
+                return []
+            query = self.vectorize({'name': ' '.join(query_terms)})
+            # Smoothed IDF per bucket, applied on the query side only so stored rows never need rescaling
+            query *= np.log1p(total / (1.0 + self._df)).astype(np.float32)
+            norm = np.linalg.norm(query)
+            if not norm:
+                return []
+            query /= norm
+
+            if self._delta_matrix is None:
+                self._delta_ids = np.fromiter(self._delta.keys(), dtype=np.int64, count=len(self._delta))
+                self._delta_matrix = (np.stack(list(self._delta.values())) if self._delta
+                                      else np.zeros((0, self.dim), dtype=np.float32))
+            scores = np.concatenate([
+                np.where(self._base_live, self._base_vectors @ query, -np.inf),
+                self._delta_matrix @ query,
+            ])
+            ids = np.concatenate([self._base_ids, self._delta_ids])
+
+        k = min(limit, len(scores))
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind='stable')]
+        return [(int(ids[i]), float(scores[i])) for i in top if scores[i] > min_score]
+
+    def compact(self, last_seq=None):
+        """Fold the delta into a fresh base matrix and, if a path is set, write it out."""
+        with self._lock:
+            live = self._base_live
+            vectors = np.concatenate([np.asarray(self._base_vectors[live]), *(
+                [np.stack(list(self._delta.values()))] if self._delta else []
+            )]).astype(np.float32, copy=False)
+            ids = np.concatenate([self._base_ids[live], np.fromiter(self._delta.keys(), dtype=np.int64)])
+            df = self._df.copy()
+            self.clear()
+            self._set_base(vectors, ids, df)
+            if last_seq is not None:
+                self.last_seq = last_seq
+            if self.path:
+                try:
+                    self.save(self.path)
+                except OSError as e:
+                    # Still usable from memory; the next start just re-vectorises the catalog
+                    print(f"Could not save vector index to {self.path}: {e}")
+
+    def _set_base(self, vectors, ids, df):
+        self._base_vectors = vectors
+        self._base_ids = ids
+        self._base_live = np.ones(len(ids), dtype=bool)
+        self._base_rows = {int(product_id): row for row, product_id in enumerate(ids)}
+        self._base_df = df
+        self._df = df.copy()
+
+    def save(self, path):
+        """Write the base matrix atomically (write to temp names, then rename over the old files)."""
+        os.makedirs(path, exist_ok=True)
+        suffix = f'.tmp-{os.getpid()}'
+        with self._lock:
+            arrays = {'vectors.npy': self._base_vectors, 'ids.npy': self._base_ids, 'df.npy': self._base_df}
+            meta = {'dim': self.dim, 'rows': len(self._base_ids), 'last_seq': self.last_seq}
+        for name, array in arrays.items():
+            with open(os.path.join(path, name + suffix), 'wb') as f:
+                np.save(f, array)
+        with open(os.path.join(path, METADATA_FILE + suffix), 'w') as f:
+            json.dump(meta, f)
+        # Metadata last, so a reader that sees it also sees the matrix it describes
+        for name in [*arrays, METADATA_FILE]:
+            os.replace(os.path.join(path, name + suffix), os.path.join(path, name))
+
+    def load(self, path):
+        """Memory-map a saved index. Returns False (leaving the index empty) if there is none or it doesn't match."""
+        try:
+            with open(os.path.join(path, METADATA_FILE)) as f:
+                meta = json.load(f)
+            if meta['dim'] != self.dim:
+                print(f"Vector index at {path} has dim {meta['dim']}, expected {self.dim}; ignoring it.")
+                return False
+            vectors = np.load(os.path.join(path, 'vectors.npy'), mmap_mode='r')
+            ids = np.load(os.path.join(path, 'ids.npy'))
+            df = np.load(os.path.join(path, 'df.npy'))
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Could not load vector index from {path}: {e}")
+            return False
+        if len(vectors) != len(ids):
+            print(f"Vector index at {path} is inconsistent; ignoring it.")
+            return False
+        with self._lock:
+            self.clear()
+            self._set_base(vectors, ids, df)
+            self.last_seq = meta['last_seq']
+        return True
+
+    def stats(self):
+        with self._lock:
+            return {
+                "products": int(self._base_live.sum()) + len(self._delta),
+                "base_rows": len(self._base_ids),
+                "delta_rows": len(self._delta),
+                "dim": self.dim,
+            }
+
+
+def saved_last_seq(path):
+    """product_changes position of the index saved at path, or None if there is none."""
+    try:
+        with open(os.path.join(path, METADATA_FILE)) as f:
+            return json.load(f)['last_seq']
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def build(database, path, dim=DEFAULT_DIM, chunk_size=5000):
+    """Vectorise the whole catalog from the database and save it to path; returns the number of products."""
+    conn = sqlite3.connect(database)
+    conn.row_factory = sqlite3.Row
+    try:
+        try:
+            last_seq = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM product_changes").fetchone()[0]
+        except sqlite3.OperationalError:
+            last_seq = 0 # Database predates the changelog; the app will replay from the start
+        index = ProductVectorIndex(dim=dim)
+        rows = conn.execute("SELECT id, name, category, description FROM products ORDER BY id")
+        for batch in iter(lambda: rows.fetchmany(chunk_size), []):
+            for product in batch:
+                index.add_product(product)
+        index.path = path
+        index.compact(last_seq=last_seq)
+        return len(index)
+    finally:
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the memory-mapped product vector index from the database.")
+    parser.add_argument('--database', default='ecommerce.db')
+    parser.add_argument('--path', default='vector_index', help="Directory for the .npy files")
+    parser.add_argument('--dim', type=int, default=DEFAULT_DIM, help="Hashed feature dimensions")
+    args = parser.parse_args()
+    if not VECTOR_AVAILABLE:
+        raise SystemExit("numpy is not installed; run 'pip install numpy' first.")
+    count = build(args.database, args.path, dim=args.dim)
+    print(f"Vector index with {count} products written to {args.path}.")
+
+
+if __name__ == '__main__':
+    main()
@@ -6,4 +6,7 @@ path = '/home/Sam1304/mysite/backend'
 if path not in sys.path:
     sys.path.append(path)
 
-from app import app as application # 'application' is the name PythonAnywhere expects
\ No newline at end of file
+from app import create_app
+
+# Checks the schema and builds the search indexes now, so the first request doesn't pay for it
+application = create_app() # 'application' is the name PythonAnywhere expects
\ No newline at end of file
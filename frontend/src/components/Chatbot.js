@@ -37,12 +37,34 @@ const getDateLabel = (isoString) => {
     }
 };
 
+// Products requested per chatbot reply page; the backend caps this at MAX_SEARCH_LIMIT
+const CHAT_PAGE_SIZE = 50;
+
+// Reads an NDJSON response body as it arrives, calling onEvent with each parsed line
+const readNdjson = async (response, onEvent) => {
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffered = '';
+    while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffered += decoder.decode(value, { stream: true });
+        const lines = buffered.split('\n');
+        buffered = lines.pop(); // Keep a partial trailing line for the next chunk
+        lines.filter(line => line.trim()).forEach(line => onEvent(JSON.parse(line)));
+    }
+    if (buffered.trim()) {
+        onEvent(JSON.parse(buffered));
+    }
+};
+
 function Chatbot({ user, onProductsFound, onResetChat, initialMessage = "Hello! How can I help you today?" }) {
     const { user: authUser } = useAuth(); // Use a different name to avoid prop vs hook variable collision if 'user' is also a prop
     const navigate = useNavigate();
     const [input, setInput] = useState('');
     const messagesEndRef = useRef(null); // Ref for current messages scrolling
     const historyEndRef = useRef(null); // Ref for history section scrolling
+    const lastHistoryIdRef = useRef(null); // Id of the newest (last stored) history entry already loaded
 
     const [messages, setMessages] = useState(() => {
         const savedMessages = sessionStorage.getItem('chatMessages');
@@ -95,9 +117,15 @@ function Chatbot({ user, onProductsFound, onResetChat, initialMessage = "Hello!
 
         setIsHistoryLoading(true);
         setHistoryError(null);
+        // After the first load, only ask the backend for messages newer than the ones we already have
+        // (by id, since entries from other server workers can arrive with older timestamps)
+        const since = lastHistoryIdRef.current;
+        const historyUrl = since !== null
+            ? `http://localhost:5000/api/chat_history?since_id=${since}`
+            : 'http://localhost:5000/api/chat_history';
         try {
             const idToken = await authUser.getIdToken();
-            const response = await fetch('http://localhost:5000/api/chat_history', {
+            const response = await fetch(historyUrl, {
                 method: 'GET',
                 headers: {
                     'Content-Type': 'application/json',
@@ -120,11 +148,15 @@ function Chatbot({ user, onProductsFound, onResetChat, initialMessage = "Hello!
                 // For simplicity here, past chat history links will just navigate to dashboard without specific products.
             ]).flat();
 
-            setPastChatHistory(formattedHistory);
+            if (history.length > 0) {
+                lastHistoryIdRef.current = Math.max(...history.map(item => item.id));
+            }
+            setPastChatHistory((prevHistory) => since !== null ? [...prevHistory, ...formattedHistory] : formattedHistory);
 
         } catch (error) {
             console.error("Error fetching past chat history:", error);
             setHistoryError(`Failed to load history: ${error.message}.`);
+            lastHistoryIdRef.current = null; // Next attempt reloads the full log
             setPastChatHistory([]);
         } finally {
             setIsHistoryLoading(false);
@@ -142,6 +174,78 @@ function Chatbot({ user, onProductsFound, onResetChat, initialMessage = "Hello!
         }
     };
 
+    // Adds or updates the products message of one reply; later pages and batches update it in place
+    const upsertProductsMessage = (streamId, fields) => {
+        setMessages((prevMessages) => {
+            const existingIndex = prevMessages.findIndex(msg => msg.streamId === streamId);
+            if (existingIndex === -1) {
+                return [...prevMessages, { sender: 'bot', type: 'products_link', streamId, timestamp: new Date().toISOString(), ...fields }];
+            }
+            const updatedMessages = [...prevMessages];
+            updatedMessages[existingIndex] = { ...prevMessages[existingIndex], ...fields };
+            return updatedMessages;
+        });
+    };
+
+    // Streams one page of a reply from the chatbot (NDJSON, one object per line): the text reply first,
+    // then ranked product batches, then 'done' with the cursor for the next page, if there is one.
+    // `products` holds the products already shown for this reply and is appended to in place.
+    const streamReplyPage = async (idToken, query, cursor, streamId, products) => {
+        const response = await fetch('http://localhost:5000/api/chatbot/stream', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+                'Authorization': `Bearer ${idToken}`
+            },
+            body: JSON.stringify({ query, limit: CHAT_PAGE_SIZE, cursor })
+        });
+
+        if (!response.ok) {
+            const errorData = await response.json();
+            if (response.status === 401 || response.status === 403) {
+                setMessages(prevMessages => [...prevMessages, { text: "Your session has expired or you are unauthorized. Please log in again.", sender: 'bot', timestamp: new Date().toISOString() }]);
+            }
+            throw new Error(`HTTP error! status: ${response.status}, message: ${errorData.message || response.statusText}`);
+        }
+
+        let totalProducts = 0;
+        await readNdjson(response, (event) => {
+            if (event.type === 'message') {
+                totalProducts = event.total;
+                if (!cursor) { // Later pages only add products to the existing reply
+                    const botMessage = { sender: 'bot', text: event.response, type: 'text', timestamp: new Date().toISOString() };
+                    setMessages((prevMessages) => [...prevMessages, botMessage]);
+                }
+            } else if (event.type === 'products' && event.products.length > 0) {
+                products.push(...event.products); // Append in place; copying the array per batch grows quadratically
+                upsertProductsMessage(streamId, {
+                    text: `Found ${totalProducts || products.length} products. Click below to view them!`,
+                    query,
+                    productsCount: products.length,
+                    productsData: products, // <<< PRODUCTS STORED HERE
+                    nextCursor: null
+                });
+            } else if (event.type === 'done' && products.length > 0) {
+                upsertProductsMessage(streamId, { nextCursor: event.next_cursor || null });
+            }
+        });
+    };
+
+    const handleLoadMoreProducts = async (event, msg) => {
+        event.stopPropagation();
+        if (!authUser || !msg.nextCursor) return;
+        const cursor = msg.nextCursor;
+        upsertProductsMessage(msg.streamId, { nextCursor: null }); // Hide the button while the page loads
+        try {
+            const idToken = await authUser.getIdToken();
+            await streamReplyPage(idToken, msg.query, cursor, msg.streamId, [...msg.productsData]);
+        } catch (error) {
+            console.error("Error loading more products:", error);
+            upsertProductsMessage(msg.streamId, { nextCursor: cursor }); // Let the user retry
+            setMessages((prevMessages) => [...prevMessages, { sender: 'bot', text: `Error: ${error.message}. Please try again.`, type: 'text', timestamp: new Date().toISOString() }]);
+        }
+    };
+
     const handleSend = async (e) => {
         e.preventDefault();
         if (input.trim() === '') return;
@@ -160,41 +264,7 @@ function Chatbot({ user, onProductsFound, onResetChat, initialMessage = "Hello!
                 return;
             }
             const idToken = await authUser.getIdToken();
-
-            const response = await fetch('http://localhost:5000/api/chatbot', {
-                method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json',
-                    'Authorization': `Bearer ${idToken}`
-                },
-                body: JSON.stringify({ query: userQueryText })
-            });
-
-            if (!response.ok) {
-                const errorData = await response.json();
-                if (response.status === 401 || response.status === 403) {
-                    setMessages(prevMessages => [...prevMessages, { text: "Your session has expired or you are unauthorized. Please log in again.", sender: 'bot', timestamp: new Date().toISOString() }]);
-                }
-                throw new Error(`HTTP error! status: ${response.status}, message: ${errorData.message || response.statusText}`);
-            }
-
-            const data = await response.json();
-
-            const botMessage = { sender: 'bot', text: data.response, type: 'text', timestamp: new Date().toISOString() };
-            setMessages((prevMessages) => [...prevMessages, botMessage]);
-
-            if (data.products && data.products.length > 0) {
-                // Store the actual products in the message object
-                setMessages((prevMessages) => [...prevMessages, {
-                    sender: 'bot',
-                    type: 'products_link',
-                    text: `Found ${data.products.length} products. Click below to view them!`,
-                    productsCount: data.products.length,
-                    productsData: data.products, // <<< PRODUCTS STORED HERE
-                    timestamp: new Date().toISOString()
-                }]);
-            }
-
+            await streamReplyPage(idToken, userQueryText, null, `stream-${Date.now()}`, []);
         } catch (error) {
             console.error("Error sending message to chatbot:", error);
             const errorMessage = { sender: 'bot', text: `Error: ${error.message}. Please try again.`, type: 'text', timestamp: new Date().toISOString() };
@@ -216,6 +286,7 @@ function Chatbot({ user, onProductsFound, onResetChat, initialMessage = "Hello!
         onResetChat(); // Clear dashboard products and any other app-wide resets
         setShowPastChatHistory(false);
         setPastChatHistory([]);
+        lastHistoryIdRef.current = null;
         setHistoryError(null);
         navigate('/'); // Use the 'navigate' hook directly
         alert("Current chat cleared!"); // Using alert for now, consider a custom modal
@@ -270,6 +341,14 @@ function Chatbot({ user, onProductsFound, onResetChat, initialMessage = "Hello!
                                     View {msg.productsCount} Products
                                 </button>
                             )}
+                            {msg.type === 'products_link' && msg.nextCursor && (
+                                <button
+                                    className="mt-2 bg-white hover:bg-green-50 text-green-700 border border-green-600 font-semibold py-1 px-3 rounded-md transition duration-300 w-full cursor-pointer"
+                                    onClick={(e) => handleLoadMoreProducts(e, msg)}
+                                >
+                                    Load More Products
+                                </button>
+                            )}
                             {msg.timestamp && (
                                 <div className={`text-xs mt-1 ${msg.sender === 'user' ? 'text-white text-right' : 'text-gray-500 text-left'}`}>
                                     {formatMessageTimestamp(msg.timestamp)}